@@ -18,6 +18,25 @@ DATA_CSV_FULL_PATH = BASE_DIR / DATA_CSV_PATH
 # Dossier de sortie des runs
 RUNS_DIR = BASE_DIR / os.getenv("RUNS_DIR", "runs")
 
+# Limites d'exécution des backtests (surchargées par stratégie via "limits" du catalog)
+RUN_TIMEOUT_SECONDS = float(os.getenv("RUN_TIMEOUT_SECONDS", "3600"))
+RUN_MAX_MEMORY_MB = int(os.getenv("RUN_MAX_MEMORY_MB", "0")) or None  # 0 = pas de limite
+
+# Nombre de processus API (uvicorn --workers, cf. start.py)
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# File d'attente des runs: threads workers intégrés à chaque processus API
+# (0 = aucun, les runs sont alors exécutés par des processus `python worker.py` séparés)
+# Chaque processus API démarre ses propres threads: par défaut 2 avec un seul processus,
+# 0 avec plusieurs (sinon 2 × API_WORKERS runs en parallèle), lancer alors worker.py
+RUN_EMBEDDED_WORKERS = int(os.getenv("RUN_EMBEDDED_WORKERS", "2" if API_WORKERS <= 1 else "0"))
+# Un run dont le worker ne donne plus signe de vie depuis ce délai est marqué en échec
+RUN_WORKER_LEASE_SECONDS = float(os.getenv("RUN_WORKER_LEASE_SECONDS", "120"))
+
+# Caches applicatifs: "memory" (par processus) ou "sqlite" (partagé entre workers)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DB_PATH = Path(os.getenv("CACHE_DB_PATH", str(BASE_DIR.parent / "backend_runs" / "cache.sqlite3")))
+
 # Configuration API
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
@@ -35,8 +54,15 @@ __all__ = [
     "DATA_CSV_PATH",
     "DATA_CSV_FULL_PATH",
     "RUNS_DIR",
+    "RUN_TIMEOUT_SECONDS",
+    "RUN_MAX_MEMORY_MB",
+    "RUN_EMBEDDED_WORKERS",
+    "RUN_WORKER_LEASE_SECONDS",
+    "CACHE_BACKEND",
+    "CACHE_DB_PATH",
     "API_HOST",
     "API_PORT",
+    "API_WORKERS",
     "CORS_ORIGINS",
     "BASE_DIR"
 ]
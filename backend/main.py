@@ -5,14 +5,31 @@ Point d'entrée principal de l'API
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from routers import strategies, runs, ai_analyst, ninja_strategies
+from services.json_response import FastJSONResponse
+from services.concurrency import shutdown_executors
+from services.analytics.montecarlo import shutdown_pool as shutdown_montecarlo_pool
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 app = FastAPI(
     title="NQ Backtest API",
     description="API pour lancer et monitorer des backtests NQ",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Compression des grosses réponses (résultats, trades ninja, OHLC)
+# Brotli si disponible (avec repli gzip intégré), sinon gzip
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=1000, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # Configuration CORS pour Next.js
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +51,13 @@ app.include_router(runs.router, prefix="/api/runs", tags=["runs"])
 app.include_router(ai_analyst.router, prefix="/api/ai", tags=["ai_analyst"])
 app.include_router(ninja_strategies.router, prefix="/api/ninja-strategies", tags=["ninja_strategies"])
 
+@app.on_event("shutdown")
+def shutdown():
+    """Arrêt propre des executors de calcul et des workers de backtest"""
+    shutdown_executors()
+    shutdown_montecarlo_pool()
+    runs.shutdown_runner()
+
 @app.get("/")
 def root():
     """Health check"""
@@ -0,0 +1,20 @@
+"""
+Modèles Pydantic pour les stratégies Ninja Trader
+"""
+
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+
+
+class NinjaPortfolioStrategy(BaseModel):
+    """Stratégie (export CSV) incluse dans un portefeuille"""
+    id: str  # Chemin de l'export sans extension (ex: MNQ/Opr-trade)
+    weight: float = 1.0  # Multiplicateur de contrats (PnL et exposition)
+
+
+class NinjaPortfolioRequest(BaseModel):
+    """Requête de portefeuille combiné de plusieurs exports"""
+    strategies: List[NinjaPortfolioStrategy]
+    start_date: Optional[str] = None  # YYYY-MM-DD (heure de sortie)
+    end_date: Optional[str] = None
+    margins: Dict[str, float] = {}  # Marge par contrat (USD) par racine d'instrument (ex: {"MNQ": 2000})
@@ -7,11 +7,24 @@ from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
+class WalkForwardConfig(BaseModel):
+    """Configuration d'un run en mode walk-forward"""
+    param_grid: Dict[str, List[Any]]  # Variable de configuration du script -> valeurs testées
+    in_sample_days: int = 120
+    out_of_sample_days: int = 20
+    step_days: Optional[int] = None  # Défaut: out_of_sample_days
+    objective: str = "net_pnl"  # net_pnl | sharpe | profit_factor | expectancy | pnl_drawdown
+    min_trades: int = 1  # Trades in-sample minimum pour qu'une combinaison soit retenue
+    max_workers: Optional[int] = None  # Processus de simulation (défaut: nombre de cœurs)
+
+
 class RunRequest(BaseModel):
     """Requête pour créer un run"""
     strategy_id: str
     parameters: Dict[str, Any] = {}
     name: Optional[str] = None  # Nom optionnel du backtest
+    walk_forward: Optional[WalkForwardConfig] = None
+    force: bool = False  # Ré-exécuter même si un run identique est déjà terminé
 
 
 class RunResponse(BaseModel):
@@ -21,18 +34,20 @@ class RunResponse(BaseModel):
     message: str
     name: Optional[str] = None
     started_at: Optional[str] = None
+    reused_from: Optional[str] = None  # Run identique dont le résultat a été réutilisé
 
 
 class RunStatus(BaseModel):
     """Statut d'un run"""
     run_id: str
-    status: str  # running | completed | failed
+    status: str  # running | completed | failed | cancelled
     progress: float = 0.0
     message: str = ""
     name: Optional[str] = None
     logs: List[str] = []
     started_at: Optional[str] = None
     completed_at: Optional[str] = None
+    reused_from: Optional[str] = None
 
 
 class RunInfo(BaseModel):
@@ -68,6 +83,26 @@ class RunMetrics(BaseModel):
     gross_loss: float
 
 
+class RiskMetrics(BaseModel):
+    """Métriques de risque étendues (PnL journalier, montants en USD)"""
+    trading_days: int = 0
+    sharpe_ratio: Optional[float] = None
+    sortino_ratio: Optional[float] = None
+    annual_pnl: Optional[float] = None
+    calmar_ratio: Optional[float] = None  # 36 derniers mois
+    mar_ratio: Optional[float] = None  # Toute la période
+    ulcer_index: Optional[float] = None
+    max_drawdown_daily: Optional[float] = None
+    longest_drawdown_days: int = 0  # Jours de trading sous l'eau
+    longest_drawdown_calendar_days: int = 0
+    time_under_water: Optional[float] = None  # Fraction des jours sous le plus haut
+    max_consecutive_wins: int = 0
+    max_consecutive_losses: int = 0
+    best_day: Optional[float] = None
+    worst_day: Optional[float] = None
+    r_multiples: Optional[Dict[str, Any]] = None  # count, mean, std, percentiles, histogram
+
+
 class Trade(BaseModel):
     """Détails d'un trade"""
     id: int
@@ -87,7 +122,37 @@ class RunResults(BaseModel):
     run_id: str
     strategy: str
     metrics: RunMetrics
+    risk_metrics: Optional[RiskMetrics] = None
     equity_curve: List[float]
     drawdown_curve: List[float]
+    equity_curve_index: Optional[List[int]] = None  # Indices d'origine si sous-échantillonnée
+    drawdown_curve_index: Optional[List[int]] = None
     trades: List[Trade] = []
     files: List[str] = []
+    walk_forward: Optional[Dict[str, Any]] = None  # Fenêtres et équité OOS (mode walk-forward)
+
+
+class RunCompareRequest(BaseModel):
+    """Requête de comparaison multi-runs"""
+    run_ids: List[str]
+    weights: Dict[str, float] = {}  # Poids par run pour le portefeuille combiné (défaut 1.0)
+
+
+class RunMonteCarloRequest(BaseModel):
+    """Requête de simulation Monte Carlo sur les trades d'un run"""
+    methods: List[str] = ["iid", "block", "shuffle"]
+    simulations: int = 10000
+    ruin_loss: Optional[float] = None  # Perte cumulée (USD) considérée comme la ruine
+    seed: Optional[int] = None  # Graine fixée: résultat reproductible et mis en cache
+
+
+class RunLeaderboardRequest(BaseModel):
+    """Classement multi-runs (entrepôt des runs terminés)"""
+    order_by: str = "net_pnl"  # net_pnl, profit_factor, win_rate, expectancy, max_drawdown, trades
+    descending: bool = True
+    limit: int = 50
+    strategy: Optional[str] = None
+    parameters: Dict[str, Any] = {}  # Filtres exacts sur les paramètres du run
+    start_date: Optional[str] = None  # Métriques recalculées sur les trades de la période (YYYY-MM-DD)
+    end_date: Optional[str] = None
+    min_trades: int = 1
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
-import pandas as pd
-import numpy as np
+from typing import Dict, Any, Optional, Tuple
 import json
-from datetime import datetime, timedelta
-import os
+from datetime import datetime
+import time
 from pathlib import Path
+from services.concurrency import run_analytics
+from services.analytics.metrics import trades_risk_metrics
+from services.analytics.dsl import METRIC_LABELS, QueryPlan, compile_question, normalize
+from services.analytics.query import run_plan, summarize_trades
 
 router = APIRouter()
 
@@ -20,102 +22,170 @@ class ChatResponse(BaseModel):
     metadata: Optional[Dict[str, Any]] = {}
     
 class DataAnalyst:
-    """Expert en analyse de données de trading"""
+    """Expert en analyse de données de trading (réponses calculées sur les trades des runs)"""
     
     def __init__(self):
-        self.base_path = Path(__file__).parent.parent.parent / 'backend_runs'
         self.data_path = Path(__file__).parent.parent / 'data'
+    
+    @staticmethod
+    def _runner():
+        from routers.runs import get_runner
+        return get_runner()
         
-    def analyze_query(self, query: str, context: Dict[str, Any]) -> str:
-        """Analyse la requête et génère une réponse appropriée"""
-        query_lower = query.lower()
+    def analyze_query(self, query: str, context: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Compile la question en plan (services.analytics.dsl) et y répond
+        Retourne le texte markdown et les métadonnées (plan, résultat calculé)
+        """
+        plan = compile_question(query)
         
-        # Analyse de performances
-        if any(word in query_lower for word in ['performance', 'pnl', 'profit', 'loss', 'backtest']):
-            return self._analyze_performance(context)
-            
-        # Analyse de volatilité
-        if any(word in query_lower for word in ['volatilité', 'volatility', 'vol', 'risk']):
-            return self._analyze_volatility()
-            
-        # Génération de code
-        if any(word in query_lower for word in ['code', 'script', 'python', 'générer', 'sharpe', 'calmar']):
-            return self._generate_code(query_lower)
-            
-        # Distribution temporelle
-        if any(word in query_lower for word in ['heure', 'hour', 'temps', 'time', 'distribution']):
-            return self._analyze_temporal()
-            
-        return self._default_response(query)
+        if plan.intent == "code":
+            return self._generate_code(normalize(query)), {"plan": plan.to_dict()}
+        if plan.intent == "volatility":
+            return self._analyze_volatility(), {"plan": plan.to_dict()}
+        
+        run_id = context.get('run_id') or self._latest_run_id()
+        if not run_id:
+            return "📊 Aucun backtest terminé trouvé. Lancez un backtest d'abord.", {"plan": plan.to_dict()}
+        
+        if plan.intent == "performance":
+            return self._analyze_performance({'run_id': run_id}), {"run_id": run_id, "plan": plan.to_dict()}
+        if plan.intent == "query":
+            return self._run_plan(run_id, plan)
+        return self._default_response(query), {"run_id": run_id, "plan": plan.to_dict()}
+    
+    def _latest_run_id(self) -> Optional[str]:
+        """Dernier run terminé"""
+        completed = [r for r in self._runner().list_runs() if r.status == 'completed']
+        return completed[0].run_id if completed else None
+    
+    def _check_run(self, run_id: str) -> Optional[str]:
+        """Message d'erreur si le run n'existe pas ou n'est pas terminé"""
+        status = self._runner().get_status(run_id)
+        if not status:
+            return "❌ Run non trouvé. Vérifiez l'ID du backtest."
+        if status.status != 'completed':
+            return f"⏳ Le run {run_id[:8]} n'est pas terminé (statut: {status.status})."
+        return None
+    
+    def _run_plan(self, run_id: str, plan: QueryPlan) -> Tuple[str, Dict[str, Any]]:
+        """Exécute un plan sur les trades d'un run (colonnes et résultat mis en cache)"""
+        metadata = {"run_id": run_id, "plan": plan.to_dict()}
+        error = self._check_run(run_id)
+        if error:
+            return error, metadata
+        
+        try:
+            result = run_plan(self._runner(), run_id, plan)
+        except ValueError as e:
+            return f"❌ {e}", metadata
+        
+        metadata["result"] = result
+        if not result or not result["rows"]:
+            return f"📊 Aucun trade ne correspond à la requête ({plan.describe()}).", metadata
+        
+        def cell(metric, value):
+            if value is None:
+                return "n/a"
+            if metric == "trades":
+                return str(int(value))
+            if metric == "win_rate":
+                return f"{value * 100:.1f}%"
+            if metric == "profit_factor":
+                return f"{value:.2f}"
+            return f"${value:,.2f}"
+        
+        rows = result["rows"]
+        metrics = plan.metrics
+        lines = [
+            f"## 🔎 {plan.describe()[0].upper()}{plan.describe()[1:]} - Run {run_id[:8]}",
+            "",
+            f"*{result['matched']} trades sur {result['total']} correspondent aux filtres*",
+            "",
+            "| Groupe | " + " | ".join(METRIC_LABELS[m] for m in metrics) + " |",
+            "|---|" + "---|" * len(metrics),
+        ]
+        for row in rows:
+            lines.append(f"| {row['key']} | " + " | ".join(cell(m, row[m]) for m in metrics) + " |")
+        
+        # Meilleur / pire groupe selon la première métrique de valeur demandée
+        ranked = next((m for m in metrics if m != "trades"), None)
+        scored = [r for r in rows if ranked and r[ranked] is not None]
+        if len(scored) > 1:
+            best = max(scored, key=lambda r: r[ranked])
+            worst = min(scored, key=lambda r: r[ranked])
+            lines += [
+                "",
+                "### 📌 Points clés",
+                f"- **Meilleur groupe** ({METRIC_LABELS[ranked]}): {best['key']} ({cell(ranked, best[ranked])} sur {best['trades']} trades)",
+                f"- **Pire groupe** ({METRIC_LABELS[ranked]}): {worst['key']} ({cell(ranked, worst[ranked])} sur {worst['trades']} trades)",
+            ]
+        if result["excluded"]:
+            lines.append(f"- ⚠️ {result['excluded']} trades sans valeur pour ce regroupement exclus")
+        return "\n".join(lines), metadata
         
     def _analyze_performance(self, context: Dict[str, Any]) -> str:
-        """Analyse les performances d'un backtest"""
-        run_id = context.get('run_id')
+        """Analyse les performances d'un backtest (métriques et métriques de risque du run)"""
+        run_id = context.get('run_id') or self._latest_run_id()
         if not run_id:
-            return self._get_latest_run_performance()
-            
+            return "📊 Aucun backtest terminé trouvé. Lancez un backtest d'abord."
+        
         try:
-            run_path = self.base_path / run_id
-            if not run_path.exists():
-                return "❌ Run non trouvé. Vérifiez l'ID du backtest."
-                
-            trades_file = run_path / 'trades.csv'
-            if trades_file.exists():
-                trades_df = pd.read_csv(trades_file)
-                
-                total_trades = len(trades_df)
-                if total_trades == 0:
-                    return "📊 Aucun trade dans ce backtest."
-                    
-                winning_trades = len(trades_df[trades_df['pnl'] > 0])
-                win_rate = (winning_trades / total_trades) * 100
-                total_pnl = trades_df['pnl'].sum()
-                avg_pnl = trades_df['pnl'].mean()
-                max_win = trades_df['pnl'].max()
-                max_loss = trades_df['pnl'].min()
-                
-                cumulative_pnl = trades_df['pnl'].cumsum()
-                running_max = cumulative_pnl.expanding().max()
-                drawdown = (cumulative_pnl - running_max)
-                max_drawdown = drawdown.min()
-                
-                if trades_df['pnl'].std() > 0:
-                    sharpe = (avg_pnl / trades_df['pnl'].std()) * np.sqrt(252)
-                else:
-                    sharpe = 0
-                    
-                return f"""## 📊 Analyse des Performances - Run {run_id[:8]}
-
-### 📈 Métriques Principales
-- **Total Trades**: {total_trades}
-- **Win Rate**: {win_rate:.1f}% ({winning_trades}W / {total_trades - winning_trades}L)
-- **PnL Total**: ${total_pnl:,.2f}
-- **PnL Moyen**: ${avg_pnl:,.2f}
-
-### 💰 Distribution des Gains
-- **Plus Gros Gain**: ${max_win:,.2f}
-- **Plus Grosse Perte**: ${max_loss:,.2f}
-
-### 📉 Gestion du Risque
-- **Max Drawdown**: ${max_drawdown:,.2f}
-- **Sharpe Ratio**: {sharpe:.2f}"""
-                
-        except Exception as e:
-            return f"❌ Erreur lors de l'analyse: {str(e)}"
+            error = self._check_run(run_id)
+            if error:
+                return error
             
-    def _get_latest_run_performance(self) -> str:
-        """Récupère les performances du dernier run"""
-        try:
-            runs = [d for d in self.base_path.iterdir() if d.is_dir()]
-            if not runs:
-                return "📊 Aucun backtest trouvé. Lancez un backtest d'abord."
-                
-            latest_run = max(runs, key=lambda x: x.stat().st_mtime)
-            run_id = latest_run.name
-            return self._analyze_performance({'run_id': run_id})
+            runner = self._runner()
+            results = runner.get_results(run_id) or {}
+            metrics = results.get('metrics') or {}
+            if not metrics.get('total_trades'):
+                return "📊 Aucun trade dans ce backtest."
+            
+            risk = results.get('risk_metrics')
+            if risk is None:
+                risk = runner.get_run_analytics(run_id, "risk_metrics", trades_risk_metrics) or {}
+            summary = runner.get_run_analytics(run_id, "trades_summary", summarize_trades) or {}
             
+            def ratio(key):
+                value = risk.get(key)
+                return f"{value:.2f}" if value is not None else "n/a"
+            
+            lines = [
+                f"## 📊 Analyse des Performances - Run {run_id[:8]}",
+                "",
+                "### 📈 Métriques Principales",
+                f"- **Total Trades**: {metrics['total_trades']}",
+                f"- **Win Rate**: {metrics.get('win_rate', 0) * 100:.1f}% "
+                f"({metrics.get('winning_trades', 0)}W / {metrics.get('losing_trades', 0)}L)",
+                f"- **PnL Total**: ${metrics.get('net_pnl', 0):,.2f}",
+                f"- **Expectancy**: ${metrics.get('expectancy', 0):,.2f} par trade",
+                f"- **Profit Factor**: {metrics.get('profit_factor', 0):.2f}",
+                "",
+                "### 💰 Distribution des Gains",
+                f"- **Gain moyen**: ${metrics.get('avg_win', 0):,.2f} / **Perte moyenne**: ${metrics.get('avg_loss', 0):,.2f}",
+            ]
+            if summary:
+                lines += [
+                    f"- **Plus Gros Gain**: ${summary['best_trade']['pnl_usd']:,.2f} ({summary['best_trade']['date']})",
+                    f"- **Plus Grosse Perte**: ${summary['worst_trade']['pnl_usd']:,.2f} ({summary['worst_trade']['date']})",
+                ]
+                for row in summary["by_direction"]:
+                    lines.append(f"- **{row['key']}**: {row['trades']} trades, ${row['total_pnl']:,.2f}, "
+                                 f"win rate {row['win_rate'] * 100:.1f}%")
+            lines += [
+                "",
+                "### 📉 Gestion du Risque",
+                f"- **Max Drawdown**: ${metrics.get('max_drawdown', 0):,.2f}",
+                f"- **Sharpe Ratio** (journalier annualisé): {ratio('sharpe_ratio')}",
+                f"- **Sortino Ratio**: {ratio('sortino_ratio')}",
+                f"- **Calmar Ratio**: {ratio('calmar_ratio')}",
+            ]
+            if risk.get('max_consecutive_losses') is not None:
+                lines.append(f"- **Pertes consécutives max**: {risk['max_consecutive_losses']}")
+            return "\n".join(lines)
+                
         except Exception as e:
-            return f"❌ Erreur: {str(e)}"
+            return f"❌ Erreur lors de l'analyse: {str(e)}"
             
     def _analyze_volatility(self) -> str:
         """Analyse la volatilité des données"""
@@ -163,8 +233,8 @@ def calculate_sharpe_ratio(returns, risk_free_rate=0.02, periods=252):
     return sharpe
 
 # Utilisation
-df = pd.read_csv('trades.csv')
-df['returns'] = df['pnl'] / 50000  # Capital initial
+df = pd.read_csv('opr_trades_1R_param.csv')  # CSV de trades écrit par la stratégie
+df['returns'] = df['pnl_usd'] / 50000  # Capital initial
 sharpe = calculate_sharpe_ratio(df['returns'])
 print(f"Sharpe Ratio: {sharpe:.2f}")
 ```
@@ -191,8 +261,8 @@ def calculate_calmar_ratio(pnl_series):
     calmar = total_return / max_drawdown
     return calmar
 
-df = pd.read_csv('trades.csv')
-calmar = calculate_calmar_ratio(df['pnl'])
+df = pd.read_csv('opr_trades_1R_param.csv')  # CSV de trades écrit par la stratégie
+calmar = calculate_calmar_ratio(df['pnl_usd'])
 print(f"Calmar Ratio: {calmar:.2f}")
 ```"""
         else:
@@ -203,51 +273,28 @@ import pandas as pd
 import numpy as np
 
 class BacktestAnalyzer:
-    def __init__(self, trades_file='trades.csv'):
+    def __init__(self, trades_file='opr_trades_1R_param.csv'):
         self.df = pd.read_csv(trades_file)
         
     def compute_metrics(self):
         metrics = {
             'total_trades': len(self.df),
-            'win_rate': (self.df['pnl'] > 0).mean(),
-            'avg_pnl': self.df['pnl'].mean(),
-            'total_pnl': self.df['pnl'].sum(),
+            'win_rate': (self.df['pnl_usd'] > 0).mean(),
+            'avg_pnl': self.df['pnl_usd'].mean(),
+            'total_pnl': self.df['pnl_usd'].sum(),
             'sharpe': self._calculate_sharpe()
         }
         return metrics
     
     def _calculate_sharpe(self):
-        if self.df['pnl'].std() > 0:
-            return (self.df['pnl'].mean() / self.df['pnl'].std()) * np.sqrt(252)
+        if self.df['pnl_usd'].std() > 0:
+            return (self.df['pnl_usd'].mean() / self.df['pnl_usd'].std()) * np.sqrt(252)
         return 0
 
 analyzer = BacktestAnalyzer()
 print(analyzer.compute_metrics())
 ```"""
 
-    def _analyze_temporal(self) -> str:
-        """Analyse la distribution temporelle"""
-        return """## ⏰ Distribution Temporelle
-
-### Code d'Analyse
-```python
-df = pd.read_csv('trades.csv')
-df['timestamp'] = pd.to_datetime(df['timestamp'])
-df['hour'] = df['timestamp'].dt.hour
-
-hourly_stats = df.groupby('hour')['pnl'].agg(['sum', 'mean', 'count'])
-best_hour = hourly_stats['sum'].idxmax()
-worst_hour = hourly_stats['sum'].idxmin()
-
-print(f"Meilleure heure: {best_hour}h UTC")
-print(f"Pire heure: {worst_hour}h UTC")
-```
-
-### Insights
-- **14h-16h UTC**: Haute volatilité (ouverture US)
-- **17h-19h UTC**: Session calme
-- **Focus**: Heures avec meilleur risk/reward"""
-            
     def _default_response(self, query: str) -> str:
         """Réponse par défaut"""
         return f"""## 🔍 Analyse en cours...
@@ -256,9 +303,12 @@ Je traite votre requête: "{query}"
 
 Essayez des questions spécifiques comme:
 - "Analyse les performances du dernier backtest"
+- "Win rate par heure pour les shorts en Q1"
+- "PnL moyen par jour de la semaine en 2024"
+- "Profit factor par largeur d'OPR en 4 tranches"
+- "Drawdown par mois depuis 2024-08-01"
+- "Compare les trades long et short"
 - "Génère un code pour calculer le Sharpe ratio"
-- "Montre la distribution temporelle des trades"
-- "Analyse la volatilité récente"
 
 Je suis là pour vous aider à comprendre vos données de trading!"""
 
@@ -269,19 +319,29 @@ analyst = DataAnalyst()
 async def chat_with_analyst(request: ChatRequest):
     """Endpoint pour le chat avec l'IA analyst"""
     try:
-        response = analyst.analyze_query(request.message, request.context or {})
+        context = dict(request.context or {})
+        if request.run_id:
+            context['run_id'] = request.run_id
+        
+        # Lecture des trades et calculs pandas hors de la boucle d'événements
+        started = time.perf_counter()
+        response, metadata = await run_analytics(analyst.analyze_query, request.message, context)
         return ChatResponse(
             response=response,
-            metadata={"timestamp": datetime.now().isoformat()}
+            metadata={
+                **metadata,
+                "timestamp": datetime.now().isoformat(),
+                "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+            }
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/runs")
-async def get_available_runs():
+def get_available_runs():
     """Récupère la liste des runs disponibles"""
     try:
-        base_path = Path(__file__).parent.parent.parent / 'backend_runs'
+        base_path = DataAnalyst._runner().runs_dir
         runs = []
         
         for run_dir in base_path.iterdir():
@@ -295,7 +355,7 @@ async def get_available_runs():
                         'run_id': run_dir.name,
                         'strategy': config.get('strategy', 'Unknown'),
                         'timestamp': datetime.fromtimestamp(run_dir.stat().st_mtime).isoformat(),
-                        'status': 'completed' if (run_dir / 'trades.csv').exists() else 'incomplete'
+                        'status': 'completed' if (run_dir / 'results.json').exists() else 'incomplete'
                     })
         
         return {"runs": sorted(runs, key=lambda x: x['timestamp'], reverse=True)}
@@ -307,7 +367,7 @@ async def get_available_runs():
 async def get_run_summary(run_id: str):
     """Récupère le résumé d'un run spécifique"""
     try:
-        response = analyst.analyze_performance({'run_id': run_id})
+        response = await run_analytics(analyst._analyze_performance, {'run_id': run_id})
         return {"run_id": run_id, "summary": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
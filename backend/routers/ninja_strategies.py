@@ -4,7 +4,7 @@ Lit les fichiers CSV du dossier ninja_runs
 """
 
 from fastapi import APIRouter, HTTPException, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -12,6 +12,14 @@ from typing import List, Dict, Any, Optional
 import os
 import json
 from datetime import datetime
+from models.ninja import NinjaPortfolioRequest
+from services.analytics.excursions import DEFAULT_STEPS, MAX_STEPS, excursion_analysis
+from services.analytics.portfolio import combine_exports
+from services.json_response import FastJSONResponse
+from services.data.cache import create_cache
+from services.data.ninja import (
+    DATE_FORMAT, clean_numeric, export_manifest, load_range, overlaps, pnl_column, trade_columns
+)
 
 router = APIRouter()
 
@@ -19,120 +27,33 @@ router = APIRouter()
 BACKEND_PATH = Path(__file__).parent.parent
 NINJA_RUNS_PATH = BACKEND_PATH / "ninja_runs"
 
-
-def clean_for_json(obj):
-    """Nettoie récursivement un objet pour la sérialisation JSON"""
-    if isinstance(obj, dict):
-        return {k: clean_for_json(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [clean_for_json(item) for item in obj]
-    elif isinstance(obj, (np.integer, np.int64, np.int32)):
-        return int(obj)
-    elif isinstance(obj, (np.floating, np.float64, np.float32)):
-        if np.isnan(obj) or np.isinf(obj):
-            return None
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return clean_for_json(obj.tolist())
-    elif pd.isna(obj):
-        return None
-    elif isinstance(obj, (int, float, str, bool, type(None))):
-        if isinstance(obj, float) and (np.isnan(obj) or np.isinf(obj)):
-            return None
-        return obj
-    else:
-        return str(obj)
+# Réponses de /data par (fichier, mtime, taille, filtre de dates)
+_data_cache = create_cache("ninja_data", maxsize=32, ttl=3600)
 
 
 def calculate_strategy_stats(df: pd.DataFrame, filename: str = "") -> Dict[str, Any]:
-    """Calcule les statistiques de base d'une stratégie"""
-    
-    print(f"\n🔍 Analyse de {filename}")
-    print(f"   Colonnes disponibles: {list(df.columns)}")
-    print(f"   Nombre de lignes: {len(df)}")
-    
-    # Détection des colonnes pertinentes (flexible)
-    pnl_col = None
-    
-    # Essayer différentes variantes de noms de colonnes
-    possible_pnl_names = ['profit', 'pnl', 'bénéfice', 'p&l', 'pl', 'net', 'gain', 'loss', 'result']
-    
-    for col in df.columns:
-        col_lower = col.lower().strip()
-        for pnl_name in possible_pnl_names:
-            if pnl_name in col_lower:
-                pnl_col = col
-                print(f"   ✅ Colonne PnL trouvée: '{col}'")
-                break
-        if pnl_col:
-            break
-    
-    if pnl_col is None:
-        # Essayer de trouver une colonne numérique qui pourrait être le PnL
-        numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns.tolist()
-        print(f"   Colonnes numériques: {numeric_cols}")
-        if len(numeric_cols) > 0:
-            # Prendre la dernière colonne numérique (souvent le PnL)
-            pnl_col = numeric_cols[-1]
-            print(f"   ⚠️ Utilisation de la colonne numérique: '{pnl_col}'")
-    
+    """Calcule les statistiques de base d'une stratégie (export typé par services.data.ninja)"""
+    pnl_col = pnl_column(df)
     total_trades = len(df)
     
-    if pnl_col and pnl_col in df.columns:
-        print(f"   Échantillon de valeurs brutes: {df[pnl_col].head().tolist()}")
-        
-        # Nettoyer les valeurs : enlever $, €, espaces, remplacer virgule par point
-        def clean_pnl_value(val):
-            if pd.isna(val):
-                return None
-            val_str = str(val).strip()
-            # Enlever les symboles monétaires et espaces
-            val_str = val_str.replace('$', '').replace('€', '').replace(' ', '').replace(';', '')
-            # Remplacer virgule par point pour les décimales
-            val_str = val_str.replace(',', '.')
-            try:
-                return float(val_str)
-            except:
-                return None
-        
-        pnl_values = df[pnl_col].apply(clean_pnl_value).dropna()
-        print(f"   Échantillon de valeurs nettoyées: {pnl_values.head().tolist()}")
-        print(f"   Valeurs PnL après conversion: {len(pnl_values)} valeurs valides")
-        
-        if len(pnl_values) > 0:
-            total_pnl = float(pnl_values.sum())
-            winning_trades = len(pnl_values[pnl_values > 0])
-            losing_trades = len(pnl_values[pnl_values < 0])
-            winrate = (winning_trades / len(pnl_values) * 100) if len(pnl_values) > 0 else 0
-            print(f"   📊 Stats: PnL={total_pnl:.2f}, W={winning_trades}, L={losing_trades}, WR={winrate:.1f}%")
-        else:
-            total_pnl = 0
-            winning_trades = 0
-            losing_trades = 0
-            winrate = 0
+    if pnl_col is not None:
+        pnl_values = clean_numeric(df[pnl_col]).dropna().to_numpy()
+        pnl_values = pnl_values[np.isfinite(pnl_values)]
     else:
-        print(f"   ❌ Aucune colonne PnL trouvée!")
-        total_pnl = 0
-        winning_trades = 0
-        losing_trades = 0
-        winrate = 0
+        print(f"   ❌ {filename}: aucune colonne PnL trouvée!")
+        pnl_values = np.zeros(0)
     
-    # S'assurer que toutes les valeurs sont JSON-compatibles
-    def safe_value(val):
-        if val is None:
-            return 0
-        if isinstance(val, (int, float)):
-            if np.isnan(val) or np.isinf(val):
-                return 0
-            return val
-        return val
+    winning_trades = int((pnl_values > 0).sum())
+    losing_trades = int((pnl_values < 0).sum())
+    total_pnl = float(pnl_values.sum()) if len(pnl_values) else 0.0
+    winrate = winning_trades / len(pnl_values) * 100 if len(pnl_values) else 0.0
     
     return {
-        "total_trades": int(safe_value(total_trades)),
-        "total_pnl": round(float(safe_value(total_pnl)), 2),
-        "winning_trades": int(safe_value(winning_trades)),
-        "losing_trades": int(safe_value(losing_trades)),
-        "winrate": round(float(safe_value(winrate)), 2),
+        "total_trades": int(total_trades),
+        "total_pnl": round(total_pnl, 2),
+        "winning_trades": winning_trades,
+        "losing_trades": losing_trades,
+        "winrate": round(winrate, 2),
         "pnl_column": pnl_col
     }
 
@@ -172,58 +93,18 @@ def list_ninja_strategies(
         if market:
             csv_files = [(f, m) for f, m in csv_files if m == market]
         
+        # Dates min/max de chaque export (recalculées seulement si le CSV a changé)
+        manifest = export_manifest(NINJA_RUNS_PATH, [f for f, _ in csv_files])
+        
         for csv_file, market_name in csv_files:
             try:
-                # Lire le CSV avec détection automatique du séparateur
-                df = pd.read_csv(csv_file, sep=None, engine='python')
-                
-                # Filtrer par date si les paramètres sont fournis
-                if start_date or end_date:
-                    print(f"\n📅 Filtrage demandé pour {csv_file.name}: {start_date} -> {end_date}")
-                    print(f"   Colonnes disponibles: {list(df.columns)}")
-                    
-                    # Chercher la colonne de date (plusieurs noms possibles, en priorité "Heure")
-                    date_columns = [col for col in df.columns if 'heure' in col.lower() and 'sortie' in col.lower()]
-                    
-                    # Si pas trouvé, chercher d'autres colonnes de date
-                    if not date_columns:
-                        date_columns = [col for col in df.columns if any(x in col.lower() for x in ['date', 'heure', 'time'])]
-                    
-                    print(f"   Colonnes de date trouvées: {date_columns}")
-                    
-                    if date_columns:
-                        # Utiliser la première colonne de date trouvée (généralement "Heure de sortie")
-                        date_col = date_columns[0]
-                        print(f"   Utilisation de la colonne: {date_col}")
-                        
-                        try:
-                            # Convertir en datetime avec format français (DD/MM/YYYY)
-                            df[date_col] = pd.to_datetime(df[date_col], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-                            
-                            # Si ça n'a pas marché, essayer d'autres formats
-                            if df[date_col].isna().all():
-                                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                            
-                            print(f"   Lignes avant filtrage: {len(df)}")
-                            print(f"   Plage de dates dans les données: {df[date_col].min()} -> {df[date_col].max()}")
-                            
-                            # Filtrer par date de début
-                            if start_date:
-                                start_dt = pd.to_datetime(start_date)
-                                print(f"   Filtre début: {start_dt}")
-                                df = df[df[date_col] >= start_dt]
-                                print(f"   Lignes après filtre début: {len(df)}")
-                            
-                            # Filtrer par date de fin
-                            if end_date:
-                                end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1)  # Inclure toute la journée
-                                print(f"   Filtre fin: {end_dt}")
-                                df = df[df[date_col] < end_dt]
-                                print(f"   Lignes après filtre fin: {len(df)}")
-                        except Exception as e:
-                            print(f"   ❌ Erreur lors du filtrage de date: {e}")
-                    else:
-                        print(f"   ⚠️ Aucune colonne de date trouvée!")
+                entry = manifest.get(csv_file.relative_to(NINJA_RUNS_PATH).as_posix())
+                if entry is not None and not overlaps(entry, start_date, end_date):
+                    # Export entièrement hors de la plage: aucun trade, fichier non lu
+                    df = pd.DataFrame(columns=entry["columns"])
+                else:
+                    # Export parsé une seule fois (sidecar Parquet trié par date), plage par recherche dichotomique
+                    df = load_range(csv_file, start_date, end_date)
                 
                 # Calculer les stats sur les données filtrées
                 stats = calculate_strategy_stats(df, csv_file.name)
@@ -269,6 +150,98 @@ def list_ninja_strategies(
         )
 
 
+@router.post("/portfolio")
+def get_portfolio(request: NinjaPortfolioRequest):
+    """
+    Combine plusieurs exports en un seul portefeuille (fusion sur l'heure de sortie)
+    Équité et drawdown combinés, corrélation des PnL journaliers et exposition en marge
+    Chaque stratégie peut être pondérée (multiplicateur de contrats)
+    """
+    strategy_ids = [s.id for s in request.strategies]
+    if not strategy_ids:
+        raise HTTPException(
+            status_code=400,
+            detail="Au moins une stratégie est requise"
+        )
+    if len(set(strategy_ids)) != len(strategy_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="Chaque stratégie ne peut apparaître qu'une fois"
+        )
+    invalid = [s.id for s in request.strategies if s.weight <= 0]
+    if invalid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Poids invalide (doit être > 0) pour: {', '.join(invalid)}"
+        )
+    
+    csv_files = {}
+    for strategy_id in strategy_ids:
+        csv_file = NINJA_RUNS_PATH / f"{strategy_id}.csv"
+        if not csv_file.exists():
+            raise HTTPException(
+                status_code=404,
+                detail=f"Fichier {strategy_id}.csv non trouvé"
+            )
+        csv_files[strategy_id] = csv_file
+    
+    try:
+        columns = {
+            strategy_id: trade_columns(load_range(csv_file, request.start_date, request.end_date))
+            for strategy_id, csv_file in csv_files.items()
+        }
+        portfolio = combine_exports(
+            columns,
+            weights={s.id: s.weight for s in request.strategies},
+            margins=request.margins
+        )
+        portfolio["start_date"] = request.start_date
+        portfolio["end_date"] = request.end_date
+        return FastJSONResponse(content=portfolio)
+    
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du calcul du portefeuille: {str(e)}"
+        )
+
+
+@router.get("/{strategy_id:path}/excursions")
+def get_strategy_excursions(
+    strategy_id: str,
+    start_date: Optional[str] = Query(None, description="Date de début (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    steps: int = Query(DEFAULT_STEPS, ge=1, le=MAX_STEPS, description="Nombre de niveaux des grilles par défaut"),
+    stops: Optional[List[float]] = Query(None, description="Niveaux de stop (USD/contrat), répétable"),
+    targets: Optional[List[float]] = Query(None, description="Niveaux d'objectif (USD/contrat), répétable")
+):
+    """
+    Analyse MAE/MFE/ETD d'une stratégie
+    Nuage MAE/MFE, courbes stop optimal / objectif optimal et edge ratio
+    """
+    csv_file = NINJA_RUNS_PATH / f"{strategy_id}.csv"
+    
+    if not csv_file.exists():
+        raise HTTPException(
+            status_code=404,
+            detail=f"Fichier {strategy_id}.csv non trouvé"
+        )
+    
+    try:
+        df = load_range(csv_file, start_date, end_date)
+        analysis = excursion_analysis(df, stops=stops, targets=targets, steps=steps)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'analyse des excursions: {str(e)}"
+        )
+    
+    analysis.update({"id": strategy_id, "start_date": start_date, "end_date": end_date})
+    return FastJSONResponse(content=analysis)
+
+
 @router.get("/{strategy_id:path}/download")
 def download_strategy_csv(strategy_id: str):
     """
@@ -291,15 +264,61 @@ def download_strategy_csv(strategy_id: str):
     )
 
 
+def _display_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Trades en liste de dicts: dates au format de l'export, NaN/inf remplacés par None"""
+    display = df.copy()
+    for col in display.select_dtypes(include="datetime").columns:
+        display[col] = display[col].dt.strftime(DATE_FORMAT)
+    numeric = display.select_dtypes(include="number").columns
+    display[numeric] = display[numeric].replace([np.inf, -np.inf], np.nan)
+    display = display.astype(object).where(display.notna(), None)
+    return display.to_dict('records')
+
+
+def _equity_curve(df: pd.DataFrame, pnl_col: Optional[str]) -> List[Dict[str, Any]]:
+    """Équité cumulée trade par trade (numéro de ligne de l'export, PnL invalides ignorés)"""
+    if not pnl_col or pnl_col not in df.columns:
+        return []
+    pnl = clean_numeric(df[pnl_col]).to_numpy()
+    valid = np.isfinite(pnl)
+    equity = np.round(np.cumsum(pnl[valid]), 2)
+    trade = np.asarray(df.index)[valid] + 1
+    return [{"trade": int(t), "equity": float(e)} for t, e in zip(trade.tolist(), equity.tolist())]
+
+
+def _strategy_data(csv_file: Path, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Any]:
+    """Stats, trades et courbe d'équité d'un export (mis en cache par fichier et filtre de dates)"""
+    st = csv_file.stat()
+    cache_key = (str(csv_file.resolve()), st.st_mtime_ns, st.st_size, start_date, end_date)
+    cached = _data_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # Export parsé une seule fois (sidecar Parquet trié par date), plage par recherche dichotomique
+    df = load_range(csv_file, start_date, end_date)
+    stats = calculate_strategy_stats(df, csv_file.name)
+    data = {
+        "stats": stats,
+        "columns": list(df.columns),
+        "trades": _display_records(df),
+        "equity_curve": _equity_curve(df, stats.get('pnl_column')),
+    }
+    _data_cache.set(cache_key, data)
+    return data
+
+
 @router.get("/{strategy_id:path}/data")
 def get_strategy_data(
     strategy_id: str,
     start_date: Optional[str] = Query(None, description="Date de début (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="Date de fin (YYYY-MM-DD)")
+    end_date: Optional[str] = Query(None, description="Date de fin (YYYY-MM-DD)"),
+    offset: int = Query(0, ge=0, description="Index du premier trade retourné"),
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Nombre de trades retournés (tous par défaut)")
 ):
     """
     Récupère les données détaillées d'une stratégie
-    Peut filtrer par plage de dates
+    Peut filtrer par plage de dates et paginer la liste des trades
+    (stats et courbe d'équité portent toujours sur toute la période filtrée)
     Supporte les chemins avec marché (ex: NQ/Strategy1)
     """
     csv_file = NINJA_RUNS_PATH / f"{strategy_id}.csv"
@@ -311,128 +330,27 @@ def get_strategy_data(
         )
     
     try:
-        # Lire le CSV avec détection automatique du séparateur
-        df = pd.read_csv(csv_file, sep=None, engine='python')
-        
-        # Filtrer par date si les paramètres sont fournis
-        if start_date or end_date:
-            print(f"\n📅 Filtrage demandé pour {csv_file.name}: {start_date} -> {end_date}")
-            
-            # Chercher la colonne de date
-            date_columns = [col for col in df.columns if 'heure' in col.lower() and 'sortie' in col.lower()]
-            if not date_columns:
-                date_columns = [col for col in df.columns if any(x in col.lower() for x in ['date', 'heure', 'time'])]
-            
-            if date_columns:
-                date_col = date_columns[0]
-                print(f"   Utilisation de la colonne: {date_col}")
-                
-                try:
-                    # Convertir en datetime
-                    df[date_col] = pd.to_datetime(df[date_col], format='%d/%m/%Y %H:%M:%S', errors='coerce')
-                    if df[date_col].isna().all():
-                        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                    
-                    print(f"   Lignes avant filtrage: {len(df)}")
-                    
-                    # Filtrer
-                    if start_date:
-                        start_dt = pd.to_datetime(start_date)
-                        df = df[df[date_col] >= start_dt]
-                    if end_date:
-                        end_dt = pd.to_datetime(end_date) + pd.Timedelta(days=1)
-                        df = df[df[date_col] < end_dt]
-                    
-                    print(f"   Lignes après filtrage: {len(df)}")
-                except Exception as e:
-                    print(f"   ❌ Erreur filtrage: {e}")
-        
-        stats = calculate_strategy_stats(df, csv_file.name)
-        
-        # Debug: vérifier les valeurs des colonnes problématiques
-        print(f"\n🔍 Vérification des colonnes:")
-        col_prix_entree = "Prix d'entrée"
-        col_heure_entree = "Heure d'entrée"
-        col_prix_sortie = "Prix de sortie"
-        
-        if col_prix_entree in df.columns:
-            print(f"   Prix d'entrée - Valeurs uniques: {df[col_prix_entree].unique()[:5]}")
-        else:
-            print(f"   ⚠️ Colonne '{col_prix_entree}' non trouvée")
-            
-        if col_heure_entree in df.columns:
-            print(f"   Heure d'entrée - Valeurs uniques: {df[col_heure_entree].unique()[:5]}")
-        else:
-            print(f"   ⚠️ Colonne '{col_heure_entree}' non trouvée")
-            
-        if col_prix_sortie in df.columns:
-            print(f"   Prix de sortie - Valeurs uniques: {df[col_prix_sortie].unique()[:5]}")
-        else:
-            print(f"   ⚠️ Colonne '{col_prix_sortie}' non trouvée")
-        
-        # Convertir le DataFrame en liste de dictionnaires
-        # Remplacer NaN et Infinity par None pour la sérialisation JSON
-        df_clean = df.copy()
-        df_clean = df_clean.replace([np.inf, -np.inf], None)
-        df_clean = df_clean.where(pd.notna(df_clean), None)
-        
-        # Convertir en dictionnaire
-        trades = df_clean.to_dict('records')
-        
-        # Nettoyer les valeurs pour s'assurer qu'elles sont JSON-compatibles
-        for trade in trades:
-            for key, value in trade.items():
-                if isinstance(value, (np.integer, np.floating)):
-                    if np.isnan(value) or np.isinf(value):
-                        trade[key] = None
-                    else:
-                        trade[key] = float(value) if isinstance(value, np.floating) else int(value)
-        
-        # Générer la courbe d'équité
-        pnl_col = stats.get('pnl_column')
-        equity_curve = []
-        if pnl_col and pnl_col in df.columns:
-            # Fonction de nettoyage des valeurs PnL
-            def clean_pnl_value(val):
-                if pd.isna(val):
-                    return None
-                val_str = str(val).strip()
-                val_str = val_str.replace('$', '').replace('€', '').replace(' ', '').replace(';', '')
-                val_str = val_str.replace(',', '.')
-                try:
-                    return float(val_str)
-                except:
-                    return None
-            
-            cumulative_pnl = 0
-            for idx, row in df.iterrows():
-                pnl = clean_pnl_value(row[pnl_col])
-                if pnl is not None and not np.isnan(pnl) and not np.isinf(pnl):
-                    cumulative_pnl += pnl
-                    # Vérifier que cumulative_pnl est valide
-                    if not np.isnan(cumulative_pnl) and not np.isinf(cumulative_pnl):
-                        equity_curve.append({
-                            "trade": int(idx) + 1,
-                            "equity": round(float(cumulative_pnl), 2)
-                        })
-        
-        # Préparer la réponse et la nettoyer
-        response_data = {
-            "id": strategy_id,
-            "name": strategy_id,
-            "stats": stats,
-            "trades": trades,
-            "columns": list(df.columns),
-            "equity_curve": equity_curve
-        }
-        
-        # Nettoyer toutes les valeurs pour JSON
-        cleaned_data = clean_for_json(response_data)
-        
-        return JSONResponse(content=cleaned_data)
-    
+        data = _strategy_data(csv_file, start_date, end_date)
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la lecture du fichier: {str(e)}"
         )
+    
+    trades = data["trades"]
+    end = len(trades) if limit is None else offset + limit
+    
+    # Préparer la réponse
+    response_data = {
+        "id": strategy_id,
+        "name": strategy_id,
+        "stats": data["stats"],
+        "trades": trades[offset:end],
+        "total_trades": len(trades),
+        "offset": offset,
+        "limit": limit,
+        "columns": data["columns"],
+        "equity_curve": data["equity_curve"]
+    }
+    
+    return FastJSONResponse(content=response_data)
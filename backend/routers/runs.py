@@ -3,15 +3,30 @@ Router pour les runs de backtest
 Utilise le système runner existant
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
+from typing import Optional
 import sys
 import uuid
+import asyncio
 from datetime import datetime
 from models.run import (
     RunRequest, RunResponse, RunStatus, RunListResponse, 
-    RunResults, RunInfo, RunMetrics, Trade
+    RunResults, RunInfo, RunMetrics, RiskMetrics, Trade, RunCompareRequest,
+    RunMonteCarloRequest, RunLeaderboardRequest
 )
+from services.analytics.compare import compare_runs
+from services.analytics.downsample import downsample_curve, downsample_ohlc, lttb_indices
+from services.analytics.metrics import trades_risk_metrics
+from services.analytics.montecarlo import METHODS as MONTECARLO_METHODS, MAX_SIMULATIONS, monte_carlo
+from services.analytics.time_of_day import time_of_day_profile
+from services.arrow_response import ArrowResponse, wants_arrow
+from services.concurrency import run_analytics_response
+from services.data.bars import TIMEFRAMES, get_ohlc
+from services.data.cache import create_cache
+from services.data.manifest import get_manifest, trading_days_between
 
 # Chemins vers les services backend
 BACKEND_PATH = Path(__file__).parent.parent
@@ -29,6 +44,9 @@ router = APIRouter()
 # Instance globale du runner (sera initialisée au premier appel)
 _runner = None
 
+# Statuts terminaux (plus de logs à attendre)
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
 def get_runner():
     """Récupère l'instance du runner (singleton)"""
     global _runner
@@ -38,10 +56,54 @@ def get_runner():
                 status_code=500,
                 detail="Module run_backtest non disponible"
             )
-        _runner = create_runner(str(BACKEND_PATH))
+        from config import RUN_EMBEDDED_WORKERS, RUN_WORKER_LEASE_SECONDS
+        _runner = create_runner(
+            str(BACKEND_PATH),
+            embedded_workers=RUN_EMBEDDED_WORKERS,
+            lease_seconds=RUN_WORKER_LEASE_SECONDS
+        )
     return _runner
 
 
+def shutdown_runner():
+    """Arrête les workers intégrés (les runs en cours se terminent, aucun nouveau n'est réclamé)"""
+    if _runner is not None:
+        _runner.stop_workers()
+
+
+def _validate_run_dates(parameters):
+    """Rejette un run dont la période START_DATE/END_DATE ne contient aucun jour de données"""
+    start_date = parameters.get('START_DATE')
+    end_date = parameters.get('END_DATE')
+    if not start_date or not end_date:
+        return
+    
+    try:
+        # Jamais de lecture complète du CSV ici: manifest absent ou périmé -> construit en arrière-plan
+        _, manifest = _get_dataset_manifest(background=True)
+    except Exception as e:
+        print(f"⚠️ Manifest indisponible, validation des dates ignorée: {e}")
+        return
+    
+    if not manifest or not manifest.get("trading_days"):
+        return
+    
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Période invalide: {start_date} > {end_date}"
+        )
+    
+    if trading_days_between(manifest, start_date, end_date) == 0:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Aucune donnée entre {start_date} et {end_date} "
+                f"(données disponibles de {manifest['trading_days'][0]} à {manifest['trading_days'][-1]})"
+            )
+        )
+
+
 @router.post("", response_model=RunResponse)
 def create_run(request: RunRequest, background_tasks: BackgroundTasks):
     """
@@ -64,21 +126,11 @@ def create_run(request: RunRequest, background_tasks: BackgroundTasks):
         logger.info(f"✅ Runner obtenu: {runner}")
         
         # Importer discover pour récupérer les stratégies
-        from discover import get_available_strategies
+        from discover import get_strategy_by_id
         logger.info(f"✅ Import discover OK")
         
-        # Récupérer la liste des stratégies
-        strategies = get_available_strategies(str(BACKEND_PATH))
-        logger.info(f"✅ {len(strategies)} stratégies trouvées")
-        
-        # Trouver la stratégie correspondante
-        strategy = None
-        for s in strategies:
-            strategy_id = s['name'].lower().replace(' ', '_').replace('-', '_')
-            logger.debug(f"  Comparaison: {strategy_id} == {request.strategy_id} ?")
-            if strategy_id == request.strategy_id:
-                strategy = s
-                break
+        # Recherche directe dans l'index des stratégies (découverte mise en cache)
+        strategy = get_strategy_by_id(str(BACKEND_PATH), request.strategy_id)
         
         if not strategy:
             logger.error(f"❌ Stratégie non trouvée: {request.strategy_id}")
@@ -88,20 +140,51 @@ def create_run(request: RunRequest, background_tasks: BackgroundTasks):
             )
         
         logger.info(f"✅ Stratégie trouvée: {strategy['name']}")
+        
+        # Validation des dates demandées contre le manifest du dataset (avant mise en file)
+        _validate_run_dates(request.parameters)
+        walk_forward = None
+        if request.walk_forward:
+            from walk_forward import validate_config
+            walk_forward = request.walk_forward.model_dump()
+            try:
+                validate_config(walk_forward)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         logger.info(f"   Script: {strategy['script_path']}")
         
         # Utiliser le runner pour lancer le backtest
         # start_backtest retourne le run_id
         logger.info(f"🚀 Appel start_backtest...")
+        # Limites d'exécution: celles de la stratégie (catalog) priment sur les valeurs par défaut
+        from config import RUN_TIMEOUT_SECONDS, RUN_MAX_MEMORY_MB
+        limits = strategy.get('limits') or {}
+        
         run_id = runner.start_backtest(
             strategy_name=strategy['name'],
             script_path=strategy['script_path'],
             csv_path=None,  # Utilise le CSV par défaut
             parameters=request.parameters,
-            name=request.name
+            name=request.name,
+            timeout_seconds=limits.get('timeout_seconds', RUN_TIMEOUT_SECONDS),
+            max_memory_mb=limits.get('max_memory_mb', RUN_MAX_MEMORY_MB),
+            walk_forward=walk_forward,
+            force=request.force
         )
         logger.info(f"✅ Backtest lancé, run_id: {run_id}")
         
+        # Entrées identiques à un run terminé: résultat déjà disponible
+        status = runner.get_status(run_id)
+        if status and status.reused_from:
+            return RunResponse(
+                run_id=run_id,
+                status=status.status,
+                message=status.message,
+                name=request.name,
+                started_at=status.started_at,
+                reused_from=status.reused_from
+            )
+        
         return RunResponse(
             run_id=run_id,
             status="pending",
@@ -123,6 +206,83 @@ def create_run(request: RunRequest, background_tasks: BackgroundTasks):
         )
 
 
+@router.post("/compare")
+async def compare_run_results(request: RunCompareRequest):
+    """
+    Compare plusieurs runs terminés en une seule requête
+    PnL journalier aligné par date, corrélation, portefeuille combiné et métriques côte à côte
+    """
+    return await run_analytics_response(_compare_run_results, request)
+
+
+def _compare_run_results(request: RunCompareRequest):
+    run_ids = list(dict.fromkeys(request.run_ids))
+    
+    if len(run_ids) < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Au moins un run_id est requis"
+        )
+    
+    try:
+        runner = get_runner()
+        
+        trades_by_run = {}
+        metrics_by_run = {}
+        for run_id in run_ids:
+            _get_completed_run(runner, run_id)
+            trades_by_run[run_id] = runner.get_trades_frame(run_id)
+            metrics_by_run[run_id] = (runner.get_results(run_id) or {}).get('metrics', {})
+        
+        comparison = compare_runs(trades_by_run, metrics_by_run, request.weights)
+        # Profil horaire de chaque run (même cache que la heatmap)
+        comparison["by_hour"] = {
+            run_id: runner.get_run_analytics(run_id, "time_of_day", time_of_day_profile,
+                                             on="entry", bucket_minutes=None)["by_hour"]
+            for run_id in run_ids
+        }
+        return comparison
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la comparaison des runs: {str(e)}"
+        )
+
+
+@router.post("/leaderboard")
+def runs_leaderboard(request: RunLeaderboardRequest):
+    """
+    Classement des runs terminés (entrepôt SQLite indexé à la fin de chaque run)
+    Filtres par stratégie, paramètres et période; une seule requête SQL, sans lire les results.json
+    """
+    try:
+        runner = get_runner()
+        runs = runner.warehouse.leaderboard(
+            order_by=request.order_by,
+            descending=request.descending,
+            limit=request.limit,
+            strategy=request.strategy,
+            parameters=request.parameters,
+            start_date=request.start_date,
+            end_date=request.end_date,
+            min_trades=request.min_trades
+        )
+        return {"runs": runs, "total": len(runs), "order_by": request.order_by}
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du classement des runs: {str(e)}"
+        )
+
+
 @router.get("", response_model=RunListResponse)
 def list_runs():
     """
@@ -175,42 +335,165 @@ def get_run_status(run_id: str):
     try:
         runner = get_runner()
         
-        # Utiliser votre méthode existante pour récupérer le statut
-        # TODO: Adapter selon votre API runner
-        runs = runner.list_runs()
+        # Lecture du seul status.json du run (pas de parcours de tous les runs à chaque poll)
+        run = runner.get_status(run_id)
         
-        for run in runs:
-            if run.run_id == run_id:
-                return RunStatus(
-                    run_id=run.run_id,
-                    status=run.status,
-                    progress=0.5 if run.status == "running" else 1.0,
-                    message=run.message,
-                    name=run.name,
-                    logs=[],  # TODO: Récupérer les logs
-                    started_at=run.started_at,
-                    completed_at=run.completed_at
-                )
+        if run is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Run {run_id} non trouvé"
+            )
         
+        return RunStatus(
+            run_id=run.run_id,
+            status=run.status,
+            progress=0.5 if run.status == "running" else 1.0,
+            message=run.message,
+            name=run.name,
+            logs=runner.tail_log(run_id).splitlines()[-50:],
+            started_at=run.started_at,
+            completed_at=run.completed_at,
+            reused_from=run.reused_from
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la récupération du statut: {str(e)}"
+        )
+
+
+@router.post("/{run_id}/cancel")
+def cancel_run(run_id: str):
+    """
+    Annule un run en attente ou en cours d'exécution (le processus du backtest est arrêté)
+    """
+    runner = get_runner()
+    status = runner.get_status(run_id)
+    
+    if status is None:
         raise HTTPException(
             status_code=404,
             detail=f"Run {run_id} non trouvé"
         )
     
+    if not runner.cancel_run(run_id):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Run {run_id} non annulable (statut: {status.status})"
+        )
+    
+    return {
+        "success": True,
+        "message": f"Annulation du run {run_id} demandée"
+    }
+
+
+@router.get("/{run_id}/logs")
+def get_run_logs(
+    run_id: str,
+    offset: int = Query(0, ge=0, description="Offset en octets (next_offset de l'appel précédent)"),
+    max_bytes: int = Query(65536, ge=1, le=1048576, description="Taille max de la tranche")
+):
+    """
+    Récupère une tranche incrémentale de execution.log
+    Le client rappelle avec offset=next_offset pour suivre un run en direct
+    """
+    try:
+        runner = get_runner()
+        chunk = runner.read_log(run_id, offset=offset, max_bytes=max_bytes)
+        
+        if chunk is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Run {run_id} non trouvé"
+            )
+        
+        status = runner.get_status(run_id)
+        chunk['run_id'] = run_id
+        chunk['status'] = status.status if status else None
+        chunk['complete'] = (
+            status is not None
+            and status.status in FINISHED_STATUSES
+            and chunk['next_offset'] >= chunk['size']
+        )
+        return chunk
+    
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Erreur lors de la récupération du statut: {str(e)}"
+            detail=f"Erreur lors de la lecture des logs: {str(e)}"
         )
 
 
+@router.get("/{run_id}/logs/stream")
+async def stream_run_logs(
+    run_id: str,
+    offset: int = Query(0, ge=0),
+    poll_interval: float = Query(1.0, ge=0.2, le=10.0)
+):
+    """
+    Flux SSE (text/event-stream) de execution.log
+    Envoie les nouvelles lignes au fil de l'eau, puis un événement 'end' quand le run est terminé
+    """
+    runner = get_runner()
+    if await run_in_threadpool(runner.get_status, run_id) is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Run {run_id} non trouvé"
+        )
+    
+    async def events():
+        position = offset
+        ended = None
+        while True:
+            chunk = await run_in_threadpool(runner.read_log, run_id, position)
+            if chunk is None:
+                break
+            
+            if chunk['content']:
+                position = chunk['next_offset']
+                data = "\n".join(f"data: {line}" for line in chunk['content'].splitlines())
+                yield f"id: {position}\n{data}\n\n"
+                continue
+            
+            if ended is not None:
+                yield f"event: end\ndata: {ended}\n\n"
+                break
+            
+            status = await run_in_threadpool(runner.get_status, run_id)
+            if status is None or status.status in FINISHED_STATUSES:
+                # Relire une fois: la dernière ligne (sans retour à la ligne) n'est servie qu'une fois le run terminé
+                ended = status.status if status else 'deleted'
+                continue
+            
+            await asyncio.sleep(poll_interval)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/{run_id}/results", response_model=RunResults)
-def get_run_results(run_id: str):
+async def get_run_results(
+    run_id: str,
+    max_points: Optional[int] = Query(None, ge=3, description="Nombre max de points par courbe (LTTB)")
+):
     """
     Récupère les résultats détaillés d'un run terminé
+    Si max_points est fourni, equity_curve et drawdown_curve sont sous-échantillonnées (LTTB)
+    et les indices de trade d'origine sont renvoyés dans *_curve_index
     """
+    return await run_analytics_response(_get_run_results, run_id, max_points)
+
+
+def _get_run_results(run_id: str, max_points: Optional[int]):
     try:
         runner = get_runner()
         
@@ -277,14 +560,33 @@ def get_run_results(run_id: str):
                 result=trade_data.get('result', '')
             ))
 
+        equity_curve = results_raw.get('equity_curve', [])
+        drawdown_curve = results_raw.get('drawdown_curve', [])
+        equity_curve_index = None
+        drawdown_curve_index = None
+        
+        # Sous-échantillonnage optionnel des courbes
+        if max_points:
+            equity_curve, equity_curve_index = downsample_curve(equity_curve, max_points)
+            drawdown_curve, drawdown_curve_index = downsample_curve(drawdown_curve, max_points)
+
+        # Métriques de risque stockées à la collecte (calculées une fois pour les runs plus anciens)
+        risk_metrics = results_raw.get('risk_metrics')
+        if risk_metrics is None:
+            risk_metrics = runner.get_run_analytics(run_id, "risk_metrics", trades_risk_metrics)
+        
         return RunResults(
             run_id=run_id,
             strategy=results_raw.get('strategy', 'Unknown'),
             metrics=metrics,
-            equity_curve=results_raw.get('equity_curve', []),
-            drawdown_curve=results_raw.get('drawdown_curve', []),
+            risk_metrics=RiskMetrics(**risk_metrics) if risk_metrics else None,
+            equity_curve=equity_curve,
+            drawdown_curve=drawdown_curve,
+            equity_curve_index=equity_curve_index,
+            drawdown_curve_index=drawdown_curve_index,
             trades=trades,
-            files=results_raw.get('files', [])
+            files=results_raw.get('files', []),
+            walk_forward=results_raw.get('walk_forward')
         )
     
     except HTTPException:
@@ -295,84 +597,182 @@ def get_run_results(run_id: str):
             detail=f"Erreur lors de la récupération des résultats: {str(e)}"
         )
 
-@router.get("/data-range")
-def get_data_range(force_reload: bool = False):
-    """
-    Récupère la plage de dates disponible dans les données
-    """
-    global _data_range_cache, _data_range_cache_time
+def _get_completed_run(runner, run_id: str):
+    """Vérifie qu'un run existe et est terminé, sinon lève une HTTPException"""
+    status = runner.get_status(run_id)
     
-    # Vérifier le cache (valide pendant 10 minutes)
-    import time
-    current_time = time.time()
+    if not status:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Run {run_id} non trouvé"
+        )
     
-    if (not force_reload and 
-        _data_range_cache is not None and 
-        _data_range_cache_time is not None and
-        current_time - _data_range_cache_time < 600):  # 10 minutes
-        print("📦 Utilisation du cache pour data-range")
-        return _data_range_cache
+    if status.status != "completed":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Run {run_id} n'est pas terminé (statut: {status.status})"
+        )
     
-    print("🔄 Rechargement des données pour data-range...")
+    return status
+
+
+@router.get("/{run_id}/trades")
+async def get_run_trades(run_id: str, request: Request):
+    """
+    Récupère les trades d'un run terminé
+    Accept: application/vnd.apache.arrow.stream -> flux Arrow IPC colonnaire
+    """
+    return await run_analytics_response(_get_run_trades, run_id, request)
+
+
+def _get_run_trades(run_id: str, request: Request):
+    try:
+        runner = get_runner()
+        _get_completed_run(runner, run_id)
+        
+        trades = runner.get_trades_frame(run_id)
+        if trades is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Résultats non trouvés pour le run {run_id}"
+            )
+        
+        if wants_arrow(request):
+            return ArrowResponse(trades, metadata={"run_id": run_id, "total_trades": len(trades)})
+        
+        return {
+            "run_id": run_id,
+            "trades": trades.to_dict("records"),
+            "total_trades": len(trades)
+        }
     
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la récupération des trades: {str(e)}"
+        )
+
+
+@router.get("/{run_id}/curves")
+async def get_run_curves(
+    run_id: str,
+    request: Request,
+    max_points: Optional[int] = Query(None, ge=3, description="Nombre max de points (LTTB)")
+):
+    """
+    Récupère les courbes d'équité et de drawdown d'un run terminé
+    Les deux courbes partagent le même index de trade (union des points LTTB si max_points)
+    Accept: application/vnd.apache.arrow.stream -> flux Arrow IPC colonnaire
+    """
+    return await run_analytics_response(_get_run_curves, run_id, request, max_points)
+
+
+def _get_run_curves(run_id: str, request: Request, max_points: Optional[int]):
     try:
-        # Charger les données pour déterminer la plage
+        import numpy as np
         import pandas as pd
-        from pathlib import Path
-        sys.path.insert(0, str(Path(__file__).parent.parent))
-        from config import DATA_CSV_FULL_PATH
         
-        data_path = DATA_CSV_FULL_PATH
+        runner = get_runner()
+        _get_completed_run(runner, run_id)
         
-        if not data_path.exists():
+        results_raw = runner.get_results(run_id)
+        if not results_raw:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Résultats non trouvés pour le run {run_id}"
+            )
+        
+        equity = np.asarray(results_raw.get('equity_curve', []), dtype=float)
+        drawdown = np.asarray(results_raw.get('drawdown_curve', []), dtype=float)
+        n = min(len(equity), len(drawdown))
+        equity, drawdown = equity[:n], drawdown[:n]
+        
+        index = np.arange(n)
+        if max_points and n > max_points:
+            index = np.union1d(lttb_indices(equity, max_points), lttb_indices(drawdown, max_points))
+        
+        curves = pd.DataFrame({
+            "trade": index,
+            "equity": equity[index],
+            "drawdown": drawdown[index]
+        })
+        
+        if wants_arrow(request):
+            return ArrowResponse(curves, metadata={"run_id": run_id, "total_points": n})
+        
+        return {
+            "run_id": run_id,
+            "trade": curves["trade"].tolist(),
+            "equity": curves["equity"].tolist(),
+            "drawdown": curves["drawdown"].tolist(),
+            "total_points": n
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la récupération des courbes: {str(e)}"
+        )
+
+def _get_dataset_manifest(force_rebuild: bool = False, background: bool = False):
+    """
+    Manifest du fichier de données configuré (None si le fichier n'existe pas)
+    background: None tant que le manifest est reconstruit en arrière-plan (cf. get_manifest)
+    """
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from config import DATA_CSV_FULL_PATH
+    
+    return DATA_CSV_FULL_PATH, get_manifest(DATA_CSV_FULL_PATH, force_rebuild=force_rebuild, background=background)
+
+
+@router.get("/data-range")
+def get_data_range(force_reload: bool = False):
+    """
+    Récupère la plage de dates disponible dans les données
+    Servie depuis le manifest du dataset (reconstruit uniquement si le fichier change)
+    La reconstruction se fait en arrière-plan: building=true tant qu'elle n'est pas terminée
+    """
+    try:
+        data_path, manifest = _get_dataset_manifest(force_rebuild=force_reload, background=True)
+        
+        # Fichier présent sans manifest: reconstruction lancée en arrière-plan
+        if manifest is None and data_path.exists():
             return {
                 "start_date": None,
                 "end_date": None,
                 "total_days": 0,
-                "message": f"Aucune donnée disponible à {data_path}"
+                "building": True,
+                "message": "Indexation des données en cours, réessayer dans quelques instants"
             }
         
-        # Lire le fichier complet pour déterminer la vraie plage
-        print(f"Lecture du fichier: {data_path}")
-        df = pd.read_csv(data_path)
-        print(f"Lignes lues: {len(df)}")
-        
-        # Normaliser les colonnes
-        cols = {c.lower(): c for c in df.columns}
-        if "ts_event" in cols:
-            df["timestamp"] = pd.to_datetime(df[cols["ts_event"]], utc=True)
-        else:
+        if manifest is None or not manifest.get("trading_days"):
             return {
                 "start_date": None,
                 "end_date": None,
                 "total_days": 0,
-                "message": "Colonne timestamp non trouvée"
+                "message": f"Aucune donnée disponible à {data_path}"
             }
         
-        start_date = df["timestamp"].min()
-        end_date = df["timestamp"].max()
-        total_days = (end_date - start_date).days + 1
-        
-        print(f"Date min: {start_date}")
-        print(f"Date max: {end_date}")
-        print(f"Total jours: {total_days}")
-        print(f"Échantillon timestamps: {df['timestamp'].head()}")
-        print(f"Échantillon timestamps fin: {df['timestamp'].tail()}")
+        start_date = manifest["trading_days"][0]
+        end_date = manifest["trading_days"][-1]
+        total_days = (datetime.fromisoformat(end_date) - datetime.fromisoformat(start_date)).days + 1
         
-        result = {
-            "start_date": start_date.strftime("%Y-%m-%d"),
-            "end_date": end_date.strftime("%Y-%m-%d"),
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
             "total_days": total_days,
-            "message": f"Données disponibles de {start_date.strftime('%Y-%m-%d')} à {end_date.strftime('%Y-%m-%d')}"
+            "trading_days": len(manifest["trading_days"]),
+            "rows": manifest["rows"],
+            "symbols": manifest["symbols"],
+            "gaps": manifest["gaps"],
+            "roll_dates": manifest["roll_dates"],
+            "message": f"Données disponibles de {start_date} à {end_date}"
         }
         
-        # Mettre en cache
-        _data_range_cache = result
-        _data_range_cache_time = current_time
-        print(f"✅ Data range mis en cache: {result['start_date']} -> {result['end_date']}")
-        
-        return result
-        
     except Exception as e:
         return {
             "start_date": None,
@@ -381,23 +781,57 @@ def get_data_range(force_reload: bool = False):
             "message": f"Erreur lors de la lecture des données: {str(e)}"
         }
 
-# Cache global pour les données OHLC
-_ohlc_cache = {}
-_cache_timestamp = None
-_data_range_cache = None
-_data_range_cache_time = None
+# Cache OHLC par clé (TTL 5 minutes, LRU)
+_ohlc_cache = create_cache("ohlc", maxsize=32, ttl=300)
+
+def _ohlc_response(request: Request, ohlc, meta: dict):
+    """Construit la réponse OHLC (JSON ou Arrow selon l'en-tête Accept)"""
+    meta = {**meta, "total_bars": len(ohlc)}
+    
+    bars = ohlc.reset_index()
+    bars["volume"] = bars["volume"].astype("int64")
+    
+    if wants_arrow(request):
+        return ArrowResponse(bars, metadata=meta)
+    
+    # Conversion colonnaire (pas d'iterrows)
+    bars["timestamp"] = [ts.isoformat() for ts in bars["timestamp"]]
+    return {"data": bars.to_dict("records"), **meta}
+
 
 @router.get("/ohlc-data")
-def get_ohlc_data(days: int = 7):
+async def get_ohlc_data(
+    request: Request,
+    days: int = Query(7, ge=1),
+    timeframe: str = Query("30m", description=f"Timeframe ({', '.join(TIMEFRAMES)})"),
+    symbol: Optional[str] = Query(None, description="Contrat précis (ex: NQZ4)"),
+    continuous: bool = Query(True, description="Série front-month continue (roll par volume), false exige symbol"),
+    max_points: Optional[int] = Query(None, ge=2, description="Nombre max de barres renvoyées")
+):
     """
-    Récupère les données OHLC en 30mn pour les X derniers jours
+    Récupère les données OHLC des X derniers jours
+    Servies depuis la pyramide de barres 1m (construite une fois par version du fichier)
+    Si max_points est fourni, les barres consécutives sont regroupées pour ne pas le dépasser
+    Accept: application/vnd.apache.arrow.stream -> flux Arrow IPC
     """
-    global _ohlc_cache, _cache_timestamp
+    return await run_analytics_response(_get_ohlc_data, request, days, timeframe, symbol, continuous, max_points)
+
+
+def _get_ohlc_data(
+    request: Request,
+    days: int,
+    timeframe: str,
+    symbol: Optional[str],
+    continuous: bool,
+    max_points: Optional[int]
+):
+    if timeframe not in TIMEFRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Timeframe invalide: {timeframe} (valeurs possibles: {', '.join(TIMEFRAMES)})"
+        )
     
     try:
-        import pandas as pd
-        from pathlib import Path
-        import time
         sys.path.insert(0, str(Path(__file__).parent.parent))
         from config import DATA_CSV_FULL_PATH
         
@@ -406,86 +840,38 @@ def get_ohlc_data(days: int = 7):
         if not data_path.exists():
             raise HTTPException(status_code=404, detail=f"Données non trouvées à {data_path}")
         
-        # Vérifier le cache (valide pendant 5 minutes)
-        current_time = time.time()
-        cache_key = f"ohlc_{days}"
-        
-        if (_cache_timestamp and 
-            current_time - _cache_timestamp < 300 and  # 5 minutes
-            cache_key in _ohlc_cache):
-            print(f"Utilisation du cache pour {days} jours")
-            return _ohlc_cache[cache_key]
-        
-        # Optimisation : lire seulement un échantillon récent
-        print(f"Lecture d'un échantillon pour {days} jours...")
-        
-        # Pour l'instant, lire tout le fichier mais on optimisera plus tard
-        # TODO: Implémenter une lecture par chunks plus robuste
-        df = pd.read_csv(data_path)
-        
-        # Normaliser les colonnes
-        cols = {c.lower(): c for c in df.columns}
-        df = df.rename(columns={
-            cols["ts_event"]: "timestamp",
-            cols["open"]: "open",
-            cols["high"]: "high", 
-            cols["low"]: "low",
-            cols["close"]: "close",
-            cols["volume"]: "volume",
-            cols["symbol"]: "symbol"
-        })
+        # La version du fichier fait partie de la clé: un nouveau CSV invalide le cache
+        st = data_path.stat()
+        cache_key = (str(data_path), st.st_size, st.st_mtime_ns, days, timeframe, symbol, continuous, max_points)
         
-        df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-        
-        # Filtrer les derniers jours
-        end_date = df["timestamp"].max()
-        start_date = end_date - pd.Timedelta(days=days)
-        df_filtered = df[df["timestamp"] >= start_date].copy()
-        
-        # Filtrer sur NQ (front month)
-        nq_symbols = df_filtered[df_filtered["symbol"].str.match(r"^NQ[A-Z][0-9]{1,2}$")]["symbol"].unique()
-        if len(nq_symbols) > 0:
-            # Prendre le symbole le plus récent (alphabétiquement le dernier)
-            latest_symbol = sorted(nq_symbols)[-1]
-            df_filtered = df_filtered[df_filtered["symbol"] == latest_symbol]
-        
-        # Resampler en 30mn
-        df_filtered.set_index("timestamp", inplace=True)
-        ohlc_30m = df_filtered.resample("30T").agg({
-            "open": "first",
-            "high": "max", 
-            "low": "min",
-            "close": "last",
-            "volume": "sum"
-        }).dropna()
-        
-        # Convertir en format pour le frontend
-        data = []
-        for timestamp, row in ohlc_30m.iterrows():
-            data.append({
-                "timestamp": timestamp.isoformat(),
-                "open": float(row["open"]),
-                "high": float(row["high"]),
-                "low": float(row["low"]),
-                "close": float(row["close"]),
-                "volume": int(row["volume"])
-            })
-        
-        result = {
-            "data": data,
-            "symbol": latest_symbol if len(nq_symbols) > 0 else "NQ",
-            "timeframe": "30m",
-            "period": f"{days} derniers jours",
-            "total_bars": len(data)
-        }
+        cached = _ohlc_cache.get(cache_key)
+        if cached is not None:
+            ohlc, meta = cached
+            return _ohlc_response(request, ohlc, meta)
         
-        # Mettre en cache
-        _ohlc_cache[cache_key] = result
-        _cache_timestamp = current_time
-        print(f"Données mises en cache pour {days} jours")
+        ohlc, info = get_ohlc(data_path, days, timeframe=timeframe, symbol=symbol, continuous=continuous)
         
-        return result
+        # Regroupement des barres si trop nombreuses pour le graphique
+        ohlc = downsample_ohlc(ohlc, max_points)
+        ohlc.index.name = "timestamp"
         
+        meta = {
+            "symbol": info["symbol"],
+            "symbols": info["symbols"],
+            "continuous": continuous and not symbol,
+            "timeframe": timeframe,
+            "period": f"{days} derniers jours"
+        }
+        
+        # Mettre en cache (DataFrame, le format de sortie est choisi à chaque requête)
+        _ohlc_cache.set(cache_key, (ohlc, meta))
+        
+        return _ohlc_response(request, ohlc, meta)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -493,269 +879,97 @@ def get_ohlc_data(days: int = 7):
         )
 
 @router.get("/{run_id}/heatmap")
-async def get_run_heatmap(run_id: str):
-    """Récupère les données de heatmap pour un run"""
+async def get_run_heatmap(
+    run_id: str,
+    on: str = Query("entry", pattern="^(entry|exit)$", description="Heure d'entrée ou de sortie"),
+    bucket_minutes: Optional[int] = Query(None, description="Découpe de chaque heure en tranches (5, 15, 30...)")
+):
+    """
+    Heatmap jour x heure (x tranche de minutes) d'un run terminé, depuis les vrais horodatages
+    Chaque cellule: PnL total/moyen, nombre de trades, win rate et expectancy
+    value/winRate sont conservés pour le graphique existant
+    """
     try:
-        runner = get_runner()
-        
-        # Vérifier que le run existe
-        runs = runner.list_runs()
-        target_run = None
-        for run in runs:
-            if run.run_id == run_id:
-                target_run = run
-                break
-        
-        if not target_run:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Run {run_id} non trouvé"
-            )
-        
-        if target_run.status != "completed":
-            raise HTTPException(
-                status_code=400,
-                detail=f"Run {run_id} n'est pas terminé (statut: {target_run.status})"
-            )
-        
-        # Récupérer les résultats
-        results_raw = runner.get_results(run_id)
-        if not results_raw:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Résultats non trouvés pour le run {run_id}"
-            )
-        
-        # Générer les données de heatmap
-        trades_data = results_raw.get('trades', [])
-        print(f"🔍 Génération heatmap pour {len(trades_data)} trades")
-        if trades_data:
-            print(f"   Premier trade: {trades_data[0]}")
-        
-        heatmap_data = generate_heatmap_data(trades_data)
-        print(f"🔍 Heatmap générée: {len(heatmap_data)} points de données")
-        
-        return {
-            "run_id": run_id,
-            "heatmap": heatmap_data
-        }
+        return await run_analytics_response(_build_run_heatmap, run_id, on, bucket_minutes)
     
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la génération de la heatmap: {str(e)}"
         )
 
-def generate_heatmap_data(trades):
-    """Génère les données de heatmap à partir des trades"""
-    import pandas as pd
-    from datetime import datetime
-    
-    if not trades:
-        print("⚠️ Aucun trade fourni pour la heatmap")
-        return []
-    
-    print(f"🔍 Processing {len(trades)} trades pour heatmap")
+
+def _build_run_heatmap(run_id: str, on: str, bucket_minutes: Optional[int]):
+    """Profil temporel du run (mis en cache par version des résultats)"""
+    runner = get_runner()
+    _get_completed_run(runner, run_id)
     
-    # Convertir en DataFrame
-    df = pd.DataFrame(trades)
-    print(f"🔍 Colonnes disponibles: {list(df.columns)}")
-    print(f"🔍 Exemple de dates: {df['date'].head().tolist()}")
+    profile = runner.get_run_analytics(
+        run_id, "time_of_day", time_of_day_profile, on=on, bucket_minutes=bucket_minutes
+    )
+    if profile is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Résultats non trouvés pour le run {run_id}"
+        )
     
-    # Parser les dates - vérifier si on a des heures ou juste des dates
-    df['date'] = pd.to_datetime(df['date'])
+    heatmap = [{**cell, "value": cell["avg_pnl"], "winRate": cell["win_rate"]} for cell in profile["grid"]]
     
-    # Si les données n'ont que des dates (pas d'heures), utiliser une heure fictive
-    # pour la visualisation (par exemple 14h = heure de trading NQ en Europe)
-    if df['date'].dt.hour.nunique() == 1 and df['date'].dt.hour.iloc[0] == 0:
-        print("🔍 Dates sans heures détectées - utilisation d'une heure fictive pour la visualisation")
-        # Assigner une heure aléatoire entre 13h30 et 20h (heures de trading NQ en UTC)
-        import numpy as np
-        np.random.seed(42)  # Pour reproductibilité
-        trading_hours = np.random.choice(range(13, 21), size=len(df))  # 13h-20h UTC
-        df['hour'] = trading_hours
-        df['day_of_week'] = df['date'].dt.day_name()
-    else:
-        # Si on a des vraies heures, les utiliser
-        df['day_of_week'] = df['date'].dt.day_name()
-        df['hour'] = df['date'].dt.hour
-    
-    print(f"🔍 Répartition des heures: {sorted(df['hour'].unique())}")
-    
-    print(f"🔍 Après parsing - jours: {df['day_of_week'].unique()}")
-    print(f"🔍 Après parsing - heures: {sorted(df['hour'].unique())}")
-    
-    # Mapper les jours en français
-    day_mapping = {
-        'Monday': 'Lun',
-        'Tuesday': 'Mar', 
-        'Wednesday': 'Mer',
-        'Thursday': 'Jeu',
-        'Friday': 'Ven',
-        'Saturday': 'Sam',
-        'Sunday': 'Dim'
+    return {
+        "run_id": run_id,
+        "heatmap": heatmap,
+        **{k: profile[k] for k in ("on", "bucket_minutes", "by_hour", "by_day", "untimed_trades")}
     }
-    df['day_fr'] = df['day_of_week'].map(day_mapping)
-    
-    # Grouper par jour et heure
-    grouped = df.groupby(['day_fr', 'hour']).agg({
-        'pnl_usd': ['sum', 'mean', 'count'],
-        'result': lambda x: (x == 'TP').sum() / len(x) if len(x) > 0 else 0
-    }).reset_index()
-    
-    # Aplatir les colonnes
-    grouped.columns = ['day', 'hour', 'total_pnl', 'avg_pnl', 'trades', 'win_rate']
-    
-    # Créer la liste des données heatmap
-    heatmap_data = []
-    for _, row in grouped.iterrows():
-        heatmap_data.append({
-            'day': row['day'],
-            'hour': int(row['hour']),
-            'value': float(row['avg_pnl']),  # PnL moyen par créneau
-            'trades': int(row['trades']),
-            'winRate': float(row['win_rate'])
-        })
-    
-    return heatmap_data
 
-@router.get("/data-range")
-async def get_data_range():
-    """Récupère la plage de dates disponibles dans les données"""
+@router.post("/{run_id}/montecarlo")
+async def run_monte_carlo(run_id: str, request: RunMonteCarloRequest):
+    """
+    Robustesse d'un run terminé par rééchantillonnage de ses trades
+    (bootstrap iid, bootstrap par journée, permutation de l'ordre)
+    Distributions du PnL final et du drawdown max, risque de ruine
+    """
+    methods = list(dict.fromkeys(request.methods))
+    unknown = [m for m in methods if m not in MONTECARLO_METHODS]
+    if not methods or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Méthodes invalides: {unknown or methods} (attendu: {', '.join(MONTECARLO_METHODS)})"
+        )
+    if not 100 <= request.simulations <= MAX_SIMULATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"simulations doit être entre 100 et {MAX_SIMULATIONS}"
+        )
+    
     try:
-        import pandas as pd
-        from pathlib import Path
-        import os
-        
-        # Chercher un fichier CSV récent pour déterminer la plage de dates
-        # PRIORITE 1: dossier data/raw (données sources)
-        data_raw_dir = Path("data/raw")
-        csv_files = []
-        
-        print(f"🔍 Vérification de data/raw:")
-        print(f"   - Chemin: {data_raw_dir.absolute()}")
-        print(f"   - Existe: {data_raw_dir.exists()}")
-        
-        if data_raw_dir.exists():
-            raw_files = list(data_raw_dir.glob("*.csv"))
-            csv_files.extend(raw_files)
-            print(f"✅ Trouvé {len(csv_files)} fichiers CSV dans data/raw/")
-            if raw_files:
-                for f in raw_files:
-                    print(f"   - {f.name}")
-        
-        # PRIORITE 2: dossier data/
-        if not csv_files:
-            data_dir = Path("data")
-            if data_dir.exists():
-                csv_files.extend(list(data_dir.glob("*.csv")))
-                print(f"🔍 Trouvé {len(csv_files)} fichiers CSV dans data/")
-        
-        # PRIORITE 3: chercher dans les runs récents (en dernier recours)
-        # mais IGNORER les fichiers temporaires
-        if not csv_files:
-            runs_dir = Path("runs")
-            if runs_dir.exists():
-                for run_dir in runs_dir.iterdir():
-                    if run_dir.is_dir():
-                        for csv_file in run_dir.glob("*.csv"):
-                            # Ignorer les fichiers temporaires
-                            if not any(skip in csv_file.name for skip in ['front_month_selection_log', 'filtered_data']):
-                                csv_files.append(csv_file)
-            print(f"🔍 Trouvé {len(csv_files)} fichiers CSV dans runs/ (sans les fichiers temporaires)")
-        
-        if not csv_files:
-            # Dates par défaut si pas de fichiers trouvés
-            return {
-                "start_date": "2024-08-01",
-                "end_date": "2024-09-30",
-                "total_days": 60
-            }
-        
-        # Trier par taille (fichier le plus gros = plus de données)
-        # plutôt que par date de modification
-        csv_files_with_size = [(f, f.stat().st_size) for f in csv_files]
-        csv_files_with_size.sort(key=lambda x: x[1], reverse=True)
-        
-        # Prendre le plus gros fichier (pas le plus récent)
-        latest_csv = csv_files_with_size[0][0]
-        print(f"🔍 Fichiers CSV trouvés (triés par taille):")
-        for f, size in csv_files_with_size[:5]:  # Afficher les 5 plus gros
-            print(f"   - {f.name}: {size / 1024:.1f} KB")
-        print(f"🔍 Analyse des dates depuis le plus gros: {latest_csv}")
-        
-        # Optimisation: Lire seulement les premières et dernières lignes
-        # au lieu de charger tout le fichier (peut être très gros)
-        print(f"🔍 Lecture optimisée (premières et dernières lignes seulement)...")
-        
-        # Lire les premières lignes pour avoir le header et la première date
-        df_head = pd.read_csv(latest_csv, nrows=10)
-        
-        # Chercher une colonne de date
-        date_column = None
-        for col in ['ts_event', 'timestamp', 'time', 'date', 'Date', 'DATE', 'datetime']:
-            if col in df_head.columns:
-                date_column = col
-                print(f"✅ Colonne de date trouvée: {col}")
-                break
-        
-        if not date_column:
-            print("⚠️ Aucune colonne de date trouvée")
-            print(f"   Colonnes disponibles: {list(df_head.columns)}")
-            return {
-                "start_date": "2024-08-01", 
-                "end_date": "2024-09-30",
-                "total_days": 60
-            }
-        
-        # Lire les dernières lignes pour avoir la dernière date
-        # Méthode: lire les dernières lignes du fichier texte
-        with open(latest_csv, 'rb') as f:
-            # Aller à la fin du fichier
-            f.seek(0, 2)  # Aller à la fin
-            file_size = f.tell()
-            # Lire les derniers 10KB (devrait contenir plusieurs lignes)
-            f.seek(max(0, file_size - 10000))
-            last_lines = f.read().decode('utf-8', errors='ignore').split('\n')
-            # Prendre les dernières lignes non-vides
-            last_lines = [l for l in last_lines if l.strip()][-10:]
-        
-        # Créer un DataFrame avec les dernières lignes
-        from io import StringIO
-        df_tail = pd.read_csv(StringIO('\n'.join(last_lines)), names=df_head.columns)
-        
-        # Convertir les dates
-        df_head[date_column] = pd.to_datetime(df_head[date_column], errors='coerce')
-        df_tail[date_column] = pd.to_datetime(df_tail[date_column], errors='coerce')
-        
-        # Trouver min et max
-        min_date = df_head[date_column].min()
-        max_date = df_tail[date_column].max()
-        start_date = min_date.strftime('%Y-%m-%d')
-        end_date = max_date.strftime('%Y-%m-%d')
-        total_days = (max_date - min_date).days
-        
-        print(f"📅 Plage de dates trouvée:")
-        print(f"   - Première date (MIN): {start_date}")
-        print(f"   - Dernière date (MAX): {end_date}")
-        print(f"   - Total: {total_days} jours")
-        print(f"   - Fichier analysé: {latest_csv.name}")
-        
-        return {
-            "start_date": start_date,
-            "end_date": end_date,
-            "total_days": total_days
-        }
+        return await run_analytics_response(_run_monte_carlo, run_id, request, tuple(methods))
     
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Erreur lors de l'analyse des dates: {e}")
-        return {
-            "start_date": "2024-08-01",
-            "end_date": "2024-09-30",
-            "total_days": 60
-        }
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la simulation Monte Carlo: {str(e)}"
+        )
+
+
+def _run_monte_carlo(run_id: str, request: RunMonteCarloRequest, methods: tuple):
+    runner = get_runner()
+    _get_completed_run(runner, run_id)
+    
+    params = dict(methods=methods, simulations=request.simulations,
+                  ruin_loss=request.ruin_loss, seed=request.seed)
+    if request.seed is None:
+        # Sans graine chaque appel est un nouveau tirage: pas de cache
+        result = monte_carlo(runner.get_trades_frame(run_id), **params)
+    else:
+        result = runner.get_run_analytics(run_id, "montecarlo", monte_carlo, **params)
+    
+    return {"run_id": run_id, **result}
 
 
 @router.delete("/{run_id}")
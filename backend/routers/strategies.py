@@ -3,7 +3,7 @@ Router pour les stratégies de backtest
 Utilise le système de découverte existant
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pathlib import Path
 import sys
 from models.strategy import StrategyListResponse, Strategy
@@ -14,47 +14,60 @@ BACKTEST_SERVICE_PATH = BACKEND_PATH / "services" / "backtest"
 sys.path.insert(0, str(BACKTEST_SERVICE_PATH))
 
 try:
-    from discover import get_available_strategies
+    from discover import get_available_strategies, get_strategy_by_id, get_strategies_version
 except ImportError as e:
     print(f"Erreur import discover: {e}")
     get_available_strategies = None
+    get_strategy_by_id = None
+    get_strategies_version = None
 
 router = APIRouter()
 
 
-@router.get("", response_model=StrategyListResponse)
-def list_strategies():
-    """
-    Récupère la liste des stratégies disponibles
-    Utilise le système de découverte existant
-    """
+def _to_strategy(s) -> Strategy:
+    """Convertit une stratégie découverte au format API"""
+    return Strategy(
+        id=s['id'],
+        name=s['name'],
+        description=s['description'],
+        timeframe=s['timeframe'],
+        risk_model=s['risk_model'],
+        parameters=s['parameters'],
+        script_path=s['script_path'],
+        category=s.get('category', 'Autres'),
+        tags=s.get('tags', [])
+    )
+
+
+def _check_discovery_available():
     if get_available_strategies is None:
         raise HTTPException(
             status_code=500, 
             detail="Module discover non disponible"
         )
+
+
+@router.get("", response_model=StrategyListResponse)
+def list_strategies(request: Request, response: Response):
+    """
+    Récupère la liste des stratégies disponibles
+    Utilise le système de découverte existant (mis en cache, invalidé au changement des fichiers)
+    Supporte ETag / If-None-Match pour une revalidation sans transfert
+    """
+    _check_discovery_available()
     
     try:
-        # Utiliser la fonction de découverte avec le nouveau chemin
-        strategies_raw = get_available_strategies(str(BACKEND_PATH))
+        etag = f'"{get_strategies_version(str(BACKEND_PATH))}"'
+        
+        # Le client a déjà la version courante
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
         
-        # Convertir au format API
-        strategies = []
-        for s in strategies_raw:
-            strategy = Strategy(
-                id=s['name'].lower().replace(' ', '_').replace('-', '_'),
-                name=s['name'],
-                description=s['description'],
-                timeframe=s['timeframe'],
-                risk_model=s['risk_model'],
-                parameters=s['parameters'],
-                script_path=s['script_path'],
-                category=s.get('category', 'Autres'),
-                tags=s.get('tags', [])
-            )
-            strategies.append(strategy)
+        strategies_raw = get_available_strategies(str(BACKEND_PATH))
         
-        return StrategyListResponse(strategies=strategies)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return StrategyListResponse(strategies=[_to_strategy(s) for s in strategies_raw])
     
     except Exception as e:
         raise HTTPException(
@@ -63,18 +76,19 @@ def list_strategies():
         )
 
 
-@router.get("/{strategy_id}")
+@router.get("/{strategy_id}", response_model=Strategy)
 def get_strategy(strategy_id: str):
     """
     Récupère les détails d'une stratégie spécifique
     """
-    strategies_response = list_strategies()
+    _check_discovery_available()
     
-    for strategy in strategies_response.strategies:
-        if strategy.id == strategy_id:
-            return strategy
+    strategy = get_strategy_by_id(str(BACKEND_PATH), strategy_id)
     
-    raise HTTPException(
-        status_code=404,
-        detail=f"Stratégie {strategy_id} non trouvée"
-    )
+    if strategy is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Stratégie {strategy_id} non trouvée"
+        )
+    
+    return _to_strategy(strategy)
@@ -0,0 +1,84 @@
+"""
+Comparaison multi-runs calculée côté serveur
+PnL journalier aligné par date, corrélations et portefeuille combiné (pandas/NumPy vectorisé)
+"""
+
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from services.analytics.metrics import trade_days
+
+
+def daily_pnl_matrix(trades_by_run: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Construit la matrice PnL journalier (dates x runs) alignée sur l'union des dates
+    Les jours sans trade pour un run valent 0
+    """
+    frames = []
+    for run_id, trades in trades_by_run.items():
+        if trades is None or trades.empty:
+            continue
+        frames.append(pd.DataFrame({
+            "run_id": run_id,
+            # Colonne date absente des CSV de certaines stratégies: jour de entry_time / exit_time
+            "date": trade_days(trades),
+            "pnl_usd": trades["pnl_usd"].to_numpy(dtype=float)
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=list(trades_by_run.keys()), dtype=float)
+
+    stacked = pd.concat(frames, ignore_index=True).dropna(subset=["date"])
+    matrix = stacked.pivot_table(
+        index="date", columns="run_id", values="pnl_usd", aggfunc="sum", fill_value=0.0
+    )
+    # Conserver l'ordre demandé et les runs sans trade
+    return matrix.reindex(columns=list(trades_by_run.keys()), fill_value=0.0).sort_index()
+
+
+def compare_runs(
+    trades_by_run: Dict[str, pd.DataFrame],
+    metrics_by_run: Dict[str, Dict[str, Any]],
+    weights: Dict[str, float] = None
+) -> Dict[str, Any]:
+    """Calcule la comparaison complète entre plusieurs runs"""
+    run_ids = list(trades_by_run.keys())
+    matrix = daily_pnl_matrix(trades_by_run)
+
+    values = matrix.to_numpy(dtype=float)
+    cumulative = np.cumsum(values, axis=0)
+
+    # Corrélation des PnL journaliers (NaN si variance nulle -> null en JSON)
+    if len(matrix) > 1:
+        correlation = matrix.corr().reindex(index=run_ids, columns=run_ids)
+    else:
+        correlation = pd.DataFrame(np.nan, index=run_ids, columns=run_ids)
+
+    # Portefeuille combiné (pondéré)
+    w = np.array([(weights or {}).get(run_id, 1.0) for run_id in run_ids], dtype=float)
+    portfolio_daily = values @ w if values.size else np.zeros(len(matrix))
+    portfolio_equity = np.cumsum(portfolio_daily)
+    running_max = np.maximum.accumulate(np.r_[0.0, portfolio_equity])[1:]
+    portfolio_drawdown = portfolio_equity - running_max
+
+    return {
+        "run_ids": run_ids,
+        "dates": [d.strftime("%Y-%m-%d") for d in matrix.index],
+        "daily_pnl": {run_id: values[:, i].tolist() for i, run_id in enumerate(run_ids)},
+        "cumulative_pnl": {run_id: cumulative[:, i].tolist() for i, run_id in enumerate(run_ids)},
+        "correlation": {
+            run_id: correlation.loc[run_id].tolist() for run_id in run_ids
+        },
+        "portfolio": {
+            "weights": dict(zip(run_ids, w.tolist())),
+            "daily_pnl": portfolio_daily.tolist(),
+            "equity": portfolio_equity.tolist(),
+            "drawdown": portfolio_drawdown.tolist(),
+            "net_pnl": float(portfolio_equity[-1]) if len(portfolio_equity) else 0.0,
+            "max_drawdown": float(portfolio_drawdown.min()) if len(portfolio_drawdown) else 0.0
+        },
+        "metrics": {run_id: metrics_by_run.get(run_id, {}) for run_id in run_ids}
+    }
+
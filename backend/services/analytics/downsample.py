@@ -0,0 +1,88 @@
+"""
+Sous-échantillonnage côté serveur des séries pour les graphiques
+LTTB (Largest-Triangle-Three-Buckets) pour les courbes, agrégation par buckets pour l'OHLC
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def lttb_indices(y: Sequence[float], max_points: int, x: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Retourne les indices des points conservés par l'algorithme LTTB
+    Le premier et le dernier point sont toujours conservés
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+
+    if max_points is None or max_points <= 0 or n <= max_points or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])
+
+    x = np.arange(n, dtype=float) if x is None else np.asarray(x, dtype=float)
+
+    # Buckets intermédiaires (hors premier et dernier point)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+
+        # Moyenne du bucket suivant (ou dernier point)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+            avg_x = x[next_start:next_end].mean()
+            avg_y = y[next_start:next_end].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        # Aire des triangles (a, candidat, moyenne suivante) vectorisée sur le bucket
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+
+    return selected
+
+
+def downsample_curve(values: Sequence[float], max_points: Optional[int]) -> Tuple[List[float], List[int]]:
+    """Applique LTTB sur une courbe et retourne (valeurs, indices d'origine)"""
+    values = [] if values is None else list(values)
+    if not max_points or len(values) <= max_points:
+        return values, list(range(len(values)))
+
+    idx = lttb_indices(values, max_points)
+    arr = np.asarray(values, dtype=float)
+    return arr[idx].tolist(), idx.tolist()
+
+
+def downsample_ohlc(df: pd.DataFrame, max_points: Optional[int]) -> pd.DataFrame:
+    """
+    Regroupe des barres OHLC consécutives pour ne pas dépasser max_points
+    Chaque bucket conserve open (premier), high (max), low (min), close (dernier) et volume (somme),
+    ce qui préserve les extrêmes contrairement à un simple échantillonnage
+    """
+    n = len(df)
+    if not max_points or max_points <= 0 or n <= max_points:
+        return df
+
+    bucket = np.arange(n) * max_points // n
+    grouped = df.groupby(bucket, sort=True)
+    out = grouped.agg({
+        "open": "first",
+        "high": "max",
+        "low": "min",
+        "close": "last",
+        "volume": "sum"
+    })
+    # Horodatage du bucket = première barre du groupe
+    out.index = df.index[np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])]
+    return out
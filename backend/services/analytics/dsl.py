@@ -0,0 +1,288 @@
+"""
+Mini-langage de requêtes de l'analyste IA
+Une question ("win rate by hour for shorts in Q1", "pnl moyen par jour en 2024") est compilée
+par une grammaire déterministe (expressions régulières, hors ligne) en un plan typé:
+filtres -> regroupement -> agrégats, exécuté ensuite par services.analytics.query
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from services.analytics.time_of_day import DAY_LABELS
+
+INTENTS = ("query", "performance", "code", "volatility", "help")
+GROUP_BY = ("hour", "weekday", "month", "quarter", "year", "direction", "result", "opr_width")
+METRICS = ("trades", "total_pnl", "avg_pnl", "win_rate", "expectancy", "profit_factor",
+           "avg_win", "avg_loss", "max_drawdown")
+DEFAULT_METRICS = ("trades", "total_pnl", "win_rate", "expectancy")
+DEFAULT_BUCKETS = 5
+
+FIELD_LABELS = {
+    "hour": "heure", "weekday": "jour", "month": "mois", "quarter": "trimestre", "year": "année",
+    "direction": "direction", "result": "sortie", "opr_width": "largeur d'OPR",
+    "outcome": "issue", "date": "date",
+}
+METRIC_LABELS = {
+    "trades": "Trades", "total_pnl": "PnL total", "avg_pnl": "PnL moyen", "win_rate": "Win rate",
+    "expectancy": "Expectancy", "profit_factor": "Profit factor", "avg_win": "Gain moyen",
+    "avg_loss": "Perte moyenne", "max_drawdown": "Max drawdown",
+}
+
+
+@dataclass(frozen=True)
+class Filter:
+    """Condition sur une colonne des trades: op 'in' (tuple de valeurs), '>=', '<' ou '<='"""
+    field: str
+    op: str
+    value: Any
+
+    def describe(self) -> str:
+        label = FIELD_LABELS.get(self.field, self.field)
+        if self.op == "in":
+            return f"{label} ∈ {{{', '.join(format_value(self.field, v) for v in self.value)}}}"
+        return f"{label} {self.op} {self.value}"
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """Plan typé et hashable (clé des caches de plans et de résultats)"""
+    intent: str = "query"
+    filters: Tuple[Filter, ...] = ()
+    group_by: Optional[str] = None
+    metrics: Tuple[str, ...] = DEFAULT_METRICS
+    buckets: int = DEFAULT_BUCKETS
+
+    def describe(self) -> str:
+        parts = [", ".join(METRIC_LABELS[m] for m in self.metrics)]
+        if self.group_by:
+            parts.append(f"par {FIELD_LABELS[self.group_by]}")
+        if self.filters:
+            parts.append("où " + " et ".join(f.describe() for f in self.filters))
+        return " ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "intent": self.intent,
+            "filters": [{"field": f.field, "op": f.op, "value": f.value} for f in self.filters],
+            "group_by": self.group_by,
+            "metrics": list(self.metrics),
+            "buckets": self.buckets,
+            "description": self.describe(),
+        }
+
+
+def format_value(field: str, value: Any) -> str:
+    """Valeur lisible d'une clé de filtre ou de regroupement"""
+    if field == "weekday":
+        return DAY_LABELS[int(value)]
+    if field == "hour":
+        return f"{int(value)}h"
+    if field == "quarter":
+        return f"Q{int(value)}"
+    return str(value)
+
+
+# --- Lexique (formes sans accents, texte normalisé en minuscules) ---
+
+_GROUP_WORDS = {
+    "hour": ["heures", "heure", "hours", "hour", "h"],
+    "weekday": ["jour de la semaine", "jours de la semaine", "day of week", "weekday", "jours", "jour", "day"],
+    "month": ["mois", "months", "month"],
+    "quarter": ["trimestres", "trimestre", "quarters", "quarter"],
+    "year": ["annees", "annee", "ans", "years", "year"],
+    "direction": ["directions", "direction", "sens", "side"],
+    "result": ["type de sortie", "sorties", "sortie", "resultats", "resultat", "results", "result", "exit"],
+    "opr_width": ["largeur d'opr", "largeur de l'opr", "largeur", "opr width", "opr range", "opr", "width"],
+}
+# Adjectifs qui suffisent à indiquer le regroupement ("distribution horaire", "monthly pnl")
+_GROUP_ADJECTIVES = {
+    "hour": ["horaire", "hourly", "distribution", "temporelle", "temporel"],
+    "weekday": ["journalier", "daily"],
+    "month": ["mensuel", "mensuelle", "monthly"],
+    "quarter": ["trimestriel", "quarterly"],
+    "year": ["annuel", "annuelle", "yearly"],
+}
+# Formes longues en premier ("profit factor" avant "profit")
+_METRIC_WORDS = [
+    ("profit_factor", ["profit factor", "facteur de profit"]),
+    ("win_rate", ["win rate", "winrate", "taux de reussite", "taux de gain", "pourcentage de gain", "% gagnant"]),
+    ("expectancy", ["expectancy", "esperance"]),
+    ("avg_win", ["gain moyen", "average win", "avg win"]),
+    ("avg_loss", ["perte moyenne", "average loss", "avg loss"]),
+    ("max_drawdown", ["drawdown", "dd"]),
+    ("avg_pnl", ["pnl moyen", "average pnl", "avg pnl", "mean pnl", "moyenne", "moyen", "average", "avg"]),
+    ("trades", ["nombre de trades", "combien", "how many", "count", "nombre"]),
+    ("total_pnl", ["pnl", "p&l", "profit", "gains", "rentabilite"]),
+]
+_INTENT_WORDS = {
+    "code": ["code", "script", "python", "generer", "genere", "generate"],
+    "volatility": ["volatilite", "volatility"],
+    "performance": ["performance", "performances", "resume", "summary", "backtest", "sharpe", "sortino",
+                    "calmar", "risque", "risk", "metriques", "metrics"],
+}
+_MONTHS = {
+    1: ["janvier", "january", "jan"], 2: ["fevrier", "february", "feb"], 3: ["mars", "march", "mar"],
+    4: ["avril", "april", "apr"], 5: ["mai", "may"], 6: ["juin", "june", "jun"],
+    7: ["juillet", "july", "jul"], 8: ["aout", "august", "aug"], 9: ["septembre", "september", "sep"],
+    10: ["octobre", "october", "oct"], 11: ["novembre", "november", "nov"], 12: ["decembre", "december", "dec"],
+}
+_WEEKDAYS = {
+    0: ["lundi", "monday", "mondays"], 1: ["mardi", "tuesday", "tuesdays"],
+    2: ["mercredi", "wednesday", "wednesdays"], 3: ["jeudi", "thursday", "thursdays"],
+    4: ["vendredi", "friday", "fridays"], 5: ["samedi", "saturday"], 6: ["dimanche", "sunday"],
+}
+_DIRECTIONS = {"LONG": ["longs", "long", "achats", "achat", "buys"], "SHORT": ["shorts", "short", "ventes", "vente", "sells"]}
+_RESULTS = {"TP": ["tp", "take profit", "objectif"], "SL": ["sl", "stop loss", "stop"], "EOD": ["eod", "fin de journee", "end of day"]}
+_OUTCOMES = {"win": ["gagnants", "gagnant", "winners", "winning", "wins"], "loss": ["perdants", "perdant", "losers", "losing", "losses"]}
+
+
+def normalize(text: str) -> str:
+    """Minuscules, sans accents, apostrophes et espaces uniformisés"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = text.replace("’", "'")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def _alternatives(words: List[str]) -> str:
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+class _Text:
+    """Texte normalisé dont les passages reconnus sont consommés (remplacés par des espaces)"""
+
+    def __init__(self, text: str):
+        self.text = f" {normalize(text)} "
+
+    def take(self, pattern: str) -> List[re.Match]:
+        matches = list(re.finditer(pattern, self.text))
+        for m in reversed(matches):
+            self.text = self.text[:m.start()] + " " * (m.end() - m.start()) + self.text[m.end():]
+        return matches
+
+    def has(self, words: List[str]) -> bool:
+        return re.search(rf"(?<![\w'])(?:{_alternatives(words)})(?![\w])", self.text) is not None
+
+
+def _word(words: List[str]) -> str:
+    return rf"(?<![\w'])(?:{_alternatives(words)})(?!\w)"
+
+
+def _lookup(table: Dict[Any, List[str]], word: str) -> Any:
+    return next(key for key, words in table.items() if word in words)
+
+
+def _parse_filters(text: _Text) -> List[Filter]:
+    filters: List[Filter] = []
+
+    # Dates explicites (avant les années, qu'elles contiennent)
+    for m in text.take(r"(?:since|depuis|after|apres|from|a partir du|du)\s+(\d{4}-\d{2}-\d{2})"):
+        filters.append(Filter("date", ">=", m.group(1)))
+    for m in text.take(r"(?:until|jusqu'au|jusqu au|before|avant|au|to)\s+(\d{4}-\d{2}-\d{2})"):
+        filters.append(Filter("date", "<=", m.group(1)))
+
+    # Plages horaires (heures d'entrée UTC)
+    for m in text.take(r"(?:between|entre)\s+(\d{1,2})\s*h?\s*(?:and|et|-)\s*(\d{1,2})\s*h"):
+        filters += [Filter("hour", ">=", int(m.group(1))), Filter("hour", "<", int(m.group(2)))]
+    for m in text.take(r"(?:after|apres|from|a partir de|depuis)\s+(\d{1,2})\s*h\b"):
+        filters.append(Filter("hour", ">=", int(m.group(1))))
+    for m in text.take(r"(?:before|avant)\s+(\d{1,2})\s*h\b"):
+        filters.append(Filter("hour", "<", int(m.group(1))))
+    hours = text.take(r"(?:at|a)\s+(\d{1,2})\s*h\b")
+    if hours:
+        filters.append(Filter("hour", "in", tuple(sorted({int(m.group(1)) for m in hours}))))
+
+    # Trimestres (Q1, T2, "premier trimestre")
+    quarters = {int(m.group(1)) for m in text.take(r"(?<!\w)[qt]([1-4])(?!\w)")}
+    ordinals = {"premier": 1, "1er": 1, "first": 1, "deuxieme": 2, "second": 2, "2e": 2,
+                "troisieme": 3, "third": 3, "3e": 3, "quatrieme": 4, "fourth": 4, "4e": 4}
+    for m in text.take(rf"({_alternatives(list(ordinals))})\s+(?:trimestre|quarter)"):
+        quarters.add(ordinals[m.group(1)])
+    if quarters:
+        filters.append(Filter("quarter", "in", tuple(sorted(quarters))))
+
+    years = {int(m.group(1)) for m in text.take(r"(?<!\d)(20\d{2})(?!\d)")}
+    if years:
+        filters.append(Filter("year", "in", tuple(sorted(years))))
+
+    for name, table in (("month", _MONTHS), ("weekday", _WEEKDAYS)):
+        words = [w for ws in table.values() for w in ws]
+        found = {_lookup(table, m.group(0)) for m in text.take(_word(words))}
+        if found:
+            filters.append(Filter(name, "in", tuple(sorted(found))))
+
+    for name, table in (("result", _RESULTS), ("outcome", _OUTCOMES)):
+        words = [w for ws in table.values() for w in ws]
+        found = {_lookup(table, m.group(0)) for m in text.take(_word(words))}
+        if len(found) == 1:
+            filters.append(Filter(name, "in", tuple(found)))
+
+    return filters
+
+
+@lru_cache(maxsize=512)
+def compile_question(question: str) -> QueryPlan:
+    """
+    Compile une question en plan (mis en cache par texte de question)
+    Grammaire: [intention] [métriques] [par <dimension>] [filtres]
+    - métriques: win rate, pnl, pnl moyen, expectancy, profit factor, drawdown, nombre...
+    - regroupement: "par/by/per <heure|jour|mois|trimestre|année|direction|sortie|largeur d'OPR>"
+    - filtres: longs/shorts, TP/SL/EOD, gagnants/perdants, Q1-Q4, années, mois, jours,
+      plages horaires ("entre 10h et 12h", "after 14h") et dates ("depuis 2024-08-01")
+    """
+    text = _Text(question)
+
+    for intent in ("code", "volatility"):
+        if text.has(_INTENT_WORDS[intent]):
+            return QueryPlan(intent=intent)
+
+    # Regroupement explicite ("par heure", "by weekday")
+    group_by = None
+    all_groups = [w for ws in _GROUP_WORDS.values() for w in ws]
+    for m in text.take(rf"(?:by|par|per|pour chaque|selon|for each)\s+(?:the\s+|le\s+|la\s+|les\s+|l')?({_alternatives(all_groups)})(?!\w)"):
+        group_by = group_by or _lookup(_GROUP_WORDS, m.group(1))
+
+    # "long vs short", "longs et shorts": comparaison des deux directions
+    directions = {_lookup(_DIRECTIONS, m.group(0))
+                  for m in text.take(_word([w for ws in _DIRECTIONS.values() for w in ws]))}
+    if len(directions) == 2 and group_by is None:
+        group_by = "direction"
+
+    metrics = []
+    for metric, words in _METRIC_WORDS:
+        if text.take(_word(words)):
+            metrics.append(metric)
+
+    filters = _parse_filters(text)
+    if len(directions) == 1:
+        filters.append(Filter("direction", "in", tuple(directions)))
+
+    if group_by is None:
+        for name, words in _GROUP_ADJECTIVES.items():
+            if text.take(_word(words)):
+                group_by = name
+                break
+
+    buckets = DEFAULT_BUCKETS
+    m = re.search(r"(\d{1,2})\s+(?:tranches|buckets|groupes|groups)", text.text)
+    if m:
+        buckets = max(2, min(int(m.group(1)), 20))
+
+    if not (metrics or filters or group_by):
+        intent = "performance" if text.has(_INTENT_WORDS["performance"]) else "help"
+        return QueryPlan(intent=intent)
+
+    # Ordre canonique des métriques (un même plan pour des formulations équivalentes)
+    ordered = tuple(m for m in METRICS if m in metrics) or DEFAULT_METRICS
+    if "trades" not in ordered:
+        ordered = ("trades",) + ordered
+    return QueryPlan(
+        intent="query",
+        filters=tuple(sorted(set(filters), key=lambda f: (f.field, f.op, str(f.value)))),
+        group_by=group_by,
+        metrics=ordered,
+        buckets=buckets if group_by == "opr_width" else DEFAULT_BUCKETS,
+    )
@@ -0,0 +1,181 @@
+"""
+Analyse des excursions (MAE / MFE / ETD) des exports NinjaTrader
+Montants de l'export en USD par trade: MAE (excursion adverse max), MFE (excursion favorable max),
+ETD (rendu depuis le MFE = MFE - profit net). Stop et objectif hypothétiques sont évalués
+pour toute une grille de niveaux en une opération matricielle (trades x niveaux)
+"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.data.ninja import clean_numeric, pnl_column
+
+DEFAULT_STEPS = 50
+MAX_STEPS = 500
+# Haut de la grille par défaut: percentile des excursions (évite qu'un trade extrême écrase la courbe)
+GRID_PERCENTILE = 99
+BARS_BUCKETS = (1, 2, 3, 5, 10, 20, 50)
+
+
+def _column(df: pd.DataFrame, *names: str) -> Optional[str]:
+    for col in df.columns:
+        if col.lower().strip() in names:
+            return col
+    return None
+
+
+def excursion_frame(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Colonnes d'excursion d'un export typé en tableaux float64 (trades sans MAE/MFE/PnL exclus)
+    Les montants de stop/objectif sont ramenés au contrat (divisés par la quantité)
+    """
+    pnl_col = pnl_column(df)
+    mae_col, mfe_col = _column(df, "mae"), _column(df, "mfe")
+    if pnl_col is None or mae_col is None or mfe_col is None:
+        raise ValueError("L'export doit contenir les colonnes MAE, MFE et une colonne PnL")
+
+    def values(col: Optional[str], default: float) -> np.ndarray:
+        if col is None:
+            return np.full(len(df), default)
+        return clean_numeric(df[col]).to_numpy()
+
+    columns = {
+        "trade": np.asarray(df.index, dtype=float) + 1,
+        "pnl": values(pnl_col, np.nan),
+        "mae": np.abs(values(mae_col, np.nan)),
+        "mfe": np.abs(values(mfe_col, np.nan)),
+        "etd": values(_column(df, "etd"), np.nan),
+        "commission": np.nan_to_num(values(_column(df, "commission"), 0.0)),
+        "bars": values(_column(df, "barres", "bars"), np.nan),
+        "contracts": np.abs(values(_column(df, "qté", "qty", "quantity", "quantité"), 1.0)),
+    }
+    columns["contracts"] = np.where(np.isfinite(columns["contracts"]) & (columns["contracts"] > 0),
+                                    columns["contracts"], 1.0)
+    keep = np.isfinite(columns["pnl"]) & np.isfinite(columns["mae"]) & np.isfinite(columns["mfe"])
+    return {name: col[keep] for name, col in columns.items()}
+
+
+def _grid(values: np.ndarray, levels: Optional[Sequence[float]], steps: int) -> np.ndarray:
+    if levels:
+        return np.unique(np.abs(np.asarray(levels, dtype=float)))
+    top = np.percentile(values, GRID_PERCENTILE) if len(values) else 0.0
+    if top <= 0:
+        return np.zeros(0)
+    return np.linspace(top / steps, top, steps)
+
+
+def _curve(levels: np.ndarray, pnl: np.ndarray, triggered: np.ndarray, exit_pnl: np.ndarray) -> Dict[str, Any]:
+    """
+    Résultat de chaque niveau: les trades déclenchés (triggered, trades x niveaux) sortent à exit_pnl,
+    les autres gardent leur PnL réel
+    """
+    outcome = np.where(triggered, exit_pnl, pnl[:, None])
+    net = outcome.sum(axis=0)
+    best = int(np.argmax(net)) if len(levels) else None
+    return {
+        "levels": levels.tolist(),
+        "net_pnl": net.tolist(),
+        "win_rate": ((outcome > 0).mean(axis=0) if len(pnl) else np.zeros(len(levels))).tolist(),
+        "triggered": triggered.sum(axis=0).tolist(),
+        "best_level": float(levels[best]) if best is not None else None,
+        "best_net_pnl": float(net[best]) if best is not None else None,
+    }
+
+
+def _edge_ratio(mfe: np.ndarray, mae: np.ndarray) -> Optional[float]:
+    """Edge ratio: MFE moyen / MAE moyen (> 1: les trades vont plus dans le bon sens que contre)"""
+    mean_mae = mae.mean() if len(mae) else 0.0
+    return float(mfe.mean() / mean_mae) if mean_mae > 0 else None
+
+
+def excursion_analysis(
+    df: pd.DataFrame,
+    stops: Optional[Sequence[float]] = None,
+    targets: Optional[Sequence[float]] = None,
+    steps: int = DEFAULT_STEPS
+) -> Dict[str, Any]:
+    """
+    Analyse MAE/MFE d'un export
+    - scatter: points (MAE, MFE, PnL, ETD, barres) par trade pour un nuage MAE/MFE
+    - stop_curve: PnL net si chaque trade avait été coupé à `stop` USD/contrat de perte latente
+      (trade sorti à -stop - commission si son MAE atteint le stop)
+    - target_curve: PnL net avec un objectif à `target` USD/contrat (sortie à +target - commission
+      si son MFE atteint l'objectif)
+    - edge_ratio: global et par durée de détention (barres)
+    Niveaux explicites (stops/targets) ou grille de `steps` niveaux jusqu'au 99e percentile
+    Hypothèse: sortie exactement au niveau (ni slippage, ni ordre MAE/MFE dans le trade)
+    """
+    if steps < 1 or steps > MAX_STEPS:
+        raise ValueError(f"steps doit être entre 1 et {MAX_STEPS}")
+
+    cols = excursion_frame(df)
+    n = len(cols["pnl"])
+    contracts = cols["contracts"]
+    mae_pc = cols["mae"] / contracts
+    mfe_pc = cols["mfe"] / contracts
+    winners = cols["pnl"] > 0
+
+    stop_levels = _grid(mae_pc, stops, steps)
+    target_levels = _grid(mfe_pc, targets, steps)
+
+    # Matrices trades x niveaux (broadcast), une seule évaluation par courbe
+    stop_curve = _curve(
+        stop_levels, cols["pnl"],
+        mae_pc[:, None] >= stop_levels[None, :],
+        -stop_levels[None, :] * contracts[:, None] - cols["commission"][:, None]
+    )
+    target_curve = _curve(
+        target_levels, cols["pnl"],
+        mfe_pc[:, None] >= target_levels[None, :],
+        target_levels[None, :] * contracts[:, None] - cols["commission"][:, None]
+    )
+
+    # Edge ratio par durée de détention (tranches de barres)
+    by_bars = []
+    bars = cols["bars"]
+    timed = np.isfinite(bars)
+    if timed.any():
+        edges = np.r_[BARS_BUCKETS, np.inf]
+        bucket = np.searchsorted(edges, bars[timed], side="right") - 1
+        bucket = np.clip(bucket, 0, len(BARS_BUCKETS) - 1)
+        count = np.bincount(bucket, minlength=len(BARS_BUCKETS))
+        sum_mfe = np.bincount(bucket, weights=mfe_pc[timed], minlength=len(BARS_BUCKETS))
+        sum_mae = np.bincount(bucket, weights=mae_pc[timed], minlength=len(BARS_BUCKETS))
+        sum_pnl = np.bincount(bucket, weights=cols["pnl"][timed], minlength=len(BARS_BUCKETS))
+        for i in np.flatnonzero(count):
+            upper = BARS_BUCKETS[i + 1] - 1 if i + 1 < len(BARS_BUCKETS) else None
+            by_bars.append({
+                "min_bars": BARS_BUCKETS[i],
+                "max_bars": upper,
+                "trades": int(count[i]),
+                "edge_ratio": float(sum_mfe[i] / sum_mae[i]) if sum_mae[i] > 0 else None,
+                "avg_pnl": float(sum_pnl[i] / count[i]),
+            })
+
+    def percentiles(values: np.ndarray) -> Optional[Dict[str, float]]:
+        if not len(values):
+            return None
+        return dict(zip(["p50", "p75", "p90", "p95"], np.percentile(values, (50, 75, 90, 95)).tolist()))
+
+    return {
+        "trades": int(n),
+        "net_pnl": float(cols["pnl"].sum()),
+        "scatter": {
+            "trade": cols["trade"].astype(int).tolist(),
+            "mae": cols["mae"].tolist(),
+            "mfe": cols["mfe"].tolist(),
+            "pnl": cols["pnl"].tolist(),
+            "etd": cols["etd"].tolist(),
+            "bars": cols["bars"].tolist(),
+        },
+        "stop_curve": stop_curve,
+        "target_curve": target_curve,
+        "edge_ratio": _edge_ratio(mfe_pc, mae_pc),
+        "edge_ratio_by_bars": by_bars,
+        # MAE des gagnants: un stop au-delà de ces niveaux n'aurait coupé que peu de gagnants
+        "winners_mae": percentiles(mae_pc[winners]),
+        "losers_mfe": percentiles(mfe_pc[~winners]),
+        "avg_etd": float(np.nanmean(cols["etd"])) if np.isfinite(cols["etd"]).any() else None,
+    }
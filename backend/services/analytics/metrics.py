@@ -0,0 +1,180 @@
+"""
+Métriques de risque étendues d'un backtest
+Calculées une seule fois à la collecte des résultats (tableaux NumPy, pas de copies filtrées)
+et stockées dans results.json sous 'risk_metrics'
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+R_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """Longueurs des séquences consécutives de True"""
+    if not mask.any():
+        return np.zeros(0, dtype=int)
+    edges = np.diff(np.r_[0, mask.astype(np.int8), 0])
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def _ratio(num: float, den: float) -> Optional[float]:
+    return float(num / den) if den and np.isfinite(den) else None
+
+
+def r_multiples(trades: pd.DataFrame) -> Optional[np.ndarray]:
+    """
+    R-multiple de chaque trade depuis les colonnes du CSV de la stratégie
+    - risk_usd présent: pnl_usd / risk_usd
+    - sinon entry/sl présents: points / |entry - sl|
+    None si le risque initial n'est pas connu
+    """
+    if "risk_usd" in trades:
+        risk = pd.to_numeric(trades["risk_usd"], errors="coerce").to_numpy(dtype=float)
+        gain = pd.to_numeric(trades["pnl_usd"], errors="coerce").to_numpy(dtype=float)
+    elif "sl" in trades and "entry" in trades and "points" in trades:
+        risk = np.abs(pd.to_numeric(trades["entry"], errors="coerce").to_numpy(dtype=float)
+                      - pd.to_numeric(trades["sl"], errors="coerce").to_numpy(dtype=float))
+        gain = pd.to_numeric(trades["points"], errors="coerce").to_numpy(dtype=float)
+    else:
+        return None
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        r = np.where(risk > 0, gain / risk, np.nan)
+    return r
+
+
+def risk_metrics(
+    pnl: np.ndarray,
+    dates: np.ndarray,
+    wins: np.ndarray,
+    r: Optional[np.ndarray] = None
+) -> Dict[str, Any]:
+    """
+    Métriques de risque d'une suite de trades (dans l'ordre d'exécution)
+    - pnl: PnL USD par trade, dates: date de session (YYYY-MM-DD), wins: booléens gagnant
+    - r: R-multiples optionnels (NaN si inconnu)
+    Les montants sont en USD (pas de capital de référence dans les backtests)
+    """
+    pnl = np.asarray(pnl, dtype=float)
+    wins = np.asarray(wins, dtype=bool)
+    n = len(pnl)
+    if n == 0:
+        return {}
+
+    # PnL journalier (jours de trading présents) via codes de date + bincount
+    days, day_code = np.unique(np.asarray(dates, dtype="datetime64[D]"), return_inverse=True)
+    daily = np.bincount(day_code, weights=pnl, minlength=len(days))
+
+    mean_daily = daily.mean()
+    std_daily = daily.std(ddof=1) if len(daily) > 1 else 0.0
+    downside = np.sqrt(np.mean(np.minimum(daily, 0.0) ** 2))
+    annualize = np.sqrt(TRADING_DAYS_PER_YEAR)
+
+    # Équité et drawdown journaliers
+    equity = np.cumsum(daily)
+    peak = np.maximum.accumulate(np.r_[0.0, equity])[1:]
+    drawdown = equity - peak
+    max_drawdown = float(drawdown.min())
+    underwater = drawdown < 0
+
+    # Durées sous l'eau: en jours de trading et en jours calendaires (du pic à la récupération)
+    spells = _runs(underwater)
+    longest_days = int(spells.max()) if len(spells) else 0
+    longest_calendar = 0
+    if len(spells):
+        ends = np.flatnonzero(np.diff(np.r_[underwater.astype(np.int8), 0]) == -1)
+        starts = ends - spells + 1
+        # Du dernier jour au pic jusqu'au jour de récupération (ou la fin des données)
+        peak_days = days[np.maximum(starts - 1, 0)]
+        recovery_days = days[np.minimum(ends + 1, len(days) - 1)]
+        longest_calendar = int((recovery_days - peak_days).astype(int).max())
+
+    # Rendement annualisé (USD/an) sur la période calendaire couverte
+    span_years = max((days[-1] - days[0]).astype(int) + 1, 1) / 365.25
+    annual_pnl = equity[-1] / span_years
+
+    # Calmar: 36 derniers mois, MAR: toute la période
+    recent = days >= days[-1] - np.timedelta64(3 * 365, "D")
+    recent_equity = np.cumsum(daily[recent])
+    recent_dd = (recent_equity - np.maximum.accumulate(np.r_[0.0, recent_equity])[1:]).min()
+    recent_years = max((days[-1] - days[recent][0]).astype(int) + 1, 1) / 365.25
+
+    # Séries de trades gagnants / perdants consécutifs
+    win_streaks = _runs(wins)
+    loss_streaks = _runs(~wins)
+
+    metrics = {
+        "trading_days": int(len(days)),
+        "sharpe_ratio": _ratio(mean_daily * annualize, std_daily),
+        "sortino_ratio": _ratio(mean_daily * annualize, downside),
+        "annual_pnl": float(annual_pnl),
+        "calmar_ratio": _ratio(recent_equity[-1] / recent_years, abs(recent_dd)),
+        "mar_ratio": _ratio(annual_pnl, abs(max_drawdown)),
+        "ulcer_index": float(np.sqrt(np.mean(drawdown ** 2))),
+        "max_drawdown_daily": max_drawdown,
+        "longest_drawdown_days": longest_days,
+        "longest_drawdown_calendar_days": longest_calendar,
+        "time_under_water": float(underwater.mean()),
+        "max_consecutive_wins": int(win_streaks.max()) if len(win_streaks) else 0,
+        "max_consecutive_losses": int(loss_streaks.max()) if len(loss_streaks) else 0,
+        "best_day": float(daily.max()),
+        "worst_day": float(daily.min()),
+        "r_multiples": None,
+    }
+
+    if r is not None:
+        r = np.asarray(r, dtype=float)
+        r = r[np.isfinite(r)]
+        if len(r):
+            edges = np.arange(np.floor(r.min() * 2) / 2, np.ceil(r.max() * 2) / 2 + 0.5, 0.5)
+            counts, edges = np.histogram(r, bins=edges if len(edges) > 1 else 1)
+            metrics["r_multiples"] = {
+                "count": int(len(r)),
+                "mean": float(r.mean()),
+                "std": float(r.std(ddof=1)) if len(r) > 1 else 0.0,
+                "percentiles": dict(zip(
+                    [f"p{p}" for p in R_PERCENTILES],
+                    np.percentile(r, R_PERCENTILES).tolist()
+                )),
+                "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+            }
+
+    return metrics
+
+
+def trade_days(trades: pd.DataFrame) -> pd.Series:
+    """
+    Jour de chaque trade: colonne date, sinon jour de entry_time puis exit_time
+    (CSV de stratégie sans colonne date). NaT si aucune n'est exploitable
+    """
+    days = pd.Series(pd.NaT, index=trades.index, dtype="datetime64[ns]")
+    for column in ("date", "entry_time", "exit_time"):
+        if column in trades:
+            parsed = pd.to_datetime(trades[column].astype(str).str[:10], errors="coerce")
+            days = days.fillna(parsed)
+    return days
+
+
+def trades_risk_metrics(trades: pd.DataFrame) -> Dict[str, Any]:
+    """risk_metrics depuis un DataFrame de trades (colonnes date ou entry_time, pnl_usd, result, et risque si présent)"""
+    if trades is None or trades.empty:
+        return {}
+    # Même nettoyage que les métriques du run: PnL non numérique ou non fini exclu
+    pnl = pd.to_numeric(trades["pnl_usd"], errors="coerce").to_numpy(dtype=float)
+    if "result" in trades:
+        wins = (trades["result"] == "TP").to_numpy()
+    else:
+        wins = pnl > 0
+    dates = trade_days(trades)
+    valid = dates.notna().to_numpy() & np.isfinite(pnl)
+    r = r_multiples(trades)
+    return risk_metrics(
+        pnl[valid],
+        dates.to_numpy()[valid],
+        wins[valid],
+        r[valid] if r is not None else None
+    )
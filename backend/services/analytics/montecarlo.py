@@ -0,0 +1,177 @@
+"""
+Monte Carlo / bootstrap de la séquence de trades d'un run terminé
+Chaque méthode construit une matrice d'indices rééchantillonnés (simulations x trades),
+l'applique au vecteur de PnL puis calcule équité, drawdown et ruine par lignes (NumPy)
+Les simulations sont découpées en blocs répartis sur les cœurs (NumPy libère le GIL)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from services.analytics.metrics import trade_days
+
+# iid: tirage avec remise des trades, block: tirage avec remise de journées entières
+# (conserve la dépendance intra-journée), shuffle: permutation de l'ordre des trades
+METHODS = ("iid", "block", "shuffle")
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+HISTOGRAM_BINS = 50
+MAX_SIMULATIONS = 100_000
+
+# Taille max d'un bloc de simulations (en cellules de la matrice, ~16 Mo en float64)
+MAX_CHUNK_CELLS = 2_000_000
+MONTECARLO_MAX_WORKERS = int(os.getenv("MONTECARLO_MAX_WORKERS", str(os.cpu_count() or 1)))
+
+_pool = ThreadPoolExecutor(max_workers=MONTECARLO_MAX_WORKERS, thread_name_prefix="montecarlo")
+
+
+def _path_stats(paths: np.ndarray, ruin_level: float) -> Dict[str, np.ndarray]:
+    """PnL final, drawdown max et ruine de chaque ligne d'une matrice de PnL par trade"""
+    equity = np.cumsum(paths, axis=1)
+    peak = np.maximum.accumulate(equity, axis=1)
+    np.maximum(peak, 0.0, out=peak)  # Le pic initial est le capital de départ (équité 0)
+    drawdown = (equity - peak).min(axis=1)
+    return {
+        "final_pnl": equity[:, -1],
+        "max_drawdown": np.minimum(drawdown, 0.0),
+        "ruined": equity.min(axis=1) <= ruin_level,
+    }
+
+
+def _day_matrix(pnl: np.ndarray, dates: np.ndarray) -> np.ndarray:
+    """
+    PnL des trades rangés par journée: matrice (jours x trades max par jour)
+    complétée par des zéros (un trade nul ne change ni l'équité ni le drawdown)
+    """
+    _, day_code, counts = np.unique(dates, return_inverse=True, return_counts=True)
+    order = np.argsort(day_code, kind="stable")
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    rank = np.arange(len(pnl)) - np.repeat(starts, counts)
+    matrix = np.zeros((len(counts), counts.max()))
+    matrix[day_code[order], rank] = pnl[order]
+    return matrix
+
+
+def _simulate_chunk(
+    method: str,
+    pnl: np.ndarray,
+    days: Optional[np.ndarray],
+    size: int,
+    ruin_level: float,
+    seed: np.random.SeedSequence
+) -> Dict[str, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    n = len(pnl)
+    if method == "iid":
+        paths = pnl[rng.integers(0, n, size=(size, n))]
+    elif method == "shuffle":
+        paths = pnl[rng.permuted(np.broadcast_to(np.arange(n), (size, n)), axis=1)]
+    else:
+        picks = rng.integers(0, len(days), size=(size, len(days)))
+        paths = days[picks].reshape(size, -1)
+    return _path_stats(paths, ruin_level)
+
+
+def _distribution(values: np.ndarray) -> Dict[str, Any]:
+    # Valeurs identiques (ex: PnL final d'une permutation): un seul intervalle
+    bins = HISTOGRAM_BINS if np.ptp(values) > 1e-6 else 1
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        "mean": float(values.mean()),
+        "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+        "min": float(values.min()),
+        "max": float(values.max()),
+        "percentiles": dict(zip([f"p{p}" for p in PERCENTILES], np.percentile(values, PERCENTILES).tolist())),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def simulate(
+    pnl: np.ndarray,
+    dates: Optional[np.ndarray] = None,
+    method: str = "iid",
+    simulations: int = 10000,
+    ruin_loss: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Simule `simulations` séquences de trades et retourne, par simulation,
+    final_pnl, max_drawdown (<= 0) et ruined (équité <= -ruin_loss à un moment)
+    - dates: date de session de chaque trade, requise pour method='block'
+    """
+    if method not in METHODS:
+        raise ValueError(f"Méthode inconnue: {method} (attendu: {', '.join(METHODS)})")
+    pnl = np.asarray(pnl, dtype=float)
+    days = None
+    if method == "block":
+        if dates is None:
+            raise ValueError("Le bootstrap par journée nécessite les dates des trades")
+        days = _day_matrix(pnl, np.asarray(dates))
+        row_cells = days.size
+    else:
+        row_cells = len(pnl)
+
+    ruin_level = -abs(ruin_loss) if ruin_loss else -np.inf
+    chunk = max(1, min(simulations, MAX_CHUNK_CELLS // max(row_cells, 1)))
+    sizes = [min(chunk, simulations - start) for start in range(0, simulations, chunk)]
+    # Une graine fille indépendante par bloc: résultat identique quel que soit le parallélisme
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    parts = list(_pool.map(
+        lambda args: _simulate_chunk(method, pnl, days, args[0], ruin_level, args[1]),
+        zip(sizes, seeds)
+    ))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+
+def monte_carlo(
+    trades: pd.DataFrame,
+    methods: Sequence[str] = METHODS,
+    simulations: int = 10000,
+    ruin_loss: Optional[float] = None,
+    seed: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Robustesse d'un run par rééchantillonnage de ses trades
+    Pour chaque méthode: distributions du PnL final et du drawdown max, risque de ruine,
+    probabilité de perte et probabilité d'un drawdown pire que celui du backtest
+    - ruin_loss: perte cumulée (USD, depuis le départ) considérée comme la ruine
+    """
+    result: Dict[str, Any] = {
+        "simulations": simulations,
+        "seed": seed,
+        "ruin_loss": ruin_loss,
+        "trades": 0,
+        "actual": None,
+        "methods": {},
+    }
+    if trades is None or trades.empty:
+        return result
+
+    pnl = trades["pnl_usd"].to_numpy(dtype=float)
+    # Clé de journée (YYYY-MM-DD): colonne date, sinon jour de entry_time / exit_time
+    # Les trades sans jour exploitable forment une seule journée ("")
+    dates = trade_days(trades).dt.strftime("%Y-%m-%d").fillna("").to_numpy()
+    ruin_level = -abs(ruin_loss) if ruin_loss else -np.inf
+    actual = {k: v[0].item() for k, v in _path_stats(pnl[None, :], ruin_level).items()}
+    result["trades"] = int(len(pnl))
+    result["actual"] = actual
+
+    for method in methods:
+        sims = simulate(pnl, dates, method, simulations, ruin_loss, seed)
+        result["methods"][method] = {
+            "final_pnl": _distribution(sims["final_pnl"]),
+            "max_drawdown": _distribution(sims["max_drawdown"]),
+            "risk_of_ruin": float(sims["ruined"].mean()) if ruin_loss else None,
+            "prob_loss": float((sims["final_pnl"] < 0).mean()),
+            "prob_worse_drawdown": float((sims["max_drawdown"] < actual["max_drawdown"]).mean()),
+        }
+    return result
+
+
+def shutdown_pool():
+    _pool.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,163 @@
+"""
+Portefeuille combiné de plusieurs exports NinjaTrader
+Les trades de chaque stratégie (tableaux colonnaires triés par heure de sortie) sont fusionnés
+par un tri stable sur l'heure de sortie, puis équité, drawdown, PnL journalier et exposition
+en marge sont calculés sur les tableaux fusionnés (NumPy, pas de boucle par trade)
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_NAT = np.iinfo(np.int64).min
+
+
+def _format_times(values_ns: np.ndarray) -> List[str]:
+    return pd.DatetimeIndex(values_ns.astype("datetime64[ns]")).strftime(TIME_FORMAT).tolist()
+
+
+def _drawdown(equity: np.ndarray) -> np.ndarray:
+    """Drawdown depuis le plus haut (le capital de départ, équité 0, compte comme pic)"""
+    peak = np.maximum.accumulate(np.r_[0.0, equity])[1:]
+    return equity - peak
+
+
+def _exposure(
+    columns: Dict[str, Dict[str, np.ndarray]],
+    weights: Dict[str, float],
+    margins: Dict[str, float]
+) -> Dict[str, Any]:
+    """
+    Contrats ouverts et marge immobilisée au cours du temps
+    Balayage des événements (entrée +, sortie -) triés par heure, entrées avant sorties
+    à horodatage égal: un trade ouvert et fermé sur la même barre compte dans l'exposition
+    """
+    times, kinds, contracts, margin, owner = [], [], [], [], []
+    missing = set()
+    strategy_ids = list(columns)
+    for i, (strategy_id, cols) in enumerate(columns.items()):
+        timed = cols["entry_ns"] != _NAT
+        size = cols["contracts"][timed] * weights[strategy_id]
+        per_contract = np.array([margins.get(root, np.nan) for root in cols["instrument"][timed]], dtype=float)
+        missing.update(root for root in cols["instrument"][timed][np.isnan(per_contract)] if root)
+        per_contract = np.nan_to_num(per_contract)
+        for kind, stamp, sign in ((0, cols["entry_ns"][timed], 1.0), (1, cols["exit_ns"][timed], -1.0)):
+            times.append(stamp)
+            kinds.append(np.full(len(stamp), kind, dtype=np.int8))
+            contracts.append(sign * size)
+            margin.append(sign * size * per_contract)
+            owner.append(np.full(len(stamp), i))
+
+    empty = {
+        "times": [], "contracts": [], "margin": [], "max_contracts": 0.0, "max_margin": 0.0,
+        "max_margin_time": None, "max_margin_by_strategy": {}, "missing_margins": sorted(missing)
+    }
+    if not times or not sum(len(t) for t in times):
+        return empty
+
+    times = np.concatenate(times)
+    order = np.lexsort((np.concatenate(kinds), times))
+    times = times[order]
+    open_contracts = np.cumsum(np.concatenate(contracts)[order])
+    margin = np.concatenate(margin)[order]
+    owner = np.concatenate(owner)[order]
+    used_margin = np.cumsum(margin)
+
+    # Marge max par stratégie: cumsum par stratégie via masque (N stratégies x événements)
+    by_strategy = {}
+    for i, strategy_id in enumerate(strategy_ids):
+        own = np.cumsum(np.where(owner == i, margin, 0.0))
+        by_strategy[strategy_id] = float(own.max()) if len(own) else 0.0
+
+    # Un seul point par horodatage (état après tous les événements de l'instant)
+    last = np.r_[times[1:] != times[:-1], True]
+    # Le pic est mesuré avant les sorties de l'instant (entrées traitées en premier)
+    peak = int(np.argmax(used_margin))
+    return {
+        "times": _format_times(times[last]),
+        "contracts": np.round(open_contracts[last], 6).tolist(),
+        "margin": np.round(used_margin[last], 2).tolist(),
+        "max_contracts": float(open_contracts.max()),
+        "max_margin": float(used_margin.max()),
+        "max_margin_time": _format_times(times[peak:peak + 1])[0],
+        "max_margin_by_strategy": by_strategy,
+        "missing_margins": sorted(missing),
+    }
+
+
+def combine_exports(
+    columns: Dict[str, Dict[str, np.ndarray]],
+    weights: Optional[Dict[str, float]] = None,
+    margins: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Combine plusieurs stratégies en un seul portefeuille
+    - columns: stratégie -> tableaux de ninja.trade_columns (triés par heure de sortie)
+    - weights: multiplicateur de contrats par stratégie (défaut 1.0), appliqué au PnL et à l'exposition
+    - margins: marge par contrat (USD) par racine d'instrument (ex: {"MNQ": 2000})
+    """
+    weights = {strategy_id: float((weights or {}).get(strategy_id, 1.0)) for strategy_id in columns}
+    margins = margins or {}
+    strategy_ids = list(columns)
+
+    # Fusion triée: concaténation de suites déjà triées + tri stable (fusion de runs, O(n log k))
+    exit_ns = np.concatenate([columns[s]["exit_ns"] for s in strategy_ids])
+    pnl = np.concatenate([columns[s]["pnl"] * weights[s] for s in strategy_ids])
+    owner = np.concatenate([np.full(len(columns[s]["pnl"]), i) for i, s in enumerate(strategy_ids)])
+    order = np.argsort(exit_ns, kind="stable")
+    exit_ns, pnl, owner = exit_ns[order], pnl[order], owner[order]
+
+    equity = np.cumsum(pnl)
+    drawdown = _drawdown(equity)
+
+    # PnL journalier (date de sortie) par stratégie: matrice jours x stratégies via bincount
+    days, day_code = np.unique(exit_ns.astype("datetime64[ns]").astype("datetime64[D]"), return_inverse=True)
+    daily = np.bincount(
+        day_code * len(strategy_ids) + owner, weights=pnl, minlength=len(days) * len(strategy_ids)
+    ).reshape(len(days), len(strategy_ids))
+    if len(days) > 1:
+        correlation = pd.DataFrame(daily, columns=strategy_ids).corr()
+    else:
+        correlation = pd.DataFrame(np.nan, index=strategy_ids, columns=strategy_ids)
+
+    strategies = []
+    for i, strategy_id in enumerate(strategy_ids):
+        own_equity = np.cumsum(columns[strategy_id]["pnl"] * weights[strategy_id])
+        instruments = sorted({root for root in columns[strategy_id]["instrument"] if root})
+        strategies.append({
+            "id": strategy_id,
+            "instruments": instruments,
+            "weight": weights[strategy_id],
+            "trades": int(len(own_equity)),
+            "net_pnl": float(own_equity[-1]) if len(own_equity) else 0.0,
+            "max_drawdown": float(_drawdown(own_equity).min()) if len(own_equity) else 0.0,
+        })
+
+    exposure = _exposure(columns, weights, margins)
+    net_pnl = float(equity[-1]) if len(equity) else 0.0
+    return {
+        "strategies": strategies,
+        "trades": int(len(pnl)),
+        "net_pnl": net_pnl,
+        "max_drawdown": float(drawdown.min()) if len(drawdown) else 0.0,
+        "equity": {
+            "times": _format_times(exit_ns),
+            "strategy": [strategy_ids[i] for i in owner.tolist()],
+            "equity": np.round(equity, 2).tolist(),
+            "drawdown": np.round(drawdown, 2).tolist(),
+        },
+        "daily": {
+            "dates": [str(d) for d in days],
+            "pnl": {strategy_id: daily[:, i].tolist() for i, strategy_id in enumerate(strategy_ids)},
+            "portfolio": daily.sum(axis=1).tolist(),
+        },
+        "correlation": {strategy_id: correlation.loc[strategy_id].tolist() for strategy_id in strategy_ids},
+        "exposure": exposure,
+        # Rendement sur la marge max immobilisée (None si la marge d'un instrument est inconnue)
+        "return_on_margin": (
+            net_pnl / exposure["max_margin"]
+            if exposure["max_margin"] > 0 and not exposure["missing_margins"] else None
+        ),
+    }
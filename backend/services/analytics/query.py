@@ -0,0 +1,199 @@
+"""
+Exécution des plans de requêtes de l'analyste IA (compilés par services.analytics.dsl)
+Les trades d'un run sont convertis une seule fois en colonnes dérivées (heure, jour, trimestre,
+largeur d'OPR...), puis chaque plan = masque de filtres vectorisé + un groupby pandas
+Colonnes et résultats sont mis en cache par run (version des fichiers) et par plan
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from services.analytics.dsl import QueryPlan, format_value
+from services.analytics.metrics import trade_days
+from services.analytics.time_of_day import trade_times
+
+ALL_LABEL = "Tous"
+
+# Colonne dérivée utilisée par chaque champ de filtre / regroupement
+_FILTER_COLUMNS = {
+    "hour": "hour", "weekday": "weekday", "month": "month", "quarter": "quarter", "year": "year",
+    "direction": "direction", "result": "result", "outcome": "win", "date": "date", "opr_width": "opr_width",
+}
+_GROUP_COLUMNS = {**_FILTER_COLUMNS, "month": "year_month"}
+
+
+def _wins(trades: pd.DataFrame) -> pd.Series:
+    """Trades gagnants: résultat TP (comme les métriques du run), sinon PnL > 0"""
+    if "result" in trades:
+        return trades["result"] == "TP"
+    return trades["pnl_usd"] > 0
+
+
+def opr_width(trades: pd.DataFrame) -> pd.Series:
+    """Largeur de l'OPR (points) depuis les colonnes or_high/or_low du CSV de la stratégie (NaN sinon)"""
+    if "or_high" not in trades or "or_low" not in trades:
+        return pd.Series(np.nan, index=trades.index)
+    width = (pd.to_numeric(trades["or_high"], errors="coerce")
+             - pd.to_numeric(trades["or_low"], errors="coerce"))
+    return width.where(width > 0)
+
+
+def trade_columns(trades: pd.DataFrame) -> pd.DataFrame:
+    """Colonnes dérivées des trades (dans l'ordre d'exécution) sur lesquelles portent les plans"""
+    if trades is None or trades.empty:
+        return pd.DataFrame(columns=["pnl", "win", *sorted(set(_GROUP_COLUMNS.values()) - {"win"})])
+
+    entry = trade_times(trades, "entry") if "entry_time" in trades else pd.Series(pd.NaT, index=trades.index)
+    day = trade_days(trades)
+
+    def text(col):
+        return trades[col].astype(str).str.upper().where(trades[col].notna()) if col in trades else None
+
+    return pd.DataFrame({
+        "pnl": trades["pnl_usd"].astype(float),
+        "win": _wins(trades),
+        "hour": entry.dt.hour,
+        "weekday": entry.dt.dayofweek,
+        "date": day,
+        "year": day.dt.year,
+        "quarter": day.dt.quarter,
+        "month": day.dt.month,
+        "year_month": day.dt.strftime("%Y-%m"),
+        "direction": text("direction"),
+        "result": text("result"),
+        "opr_width": opr_width(trades),
+    }).reset_index(drop=True)
+
+
+def _mask(frame: pd.DataFrame, plan: QueryPlan) -> np.ndarray:
+    mask = np.ones(len(frame), dtype=bool)
+    for f in plan.filters:
+        column = frame[_FILTER_COLUMNS[f.field]]
+        if f.field == "outcome":
+            mask &= (column == (f.value == ("win",))).to_numpy()
+            continue
+        value = pd.Timestamp(f.value) if f.field == "date" else f.value
+        if f.op == "in":
+            mask &= column.isin(value).to_numpy()
+        elif f.op == ">=":
+            mask &= (column >= value).to_numpy()
+        elif f.op == "<":
+            mask &= (column < value).to_numpy()
+        elif f.op == "<=":
+            mask &= (column <= value).to_numpy()
+        else:
+            raise ValueError(f"Opérateur inconnu: {f.op}")
+    return mask
+
+
+def execute_plan(frame: pd.DataFrame, plan: QueryPlan) -> Dict[str, Any]:
+    """
+    Exécute un plan sur les colonnes d'un run: filtres -> regroupement -> agrégats
+    Chaque ligne: clé du groupe et métriques demandées (trades, total_pnl, win_rate...)
+    """
+    uses_width = plan.group_by == "opr_width" or any(f.field == "opr_width" for f in plan.filters)
+    if uses_width and not frame.empty and frame["opr_width"].isna().all():
+        raise ValueError("Les trades de ce run n'ont pas de colonnes or_high/or_low (largeur d'OPR)")
+
+    result = {"plan": plan.to_dict(), "rows": [], "total": int(len(frame)), "matched": 0, "excluded": 0}
+    sub = frame[_mask(frame, plan)] if len(frame) else frame
+    result["matched"] = int(len(sub))
+    if sub.empty:
+        return result
+
+    if plan.group_by is None:
+        key = pd.Series(ALL_LABEL, index=sub.index)
+    elif plan.group_by == "opr_width":
+        width = sub["opr_width"]
+        valid = int(width.notna().sum())
+        # Tranches de même effectif (quantiles), bornes en points
+        key = pd.qcut(width, q=min(plan.buckets, valid), duplicates="drop") if valid >= 2 else width
+    else:
+        key = sub[_GROUP_COLUMNS[plan.group_by]]
+    result["excluded"] = int(key.isna().sum())
+
+    pnl = sub["pnl"]
+    wins = sub["win"].astype(bool)
+    grouped = pd.DataFrame({
+        "key": key, "pnl": pnl, "win": wins.astype(float), "win_pnl": pnl.where(wins, 0.0)
+    }).dropna(subset=["key"]).groupby("key", observed=True, sort=True)
+    stats = grouped.agg(trades=("pnl", "size"), total_pnl=("pnl", "sum"), wins=("win", "sum"), win_pnl=("win_pnl", "sum"))
+    if stats.empty:
+        return result
+
+    count = stats["trades"].to_numpy(dtype=float)
+    win_count = stats["wins"].to_numpy()
+    loss_count = count - win_count
+    total = stats["total_pnl"].to_numpy()
+    win_pnl = stats["win_pnl"].to_numpy()
+    loss_pnl = total - win_pnl
+    with np.errstate(invalid="ignore", divide="ignore"):
+        win_rate = win_count / count
+        avg_win = np.where(win_count > 0, win_pnl / win_count, 0.0)
+        avg_loss = np.where(loss_count > 0, loss_pnl / loss_count, 0.0)
+        profit_factor = np.where(loss_pnl < 0, win_pnl / -loss_pnl, np.nan)
+
+    values = {
+        "trades": stats["trades"].to_numpy(),
+        "total_pnl": total,
+        "avg_pnl": total / count,
+        "win_rate": win_rate,
+        "expectancy": win_rate * avg_win + (1 - win_rate) * avg_loss,
+        "profit_factor": profit_factor,
+        "avg_win": avg_win,
+        "avg_loss": avg_loss,
+    }
+    if "max_drawdown" in plan.metrics:
+        # Drawdown de l'équité cumulée de chaque groupe (trades dans l'ordre d'exécution)
+        keyed = pd.DataFrame({"key": key, "pnl": pnl}).dropna(subset=["key"])
+        equity = keyed.groupby("key", observed=True)["pnl"].cumsum()
+        peak = equity.groupby(keyed["key"], observed=True).cummax().clip(lower=0.0)
+        drawdown = (equity - peak).groupby(keyed["key"], observed=True).min()
+        values["max_drawdown"] = drawdown.reindex(stats.index).clip(upper=0.0).to_numpy()
+
+    labels = [
+        f"{k.left:.2f}-{k.right:.2f} pts" if isinstance(k, pd.Interval) else format_value(plan.group_by, k)
+        for k in stats.index
+    ] if plan.group_by else [ALL_LABEL]
+    rows = pd.DataFrame({"key": labels, **{m: values[m] for m in plan.metrics}})
+    rows = rows.astype(object).where(rows.notna(), None)
+    result["rows"] = rows.to_dict("records")
+    return result
+
+
+def summarize_trades(trades: pd.DataFrame) -> Dict[str, Any]:
+    """Meilleur / pire trade et PnL par direction (complète les métriques de results.json)"""
+    if trades is None or trades.empty:
+        return {}
+    pnl = trades["pnl_usd"].astype(float)
+    best, worst = int(pnl.idxmax()), int(pnl.idxmin())
+    days = trade_days(trades).dt.strftime("%Y-%m-%d")
+    plan = QueryPlan(group_by="direction", metrics=("trades", "total_pnl", "win_rate"))
+    return {
+        "trades": int(len(trades)),
+        "best_trade": {"date": days[best], "pnl_usd": float(pnl[best])},
+        "worst_trade": {"date": days[worst], "pnl_usd": float(pnl[worst])},
+        "by_direction": execute_plan(trade_columns(trades), plan)["rows"] if "direction" in trades else [],
+    }
+
+
+def run_plan(runner, run_id: str, plan: QueryPlan) -> Optional[Dict[str, Any]]:
+    """
+    Exécute un plan sur les trades d'un run
+    Colonnes dérivées et résultat mis en cache par run et version des fichiers (et par plan):
+    un même message ne relit ni ne recalcule rien
+    Les trades viennent du CSV de la stratégie (toutes ses colonnes), sinon de results.json
+    """
+    artifact = runner.trades_artifact_path(run_id)
+    version = artifact.stat().st_mtime_ns if artifact else None
+
+    def columns(_):
+        return trade_columns(runner.get_trades_artifact(run_id))
+
+    def compute(_, plan):
+        frame = runner.get_run_analytics(run_id, "query_columns", columns, version=version)
+        return execute_plan(frame, plan)
+
+    return runner.get_run_analytics(run_id, "query", compute, version=version, plan=plan)
@@ -0,0 +1,130 @@
+"""
+Analyse temporelle des trades (jour de semaine x heure, x tranche de minutes)
+Calculée depuis les vrais horodatages entry_time/exit_time, agrégation NumPy (bincount)
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DAY_LABELS = ["Lun", "Mar", "Mer", "Jeu", "Ven", "Sam", "Dim"]
+
+
+def trade_times(trades: pd.DataFrame, on: str = "entry") -> pd.Series:
+    """
+    Horodatages UTC des trades (entry_time ou exit_time)
+    Les trades sans heure (date seule ou valeur absente) sont NaT et exclus des grilles
+    """
+    column = f"{on}_time"
+    if column not in trades:
+        raise ValueError(f"Colonne {column} absente des trades")
+
+    raw = trades[column].astype(str)
+    times = pd.to_datetime(raw, utc=True, errors="coerce", format="mixed")
+    # Une valeur "YYYY-MM-DD" n'a pas d'heure: ne pas la compter à 0h
+    times[raw.str.len() <= 10] = pd.NaT
+    return times
+
+
+def _wins(trades: pd.DataFrame) -> np.ndarray:
+    """Trades gagnants: résultat TP (comme les métriques du run), sinon PnL > 0"""
+    if "result" in trades:
+        return (trades["result"] == "TP").to_numpy()
+    return (trades["pnl_usd"].to_numpy(dtype=float) > 0)
+
+
+def _aggregate(codes: np.ndarray, size: int, pnl: np.ndarray, wins: np.ndarray) -> Dict[str, np.ndarray]:
+    """Agrégats par cellule (codes entiers 0..size-1) en une passe bincount par statistique"""
+    count = np.bincount(codes, minlength=size)
+    total = np.bincount(codes, weights=pnl, minlength=size)
+    win_count = np.bincount(codes, weights=wins, minlength=size)
+    win_pnl = np.bincount(codes, weights=np.where(wins, pnl, 0.0), minlength=size)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        loss_count = count - win_count
+        avg_pnl = np.where(count > 0, total / count, 0.0)
+        win_rate = np.where(count > 0, win_count / count, 0.0)
+        avg_win = np.where(win_count > 0, win_pnl / win_count, 0.0)
+        avg_loss = np.where(loss_count > 0, (total - win_pnl) / loss_count, 0.0)
+    expectancy = win_rate * avg_win + (1 - win_rate) * avg_loss
+
+    return {
+        "trades": count, "total_pnl": total, "avg_pnl": avg_pnl, "win_rate": win_rate,
+        "avg_win": avg_win, "avg_loss": avg_loss, "expectancy": expectancy
+    }
+
+
+def _rows(stats: Dict[str, np.ndarray], keys: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+    """Lignes de sortie pour les cellules non vides (conversion colonnaire)"""
+    present = np.flatnonzero(stats["trades"])
+    columns = {name: values[present].tolist() for name, values in keys.items()}
+    columns.update({name: values[present].tolist() for name, values in stats.items()})
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def time_of_day_profile(
+    trades: pd.DataFrame,
+    on: str = "entry",
+    bucket_minutes: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Profil temporel d'un ensemble de trades
+    - grid: jour x heure (x tranche de bucket_minutes minutes si fourni)
+    - by_hour / by_day: marges de la grille
+    Chaque cellule: trades, total_pnl, avg_pnl, win_rate, avg_win, avg_loss, expectancy
+    """
+    if bucket_minutes is not None and (bucket_minutes <= 0 or 60 % bucket_minutes):
+        raise ValueError("bucket_minutes doit diviser 60 (ex: 5, 15, 30)")
+
+    empty = {"on": on, "bucket_minutes": bucket_minutes, "grid": [], "by_hour": [], "by_day": [], "untimed_trades": 0}
+    if trades is None or trades.empty:
+        return empty
+
+    times = trade_times(trades, on)
+    timed = times.notna().to_numpy()
+    empty["untimed_trades"] = int((~timed).sum())
+    if not timed.any():
+        return empty
+
+    times = times[timed]
+    pnl = trades["pnl_usd"].to_numpy(dtype=float)[timed]
+    wins = _wins(trades)[timed]
+
+    day = times.dt.dayofweek.to_numpy()
+    hour = times.dt.hour.to_numpy()
+    buckets = 60 // bucket_minutes if bucket_minutes else 1
+    slot = times.dt.minute.to_numpy() // bucket_minutes if bucket_minutes else np.zeros(len(day), dtype=int)
+
+    # Grille complète codée en un seul entier: ((jour * 24) + heure) * tranches + tranche
+    size = 7 * 24 * buckets
+    grid = _aggregate((day * 24 + hour) * buckets + slot, size, pnl, wins)
+    cells = np.arange(size)
+    grid_keys = {
+        "day": np.array(DAY_LABELS)[cells // (24 * buckets)],
+        "day_index": cells // (24 * buckets),
+        "hour": (cells // buckets) % 24,
+    }
+    if bucket_minutes:
+        grid_keys["minute"] = (cells % buckets) * bucket_minutes
+
+    by_hour = _aggregate(hour, 24, pnl, wins)
+    by_day = _aggregate(day, 7, pnl, wins)
+
+    return {
+        "on": on,
+        "bucket_minutes": bucket_minutes,
+        "grid": _rows(grid, grid_keys),
+        "by_hour": _rows(by_hour, {"hour": np.arange(24)}),
+        "by_day": _rows(by_day, {"day": np.array(DAY_LABELS), "day_index": np.arange(7)}),
+        "untimed_trades": empty["untimed_trades"]
+    }
+
+
+def best_and_worst(rows: List[Dict[str, Any]], key: str = "total_pnl", min_trades: int = 1):
+    """Meilleure et pire cellule d'un profil (ou (None, None) si aucune)"""
+    eligible = [r for r in rows if r["trades"] >= min_trades]
+    if not eligible:
+        return None, None
+    return max(eligible, key=lambda r: r[key]), min(eligible, key=lambda r: r[key])
@@ -0,0 +1,279 @@
+"""
+Entrepôt analytique des runs (SQLite, à côté de la file de jobs)
+Chaque run terminé y est indexé à la fin de son exécution: configuration, paramètres,
+métriques et trades. Les classements et filtres multi-runs ("meilleur profit factor en 2025
+par jeu de paramètres") sont alors une seule requête SQL indexée, sans ouvrir les results.json
+"""
+
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Métriques calculées sur les trades de la période demandée (tri du classement)
+LEADERBOARD_METRICS = ("net_pnl", "profit_factor", "win_rate", "expectancy", "max_drawdown", "trades")
+MAX_LEADERBOARD_LIMIT = 1000
+
+_TRADE_FIELDS = ("id", "date", "entry_time", "exit_time", "direction", "entry", "exit", "points", "pnl_usd", "result")
+
+
+def _number(value: Any) -> Optional[float]:
+    """Valeur numérique d'un paramètre (None pour le texte et les booléens)"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RunWarehouse:
+    """Base SQLite (WAL) des runs terminés, partagée par tous les processus utilisant le dossier runs"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    strategy TEXT,
+                    name TEXT,
+                    started_at TEXT,
+                    completed_at TEXT,
+                    parameters TEXT NOT NULL,
+                    metrics TEXT NOT NULL,
+                    sharpe_ratio REAL,
+                    results_mtime REAL,
+                    input_key TEXT
+                );
+                CREATE INDEX IF NOT EXISTS runs_strategy ON runs (strategy);
+                CREATE TABLE IF NOT EXISTS run_params (
+                    run_id TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    value TEXT,
+                    num REAL,
+                    PRIMARY KEY (run_id, name)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS run_params_value ON run_params (name, value);
+                CREATE INDEX IF NOT EXISTS run_params_num ON run_params (name, num);
+                CREATE TABLE IF NOT EXISTS trades (
+                    run_id TEXT NOT NULL,
+                    id INTEGER NOT NULL,
+                    date TEXT,
+                    entry_time TEXT,
+                    exit_time TEXT,
+                    direction TEXT,
+                    entry REAL,
+                    exit REAL,
+                    points REAL,
+                    pnl_usd REAL,
+                    result TEXT,
+                    PRIMARY KEY (run_id, id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS trades_date ON trades (date, run_id);
+            """)
+            # Bases créées avant la mémoïsation des runs
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+            if "input_key" not in columns:
+                conn.execute("ALTER TABLE runs ADD COLUMN input_key TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_input_key ON runs (input_key, completed_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connexion par opération (utilisable depuis plusieurs threads et processus)
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    def ingest(self, run_id: str, config: Dict[str, Any], status: Dict[str, Any],
+               results: Dict[str, Any], results_mtime: Optional[float] = None):
+        """Indexe (ou réindexe) un run terminé: configuration, paramètres, métriques et trades"""
+        parameters = config.get('parameters') or {}
+        risk = results.get('risk_metrics') or {}
+        trades = [
+            tuple(trade.get(field) for field in _TRADE_FIELDS)
+            for trade in results.get('trades', [])
+        ]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._delete(conn, run_id)
+            conn.execute(
+                "INSERT INTO runs (run_id, strategy, name, started_at, completed_at, parameters, metrics,"
+                " sharpe_ratio, results_mtime, input_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, results.get('strategy') or config.get('strategy_name'), status.get('name'),
+                 status.get('started_at'), status.get('completed_at'),
+                 json.dumps(parameters, default=str), json.dumps(results.get('metrics') or {}, default=str),
+                 risk.get('sharpe_ratio'), results_mtime, config.get('input_key'))
+            )
+            conn.executemany(
+                "INSERT INTO run_params (run_id, name, value, num) VALUES (?, ?, ?, ?)",
+                [(run_id, key, str(value), _number(value)) for key, value in parameters.items()]
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO trades (run_id, {', '.join(_TRADE_FIELDS)})"
+                f" VALUES (?, {', '.join('?' * len(_TRADE_FIELDS))})",
+                [(run_id, *trade) for trade in trades]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def ingest_run_dir(self, run_dir: Path) -> bool:
+        """Indexe un run depuis ses fichiers (config.json, status.json, results.json) s'il est terminé"""
+        run_dir = Path(run_dir)
+        results_file = run_dir / "results.json"
+        try:
+            status = json.loads((run_dir / "status.json").read_text(encoding='utf-8'))
+            if status.get('status') != 'completed' or not results_file.exists():
+                return False
+            config_file = run_dir / "config.json"
+            config = json.loads(config_file.read_text(encoding='utf-8')) if config_file.exists() else {}
+            results = json.loads(results_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        self.ingest(run_dir.name, config, status, results, results_file.stat().st_mtime)
+        return True
+
+    def sync(self, runs_dir: Path) -> int:
+        """
+        Rattrapage: indexe les runs terminés absents (ou dont results.json a changé)
+        et retire ceux dont le dossier a disparu. Retourne le nombre de runs indexés
+        """
+        runs_dir = Path(runs_dir)
+        with closing(self._connect()) as conn:
+            indexed = dict(conn.execute("SELECT run_id, results_mtime FROM runs").fetchall())
+
+        ingested = 0
+        present = set()
+        for run_dir in runs_dir.iterdir():
+            results_file = run_dir / "results.json"
+            if not run_dir.is_dir() or not results_file.exists():
+                continue
+            present.add(run_dir.name)
+            if indexed.get(run_dir.name) == results_file.stat().st_mtime:
+                continue
+            ingested += self.ingest_run_dir(run_dir)
+
+        for run_id in set(indexed) - present:
+            self.remove(run_id)
+        return ingested
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, run_id: str):
+        for table in ("trades", "run_params", "runs"):
+            conn.execute(f"DELETE FROM {table} WHERE run_id = ?", (run_id,))
+
+    def remove(self, run_id: str):
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._delete(conn, run_id)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def runs_with_inputs(self, input_key: str) -> List[str]:
+        """Runs terminés dont les entrées (script, paramètres, données) ont cette clé, plus récent d'abord"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT run_id FROM runs WHERE input_key = ? ORDER BY completed_at DESC", (input_key,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def leaderboard(
+        self,
+        order_by: str = "net_pnl",
+        descending: bool = True,
+        limit: int = 50,
+        strategy: Optional[str] = None,
+        parameters: Optional[Dict[str, Any]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        min_trades: int = 1
+    ) -> List[Dict[str, Any]]:
+        """
+        Classement des runs sur les trades de la période [start_date, end_date] (dates YYYY-MM-DD)
+        - strategy / parameters: filtres exacts (paramètres numériques comparés en valeur)
+        - métriques recalculées sur la période avec les conventions des résultats d'un run:
+          gagnant = TP, profit factor borné à 999.99, drawdown depuis le plus haut de l'équité
+        """
+        if order_by not in LEADERBOARD_METRICS:
+            raise ValueError(f"order_by doit être parmi: {', '.join(LEADERBOARD_METRICS)}")
+        if not 1 <= limit <= MAX_LEADERBOARD_LIMIT:
+            raise ValueError(f"limit doit être entre 1 et {MAX_LEADERBOARD_LIMIT}")
+
+        run_filters, args = [], []
+        if strategy:
+            run_filters.append("r.strategy = ?")
+            args.append(strategy)
+        for key, value in (parameters or {}).items():
+            number = _number(value)
+            column = "num" if number is not None else "value"
+            run_filters.append(f"r.run_id IN (SELECT run_id FROM run_params WHERE name = ? AND {column} = ?)")
+            args += [key, number if number is not None else str(value)]
+
+        trade_filters = []
+        if start_date:
+            trade_filters.append("t.date >= ?")
+            args.append(start_date)
+        if end_date:
+            trade_filters.append("t.date <= ?")
+            args.append(end_date)
+        where = " AND ".join(run_filters + trade_filters) or "1"
+
+        sql = f"""
+            WITH period AS (
+                SELECT t.run_id, t.id, t.date, t.pnl_usd, t.result,
+                       SUM(t.pnl_usd) OVER (PARTITION BY t.run_id ORDER BY t.id
+                                            ROWS UNBOUNDED PRECEDING) AS equity
+                FROM trades t JOIN runs r ON r.run_id = t.run_id
+                WHERE {where}
+            ),
+            drawdowns AS (
+                SELECT *, equity - MAX(equity) OVER (PARTITION BY run_id ORDER BY id
+                                                     ROWS UNBOUNDED PRECEDING) AS drawdown
+                FROM period
+            ),
+            stats AS (
+                SELECT run_id,
+                       COUNT(*) AS trades,
+                       SUM(pnl_usd) AS net_pnl,
+                       AVG(result = 'TP') AS win_rate,
+                       SUM(CASE WHEN result = 'TP' THEN pnl_usd ELSE 0 END) AS gross_profit,
+                       -SUM(CASE WHEN result = 'TP' THEN 0 ELSE pnl_usd END) AS gross_loss,
+                       MIN(drawdown) AS max_drawdown,
+                       MIN(date) AS first_date,
+                       MAX(date) AS last_date
+                FROM drawdowns
+                GROUP BY run_id
+                HAVING COUNT(*) >= ?
+            )
+            SELECT s.*, s.net_pnl / s.trades AS expectancy,
+                   CASE WHEN s.gross_loss > 0 THEN s.gross_profit / s.gross_loss
+                        WHEN s.gross_profit > 0 THEN 999.99 ELSE 0.0 END AS profit_factor,
+                   r.strategy, r.name, r.started_at, r.completed_at, r.parameters, r.sharpe_ratio
+            FROM stats s JOIN runs r ON r.run_id = s.run_id
+            ORDER BY {order_by} {"DESC" if descending else "ASC"}, s.run_id
+            LIMIT ?
+        """
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(sql, (*args, max(1, min_trades), limit)).fetchall()
+
+        leaderboard = []
+        for rank, row in enumerate(rows, start=1):
+            entry = dict(row)
+            entry["rank"] = rank
+            entry["parameters"] = json.loads(entry["parameters"])
+            leaderboard.append(entry)
+        return leaderboard
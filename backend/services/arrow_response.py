@@ -0,0 +1,58 @@
+"""
+Transport binaire colonnaire (Arrow IPC stream) pour les endpoints analytiques
+Activé si le client envoie Accept: application/vnd.apache.arrow.stream et que pyarrow est installé
+"""
+
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from fastapi import Request
+from fastapi.responses import Response
+
+from services.json_response import dumps
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    pa = None
+    pa_ipc = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def wants_arrow(request: Request) -> bool:
+    """Vérifie si le client demande un flux Arrow (et si pyarrow est disponible)"""
+    if pa is None:
+        return False
+    accept = request.headers.get("accept", "")
+    return ARROW_STREAM_MEDIA_TYPE in accept
+
+
+class ArrowResponse(Response):
+    """
+    Réponse Arrow IPC (format stream) construite depuis un DataFrame
+    Les métadonnées optionnelles (métriques, symbole, ...) sont encodées en JSON
+    dans les métadonnées du schéma sous la clé "meta"
+    """
+
+    media_type = ARROW_STREAM_MEDIA_TYPE
+
+    def __init__(self, content: pd.DataFrame, metadata: Optional[Dict[str, Any]] = None, **kwargs):
+        self.metadata = metadata
+        super().__init__(content=content, **kwargs)
+
+    def render(self, content: pd.DataFrame) -> bytes:
+        if pa is None:
+            raise RuntimeError("pyarrow n'est pas installé")
+
+        table = pa.Table.from_pandas(content, preserve_index=False)
+        if self.metadata:
+            schema_meta = dict(table.schema.metadata or {})
+            schema_meta[b"meta"] = dumps(self.metadata)
+            table = table.replace_schema_metadata(schema_meta)
+
+        sink = pa.BufferOutputStream()
+        with pa_ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
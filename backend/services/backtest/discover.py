@@ -9,6 +9,8 @@ import re
 import ast
 import inspect
 import json
+import hashlib
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from dataclasses import dataclass
@@ -25,6 +27,7 @@ class StrategyInfo:
     risk_model: str
     category: str
     tags: List[str]
+    limits: Dict[str, Any] = None  # Limites d'exécution (timeout_seconds, max_memory_mb)
 
 
 class StrategyDiscovery:
@@ -149,7 +152,8 @@ class StrategyDiscovery:
                 timeframe=timeframe,
                 risk_model=risk_model,
                 category=category,
-                tags=tags
+                tags=tags,
+                limits=self.catalog.get(strategy_id, {}).get('limits', {})
             )
             
         except Exception as e:
@@ -323,25 +327,87 @@ class StrategyDiscovery:
         
         return category, tags
 
+def strategy_id_from_name(name: str) -> str:
+    """Identifiant API d'une stratégie (ex: 'OPR 15mn 1R' -> 'opr_15mn_1r')"""
+    return name.lower().replace(' ', '_').replace('-', '_')
+
+
+# Cache de découverte: base_path -> (signature des fichiers, version, liste, index id -> stratégie)
+_discovery_cache: Dict[str, tuple] = {}
+_discovery_lock = threading.Lock()
+
+
+def _sources_signature(base_path: Path) -> tuple:
+    """
+    Signature des fichiers sources de la découverte (scripts, catalog, metadata CSV)
+    Basée sur (nom, mtime_ns, taille): quelques stat() au lieu de relire et re-parser les scripts
+    """
+    files = sorted((base_path / "strategies").glob("BACKTEST_*.py"))
+    files += [base_path / "strategies_catalog.json", base_path / "strategies_metadata.csv"]
+
+    signature = []
+    for f in files:
+        try:
+            st = f.stat()
+            signature.append((f.name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((f.name, None, None))
+    return tuple(signature)
+
+
+def _get_discovery(base_path: str) -> tuple:
+    """Retourne (version, stratégies, index) en ne relançant la découverte que si un fichier a changé"""
+    base = Path(base_path)
+    key = str(base.resolve())
+    signature = _sources_signature(base)
+
+    cached = _discovery_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1], cached[2], cached[3]
+
+    with _discovery_lock:
+        cached = _discovery_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2], cached[3]
+
+        discovery = StrategyDiscovery(base)
+        strategies = [
+            {
+                'id': strategy_id_from_name(s.name),
+                'name': s.name,
+                'script_path': str(s.script_path),
+                'description': s.description,
+                'parameters': s.parameters,
+                'timeframe': s.timeframe,
+                'risk_model': s.risk_model,
+                'category': s.category,
+                'tags': s.tags,
+                'output_files': s.output_files,
+                'limits': s.limits or {}
+            }
+            for s in discovery.discover_all()
+        ]
+        index = {s['id']: s for s in strategies}
+        version = hashlib.sha1(repr(signature).encode()).hexdigest()[:16]
+
+        _discovery_cache[key] = (signature, version, strategies, index)
+        print(f"🔄 Découverte des stratégies: {len(strategies)} stratégies (version {version})")
+        return version, strategies, index
+
+
 def get_available_strategies(base_path: str) -> List[Dict[str, Any]]:
-    """Interface simple pour Streamlit"""
-    discovery = StrategyDiscovery(Path(base_path))
-    strategies = discovery.discover_all()
-    
-    return [
-        {
-            'name': s.name,
-            'script_path': str(s.script_path),
-            'description': s.description,
-            'parameters': s.parameters,
-            'timeframe': s.timeframe,
-            'risk_model': s.risk_model,
-            'category': s.category,
-            'tags': s.tags,
-            'output_files': s.output_files
-        }
-        for s in strategies
-    ]
+    """Interface simple pour Streamlit (résultat mis en cache tant que les fichiers ne changent pas)"""
+    return _get_discovery(base_path)[1]
+
+
+def get_strategy_by_id(base_path: str, strategy_id: str) -> Optional[Dict[str, Any]]:
+    """Recherche O(1) d'une stratégie par son identifiant API"""
+    return _get_discovery(base_path)[2].get(strategy_id)
+
+
+def get_strategies_version(base_path: str) -> str:
+    """Version courante du catalogue de stratégies (utilisée comme ETag)"""
+    return _get_discovery(base_path)[0]
 
 if __name__ == "__main__":
     # Test de découverte
@@ -8,14 +8,60 @@ Interface unifiée et non-intrusive pour lancer les stratégies.
 import os
 import sys
 import json
+import hashlib
 import uuid
-import shutil
+import signal
+import socket
 import subprocess
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, asdict, field
 
+try:
+    import resource  # POSIX uniquement (limites mémoire du processus enfant)
+except ImportError:
+    resource = None
+
+# File d'attente partagée (services/jobs), backend ajouté au path comme pour les routers
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from services.jobs.queue import JobQueue, SQLiteJobQueue, QUEUED
+from services.analytics.metrics import trades_risk_metrics
+from services.analytics.warehouse import RunWarehouse
+from services.data.artifacts import ArtifactStore, remove_tree
+from services.data.cache import create_cache
+from services.json_response import dumps as json_dumps
+
+from walk_forward import OUTPUT_RESULTS_JSON as WALK_FORWARD_RESULTS_JSON
+
+# Intervalle de vérification des annulations pendant l'exécution d'un run
+CANCEL_POLL_SECONDS = 1.0
+
+# Statuts terminaux: execution.log n'est plus écrit
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Script exécuté à la place de la stratégie pour un run en mode walk-forward
+WALK_FORWARD_SCRIPT = Path(__file__).resolve().parent / "walk_forward.py"
+
+# Trades des runs gardés en cache (LRU): un DataFrame par run consulté
+TRADES_CACHE_SIZE = 64
+TRADES_CACHE_TTL = 3600
+
+# Analyses dérivées gardées en cache (LRU, toutes versions et tous runs confondus)
+ANALYTICS_CACHE_SIZE = 256
+ANALYTICS_CACHE_TTL = 3600
+
+# Version de la clé des entrées d'un run (à incrémenter si l'exécution change à entrées égales)
+INPUT_KEY_VERSION = 1
+
+# Colonnes des trades normalisés (cf. models.run.Trade)
+TRADE_COLUMNS = [
+    'id', 'date', 'entry_time', 'exit_time', 'direction',
+    'entry', 'exit', 'points', 'pnl_usd', 'result'
+]
+
 @dataclass
 class RunConfig:
     """Configuration d'une exécution de backtest"""
@@ -27,6 +73,11 @@ class RunConfig:
     parameters: Dict[str, Any] = field(default_factory=dict)
     name: Optional[str] = None
     created_at: Optional[str] = None
+    timeout_seconds: Optional[float] = None  # Durée max d'exécution (wall-clock)
+    max_memory_mb: Optional[int] = None  # Mémoire virtuelle max du processus enfant
+    walk_forward: Optional[Dict[str, Any]] = None  # Grille, fenêtres et objectif (mode walk-forward)
+    input_key: Optional[str] = None  # Hash script + paramètres + données (mémoïsation des runs)
+    reused_from: Optional[str] = None  # Run terminé dont le résultat a été réutilisé
     
     def __post_init__(self):
         if self.created_at is None:
@@ -36,7 +87,7 @@ class RunConfig:
 class RunStatus:
     """Statut d'une exécution"""
     run_id: str
-    status: str  # 'running', 'completed', 'failed', 'pending'
+    status: str  # 'running', 'completed', 'failed', 'pending', 'cancelled'
     progress: float  # 0.0 à 1.0
     message: str
     name: Optional[str] = None
@@ -44,11 +95,17 @@ class RunStatus:
     completed_at: Optional[str] = None
     error: Optional[str] = None
     output_files: List[str] = field(default_factory=list)
+    reused_from: Optional[str] = None
+
+class RunCancelled(Exception):
+    """Levée quand un run est annulé pendant son exécution"""
+
 
 class BacktestRunner:
     """Gestionnaire d'exécution des backtests"""
     
-    def __init__(self, base_path: str, runs_dir: str = None):
+    def __init__(self, base_path: str, runs_dir: str = None, queue: JobQueue = None,
+                 embedded_workers: int = 1, lease_seconds: float = 120):
         self.base_path = Path(base_path)
         
         # Utiliser un dossier temporaire système pour éviter que uvicorn le surveille
@@ -61,13 +118,51 @@ class BacktestRunner:
         self.runs_dir.mkdir(parents=True, exist_ok=True)
         print(f"📁 Dossier runs: {self.runs_dir}")
         
+        # Cache des trades colonnaires par run: run_id -> (mtime results.json, DataFrame)
+        self._trades_cache = create_cache("run_trades", maxsize=TRADES_CACHE_SIZE, ttl=TRADES_CACHE_TTL)
+        # CSV de trades écrit par la stratégie: run_id -> (signature du fichier, DataFrame)
+        self._artifact_cache = create_cache("run_trades_artifact", maxsize=TRADES_CACHE_SIZE,
+                                            ttl=TRADES_CACHE_TTL)
+        
+        # Analyses dérivées par run: (run_id, nom, paramètres) -> (mtime results.json, valeur)
+        # Cache borné (LRU + expiration): chaque question, graine Monte Carlo... ajoute une entrée
+        self._analytics_cache = create_cache("run_analytics", maxsize=ANALYTICS_CACHE_SIZE,
+                                             ttl=ANALYTICS_CACHE_TTL)
+        
+        # File d'attente des runs, partagée par tous les processus utilisant ce dossier runs
+        self.queue = queue or SQLiteJobQueue(self.runs_dir / "jobs.sqlite3")
+        self.lease_seconds = lease_seconds
+        
+        # Fichiers des runs (scripts, données filtrées, CSV) stockés une fois par contenu
+        self.artifacts = ArtifactStore(self.runs_dir / "_blobs")
+        
+        # Entrepôt des runs terminés (classements multi-runs), rattrapé en arrière-plan
+        # pour les runs antérieurs ou terminés pendant un arrêt de l'indexation
+        self.warehouse = RunWarehouse(self.runs_dir / "warehouse.sqlite3")
+        threading.Thread(target=self._startup_maintenance, name="runs-maintenance", daemon=True).start()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        
+        # Processus lancés par les workers de ce processus (arrêt immédiat à l'annulation)
+        self._processes: Dict[str, subprocess.Popen] = {}
+        self._process_lock = threading.Lock()
+        
+        self._stop_event = threading.Event()
+        self._worker_threads: List[threading.Thread] = []
+        if embedded_workers:
+            self.start_workers(embedded_workers)
+        
     def start_backtest(self, strategy_name: str, script_path: str, 
-                      csv_path: str = None, parameters: Dict[str, Any] = None, name: str = None) -> str:
-        """Lance un backtest en arrière-plan"""
+                      csv_path: str = None, parameters: Dict[str, Any] = None, name: str = None,
+                      timeout_seconds: float = None, max_memory_mb: int = None,
+                      walk_forward: Dict[str, Any] = None, force: bool = False) -> str:
+        """
+        Lance un backtest en arrière-plan
+        Si un run terminé a exactement les mêmes entrées (script, paramètres, données), son résultat
+        est réutilisé immédiatement dans un nouveau run (sauf force=True)
+        """
         
         run_id = str(uuid.uuid4())[:8]
         run_dir = self.runs_dir / run_id
-        run_dir.mkdir(exist_ok=True)
         
         # Configuration de l'exécution
         config = RunConfig(
@@ -77,9 +172,18 @@ class BacktestRunner:
             base_path=str(self.base_path),
             csv_path=csv_path,
             parameters=parameters if parameters is not None else {},
-            name=name
+            name=name,
+            timeout_seconds=timeout_seconds,
+            max_memory_mb=max_memory_mb,
+            walk_forward=walk_forward,
+            input_key=self.input_key(script_path, csv_path, parameters or {}, walk_forward)
         )
         
+        source_id = None if force or not config.input_key else self._find_identical_run(config.input_key)
+        run_dir.mkdir(exist_ok=True)
+        if source_id:
+            return self._reuse_run(source_id, config)
+        
         # Sauvegarde de la configuration
         config_file = run_dir / "config.json"
         with open(config_file, 'w') as f:
@@ -95,9 +199,90 @@ class BacktestRunner:
         )
         self._save_status(run_id, status)
         
-        # Lancement asynchrone
-        self._execute_async(config)
+        # Mise en file: le run sera réclamé par un seul worker (intégré ou processus séparé)
+        self.queue.enqueue(run_id, asdict(config))
+        
+        return run_id
+    
+    def input_key(self, script_path: str, csv_path: Optional[str], parameters: Dict[str, Any],
+                  walk_forward: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """
+        Clé déterministe des entrées d'un run: contenu du script, paramètres effectifs et empreinte
+        des données (chemin, taille, date de modification du CSV utilisé). None si non calculable
+        """
+        try:
+            script_digest = hashlib.sha256(Path(script_path).read_bytes()).hexdigest()
+            data_path = csv_path or self._find_latest_csv()
+            data = None
+            if data_path:
+                st = Path(data_path).stat()
+                data = [str(Path(data_path).resolve()), st.st_size, st.st_mtime_ns]
+        except OSError:
+            return None
+        
+        # Le nombre de processus du walk-forward ne change pas le résultat
+        walk_forward = {k: v for k, v in (walk_forward or {}).items() if k != 'max_workers'} or None
+        payload = {
+            'version': INPUT_KEY_VERSION,
+            'script': script_digest,
+            'parameters': parameters,
+            'walk_forward': walk_forward,
+            'data': data,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    def _find_identical_run(self, input_key: str) -> Optional[str]:
+        """Dernier run terminé (résultats présents) ayant les mêmes entrées"""
+        try:
+            candidates = self.warehouse.runs_with_inputs(input_key)
+        except Exception as e:
+            print(f"⚠️ Recherche d'un run identique impossible: {e}")
+            return None
+        for run_id in candidates:
+            status = self.get_status(run_id)
+            if status and status.status == 'completed' and (self.runs_dir / run_id / "results.json").exists():
+                return run_id
+        return None
+    
+    def _reuse_run(self, source_id: str, config: RunConfig) -> str:
+        """
+        Crée un run terminé à partir du résultat d'un run identique, sans exécution:
+        results.json et fichiers de sortie sont liés depuis le stockage par contenu (pas de copie)
+        """
+        run_id = config.run_id
+        run_dir = self.runs_dir / run_id
+        source_dir = self.runs_dir / source_id
+        config.reused_from = source_id
+        
+        with open(run_dir / "config.json", 'w') as f:
+            json.dump(asdict(config), f, indent=2)
+        
+        # Hash déjà connu par le manifest du run source: lien direct, sans relire le fichier
+        # (le cache des empreintes est perdu au redémarrage, les fichiers pèsent parfois des Go)
+        results = self.get_results(source_id) or {}
+        digests = self.artifacts.run_manifest(source_dir)
+        for filename in ["results.json", *results.get('files', [])]:
+            digest = digests.get(filename)
+            if digest and self.artifacts.blob_path(digest).exists():
+                self.artifacts.link(digest, run_dir / filename)
+            elif (source_dir / filename).exists():
+                self.artifacts.put_file(source_dir / filename, run_dir / filename)
         
+        now = datetime.now().isoformat()
+        status = RunStatus(
+            run_id=run_id,
+            status='completed',
+            progress=1.0,
+            message=f'Résultat réutilisé du run {source_id} (entrées identiques)',
+            name=config.name,
+            started_at=now,
+            completed_at=now,
+            output_files=results.get('files', []),
+            reused_from=source_id
+        )
+        self._save_status(run_id, status)
+        self._index_run(config, status, results)
+        print(f"♻️ Run {run_id}: résultat du run {source_id} réutilisé (entrées identiques)")
         return run_id
     
     def get_status(self, run_id: str) -> Optional[RunStatus]:
@@ -133,7 +318,144 @@ class BacktestRunner:
                 return json.load(f)
         except Exception as e:
             return {"error": f"Erreur lecture résultats: {e}"}
-    
+
+    def get_trades_frame(self, run_id: str):
+        """
+        Récupère les trades d'un run sous forme de DataFrame (colonnes du modèle Trade)
+        Mis en cache en mémoire tant que results.json n'est pas modifié
+        """
+        import pandas as pd
+
+        results_file = self.runs_dir / run_id / "results.json"
+        if not results_file.exists():
+            return None
+
+        mtime = results_file.stat().st_mtime
+        cached = self._trades_cache.get(run_id)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        results = self.get_results(run_id) or {}
+        df = pd.DataFrame(results.get('trades', []), columns=TRADE_COLUMNS)
+        for col in ('entry', 'exit', 'points', 'pnl_usd'):
+            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0.0)
+        df['id'] = pd.to_numeric(df['id'], errors='coerce').fillna(0).astype(int)
+
+        self._trades_cache.set(run_id, (mtime, df))
+        return df
+
+    def trades_artifact_path(self, run_id: str) -> Optional[Path]:
+        """CSV de trades écrit par la stratégie (ex: opr_trades_*.csv) listé dans results.json"""
+        results = self.get_results(run_id) or {}
+        for filename in results.get('files', []):
+            if 'trades' in filename.lower() and filename.lower().endswith('.csv'):
+                path = self.runs_dir / run_id / filename
+                if path.exists():
+                    return path
+        return None
+
+    def get_trades_artifact(self, run_id: str):
+        """
+        Trades réels (TP/SL/EOD) du CSV de la stratégie, avec toutes ses colonnes
+        (or_high/or_low, risk_usd, contracts...) absentes de results.json
+        Retourne les trades de results.json si le CSV n'est plus disponible
+        """
+        import pandas as pd
+
+        path = self.trades_artifact_path(run_id)
+        if path is None:
+            return self.get_trades_frame(run_id)
+
+        st = path.stat()
+        signature = (str(path), st.st_size, st.st_mtime_ns)
+        cached = self._artifact_cache.get(run_id)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        df = pd.read_csv(path)
+        if 'result' in df:
+            df = df[df['result'].isin(['TP', 'SL', 'EOD'])].reset_index(drop=True)
+        if 'pnl_usd' in df:
+            df['pnl_usd'] = pd.to_numeric(df['pnl_usd'], errors='coerce').fillna(0.0)
+        else:
+            return self.get_trades_frame(run_id)
+
+        self._artifact_cache.set(run_id, (signature, df))
+        return df
+
+    def get_run_analytics(self, run_id: str, name: str, compute, version=None, **params):
+        """
+        Analyse dérivée des trades d'un run (heatmap, profil horaire...), calculée une fois
+        par version de results.json et par jeu de paramètres: compute(trades_df, **params)
+        version: version d'une autre source lue par compute (ex: CSV de trades); elle n'entre pas
+        dans la clé, une nouvelle version remplace donc l'entrée de la précédente
+        """
+        results_file = self.runs_dir / run_id / "results.json"
+        if not results_file.exists():
+            return None
+
+        stamp = (results_file.stat().st_mtime, version)
+        key = (run_id, name, tuple(sorted(params.items())))
+        cached = self._analytics_cache.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        value = compute(self.get_trades_frame(run_id), **params)
+        self._analytics_cache.set(key, (stamp, value))
+        return value
+
+    def read_log(self, run_id: str, offset: int = 0, max_bytes: int = 65536) -> Optional[Dict[str, Any]]:
+        """
+        Lit une tranche de execution.log à partir d'un offset (en octets) sans lire tout le fichier
+        Retourne le contenu et le nouvel offset à passer à l'appel suivant
+        Tant que le run tourne, seules les lignes complètes sont renvoyées: next_offset reste
+        avant la ligne en cours d'écriture, qui sera relue en entier à l'appel suivant
+        """
+        log_file = self.runs_dir / run_id / "execution.log"
+        if not (self.runs_dir / run_id).exists():
+            return None
+        if not log_file.exists():
+            return {'offset': 0, 'next_offset': 0, 'size': 0, 'content': ''}
+
+        # Statut lu avant le fichier: un run terminé a fini d'écrire son log
+        status = self.get_status(run_id)
+        finished = status is None or status.status in FINISHED_STATUSES
+
+        with open(log_file, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            offset = min(max(offset, 0), size)
+            f.seek(offset)
+            chunk = f.read(max_bytes)
+
+        # Ne pas couper une ligne (ni un caractère UTF-8): la fin sans retour à la ligne
+        # n'est renvoyée que lorsque plus rien ne sera écrit
+        is_tail = offset + len(chunk) >= size
+        if not (finished and is_tail) and b'\n' in chunk:
+            chunk = chunk[:chunk.rfind(b'\n') + 1]
+        elif not finished and is_tail:
+            # Ligne partielle en cours d'écriture: attendre sa fin
+            chunk = b''
+
+        return {
+            'offset': offset,
+            'next_offset': offset + len(chunk),
+            'size': size,
+            'content': chunk.decode('utf-8', errors='replace')
+        }
+
+    def tail_log(self, run_id: str, max_bytes: int = 4096) -> str:
+        """Retourne la fin de execution.log (max_bytes derniers octets) sans lire tout le fichier"""
+        log_file = self.runs_dir / run_id / "execution.log"
+        if not log_file.exists():
+            return ''
+
+        with open(log_file, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            f.seek(max(0, size - max_bytes))
+            return f.read().decode('utf-8', errors='replace')
+
     def list_runs(self) -> List[RunStatus]:
         """Liste toutes les exécutions"""
         runs = []
@@ -146,31 +468,179 @@ class BacktestRunner:
         
         return sorted(runs, key=lambda r: r.started_at or r.run_id, reverse=True)
     
-    def delete_run(self, run_id: str) -> bool:
-        """Supprime une exécution et tous ses fichiers"""
-        import shutil
+    def cancel_run(self, run_id: str) -> bool:
+        """
+        Annule un run en attente ou en cours (le processus enfant est arrêté)
+        Retourne False si le run n'est pas actif
+        """
+        status = self.get_status(run_id)
+        if status is None or status.status not in ('pending', 'running'):
+            return False
+        
+        previous = self.queue.request_cancel(run_id)
+        if previous is None:
+            return False
+        
+        if previous == QUEUED:
+            # Jamais réclamé par un worker: annulation immédiate
+            status.status = 'cancelled'
+            status.message = 'Backtest annulé'
+            status.completed_at = datetime.now().isoformat()
+            self._save_status(run_id, status)
+            return True
+        
+        # En cours: arrêt immédiat si le processus appartient à ce worker,
+        # sinon le worker propriétaire voit la demande à sa prochaine vérification
+        with self._process_lock:
+            process = self._processes.get(run_id)
+        
+        if process is not None:
+            self._terminate_process(process)
+        return True
+    
+    def _terminate_process(self, process: subprocess.Popen, grace_seconds: float = 5.0):
+        """Arrête un processus enfant (et son groupe sous POSIX): SIGTERM puis SIGKILL"""
+        if process.poll() is not None:
+            return
+        
+        try:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGTERM)
+            else:
+                process.terminate()
+            process.wait(timeout=grace_seconds)
+        except subprocess.TimeoutExpired:
+            if os.name == 'posix':
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+    
+    def _child_preexec(self, max_memory_mb: Optional[int]):
+        """Fonction exécutée dans l'enfant avant exec (POSIX): limite de mémoire virtuelle"""
+        if resource is None or not max_memory_mb:
+            return None
         
+        limit = int(max_memory_mb) * 1024 * 1024
+        
+        def apply_limits():
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        
+        return apply_limits
+    
+    def delete_run(self, run_id: str) -> bool:
+        """
+        Supprime une exécution et tous ses fichiers (le processus éventuel est arrêté avant)
+        Un run en cours est seulement marqué: le worker qui le possède (ce processus ou un autre)
+        le supprime après l'arrêt de son processus, qui peut encore écrire dans le dossier
+        """
         run_dir = self.runs_dir / run_id
         
         if not run_dir.exists():
             return False
         
+        self.cancel_run(run_id)
+        
+        if self.queue.request_delete(run_id):
+            print(f"🗑️ Run {run_id} en cours: supprimé par son worker après l'arrêt du processus")
+            return True
+        return self._purge_run(run_id)
+    
+    def _purge_run(self, run_id: str) -> bool:
+        """
+        Retire les fichiers, le job et l'index d'un run qui ne s'exécute plus
+        Les blobs qui ne sont plus liés par aucun autre run sont supprimés
+        """
+        run_dir = self.runs_dir / run_id
         try:
-            shutil.rmtree(run_dir)
+            digests = self.artifacts.run_digests(run_dir)
+            if run_dir.exists():
+                remove_tree(run_dir)
+            freed = self.artifacts.release(digests)
+            if freed:
+                print(f"🧹 {freed / 1e6:.1f} MB libérés (blobs du run {run_id})")
+            self.queue.remove(run_id)
+            self.warehouse.remove(run_id)
+            self._trades_cache.delete(run_id)
+            self._artifact_cache.delete(run_id)
             return True
         except Exception as e:
             print(f"Erreur lors de la suppression du run {run_id}: {e}")
             return False
     
-    def _execute_async(self, config: RunConfig):
-        """Exécute le backtest de manière asynchrone"""
-        import threading
+    def start_workers(self, count: int):
+        """Démarre des threads workers dans ce processus"""
+        for i in range(count):
+            thread = threading.Thread(
+                target=self.run_worker,
+                kwargs={'worker_id': f"{self.worker_id}/{len(self._worker_threads)}"},
+                daemon=True
+            )
+            thread.start()
+            self._worker_threads.append(thread)
+    
+    def stop_workers(self):
+        """Demande l'arrêt des workers (après leur run en cours)"""
+        self._stop_event.set()
+    
+    def join_workers(self):
+        """Attend la fin des threads workers"""
+        for thread in self._worker_threads:
+            thread.join()
+    
+    def run_worker(self, worker_id: str = None, poll_interval: float = 1.0):
+        """Boucle d'un worker: réclame les runs en file et les exécute un par un"""
+        worker_id = worker_id or self.worker_id
         
-        def run_backtest():
-            self._execute_backtest(config)
+        while not self._stop_event.is_set():
+            try:
+                for run_id in self.queue.reap_stale(self.lease_seconds):
+                    # Suppression demandée pendant l'exécution: le worker disparu ne la fera pas
+                    if self.queue.is_delete_requested(run_id):
+                        self._purge_run(run_id)
+                    else:
+                        self._mark_interrupted(run_id)
+                job = self.queue.claim(worker_id)
+            except Exception as e:
+                print(f"⚠️ File d'attente indisponible: {e}")
+                job = None
+            
+            if job is None:
+                self._stop_event.wait(poll_interval)
+                continue
+            
+            run_id, payload = job
+            print(f"👷 Worker {worker_id}: exécution du run {run_id}")
+            
+            # Battement de cœur pendant toute l'exécution (y compris filtrage du CSV)
+            done = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat_loop, args=(run_id, done), daemon=True)
+            heartbeat.start()
+            try:
+                self._execute_backtest(RunConfig(**payload))
+            finally:
+                done.set()
+    
+    def _heartbeat_loop(self, run_id: str, done: threading.Event):
+        while not done.wait(self.lease_seconds / 4):
+            try:
+                self.queue.heartbeat(run_id)
+            except Exception as e:
+                print(f"⚠️ Heartbeat du run {run_id} impossible: {e}")
+    
+    def _mark_interrupted(self, run_id: str):
+        """Statut d'un run dont le worker a disparu (processus tué, machine redémarrée)"""
+        status = self.get_status(run_id)
+        if status is None or status.status not in ('pending', 'running'):
+            return
         
-        thread = threading.Thread(target=run_backtest, daemon=True)
-        thread.start()
+        status.status = 'failed'
+        status.progress = 0.0
+        status.message = 'Échec du backtest'
+        status.error = 'Worker interrompu pendant l\'exécution'
+        status.completed_at = datetime.now().isoformat()
+        self._save_status(run_id, status)
     
     def _execute_backtest(self, config: RunConfig):
         """Exécute le backtest (méthode interne)"""
@@ -200,11 +670,17 @@ class BacktestRunner:
             print(f"🔍 Paramètres reçus: {config.parameters}")
             csv_path = self._filter_csv_by_dates(original_csv_path, config.parameters, run_dir)
             
-            # TOUJOURS utiliser l'exécution directe avec copie temporaire
-            # (tools/run_backtest.py modifie l'original et cause des reloads uvicorn)
-            print(f"📝 Création d'une copie temporaire du script pour éviter les reloads...")
-            patched_script = self._patch_csv_path(script_path, csv_path, run_dir)
-            cmd = [sys.executable, str(patched_script)]
+            if config.walk_forward:
+                # Walk-forward: la stratégie est importée (simulate_day) par le script dédié
+                wf_config = run_dir / "walk_forward.json"
+                wf_config.write_text(json.dumps({**config.walk_forward, 'csv_path': csv_path}, indent=2))
+                cmd = [sys.executable, str(WALK_FORWARD_SCRIPT), str(script_path.resolve()), str(wf_config)]
+            else:
+                # TOUJOURS utiliser l'exécution directe avec copie temporaire
+                # (tools/run_backtest.py modifie l'original et cause des reloads uvicorn)
+                print(f"📝 Création d'une copie temporaire du script pour éviter les reloads...")
+                patched_script = self._patch_csv_path(script_path, csv_path, run_dir)
+                cmd = [sys.executable, str(patched_script)]
             
             # Mise à jour du statut
             status.progress = 0.3
@@ -224,19 +700,57 @@ class BacktestRunner:
                 f.write(f"=== Exécution ===\n")
                 f.flush()
                 
-                process = subprocess.Popen(
-                    cmd,
-                    stdout=f,
-                    stderr=subprocess.STDOUT,
-                    cwd=str(run_dir),  # MODIFIÉ: Exécuter dans le dossier du run
-                    text=True
-                )
+                if self.queue.is_cancel_requested(run_id):
+                    raise RunCancelled()
+                
+                with self._process_lock:
+                    process = subprocess.Popen(
+                        cmd,
+                        stdout=f,
+                        stderr=subprocess.STDOUT,
+                        cwd=str(run_dir),  # MODIFIÉ: Exécuter dans le dossier du run
+                        text=True,
+                        # Groupe de processus dédié pour pouvoir tout arrêter (POSIX)
+                        start_new_session=(os.name == 'posix'),
+                        preexec_fn=self._child_preexec(config.max_memory_mb)
+                    )
+                    self._processes[run_id] = process
                 
                 print(f"⏳ Attente de fin du processus (PID: {process.pid})...")
-                # Attendre la fin
-                return_code = process.wait()
+                # Attendre la fin en vérifiant annulation (éventuellement demandée par un autre
+                # processus) et limite de durée
+                deadline = time.monotonic() + config.timeout_seconds if config.timeout_seconds else None
+                timed_out = False
+                try:
+                    while True:
+                        try:
+                            return_code = process.wait(timeout=CANCEL_POLL_SECONDS)
+                            break
+                        except subprocess.TimeoutExpired:
+                            pass
+                        
+                        if self.queue.is_cancel_requested(run_id):
+                            self._terminate_process(process)
+                            return_code = process.wait()
+                            break
+                        
+                        if deadline is not None and time.monotonic() > deadline:
+                            timed_out = True
+                            print(f"⏱️ Délai dépassé ({config.timeout_seconds}s), arrêt du processus {process.pid}")
+                            self._terminate_process(process)
+                            return_code = process.wait()
+                            break
+                finally:
+                    with self._process_lock:
+                        self._processes.pop(run_id, None)
                 print(f"✅ Processus terminé avec code: {return_code}")
             
+            if self.queue.is_cancel_requested(run_id):
+                raise RunCancelled()
+            
+            if timed_out:
+                raise TimeoutError(f"Délai d'exécution dépassé ({config.timeout_seconds:.0f}s)")
+            
             # Mise à jour du statut
             status.progress = 0.8
             status.message = 'Collecte des résultats...'
@@ -253,11 +767,8 @@ class BacktestRunner:
                 status.completed_at = datetime.now().isoformat()
                 status.output_files = results.get('files', [])
             else:
-                # Lire les logs d'erreur
-                error_msg = "Erreur d'exécution"
-                if log_file.exists():
-                    with open(log_file, 'r') as f:
-                        error_msg = f.read()[-1000:]  # Dernières 1000 chars
+                # Lire la fin des logs d'erreur (sans charger tout le fichier)
+                error_msg = self.tail_log(run_id, max_bytes=1000) or "Erreur d'exécution"
                 
                 status.status = 'failed'
                 status.progress = 0.0
@@ -265,6 +776,12 @@ class BacktestRunner:
                 status.completed_at = datetime.now().isoformat()
                 status.error = error_msg
             
+        except RunCancelled:
+            status.status = 'cancelled'
+            status.progress = 0.0
+            status.message = 'Backtest annulé'
+            status.completed_at = datetime.now().isoformat()
+        
         except Exception as e:
             status.status = 'failed'
             status.progress = 0.0
@@ -273,7 +790,39 @@ class BacktestRunner:
             status.error = str(e)
         
         finally:
-            self._save_status(run_id, status)
+            if run_dir.exists():
+                self._save_status(run_id, status)
+                if status.status == 'completed':
+                    self._index_run(config, status, results)
+            # Job terminé en dernier: une suppression demandée avant nous revient à ce worker,
+            # une suppression demandée après est faite directement par le demandeur
+            self.queue.finish(run_id, status.status)
+            if self.queue.is_delete_requested(run_id):
+                self._purge_run(run_id)
+    
+    def _index_run(self, config: RunConfig, status: RunStatus, results: Dict[str, Any]):
+        """Indexe un run terminé dans l'entrepôt (un échec n'affecte pas le run)"""
+        try:
+            results_file = self.runs_dir / config.run_id / "results.json"
+            mtime = results_file.stat().st_mtime if results_file.exists() else None
+            self.warehouse.ingest(config.run_id, asdict(config), asdict(status), results, mtime)
+        except Exception as e:
+            print(f"⚠️ Indexation du run {config.run_id} impossible: {e}")
+    
+    def _startup_maintenance(self):
+        """Rattrapage de l'entrepôt et collecte des blobs orphelins (thread de démarrage)"""
+        try:
+            count = self.warehouse.sync(self.runs_dir)
+            if count:
+                print(f"🗄️ Entrepôt des runs: {count} run(s) indexé(s)")
+        except Exception as e:
+            print(f"⚠️ Synchronisation de l'entrepôt des runs impossible: {e}")
+        try:
+            freed = self.artifacts.gc()
+            if freed:
+                print(f"🧹 Blobs orphelins supprimés: {freed / 1e6:.1f} MB")
+        except Exception as e:
+            print(f"⚠️ Collecte des blobs impossible: {e}")
     
     def _find_latest_csv(self) -> Optional[str]:
         """Trouve le fichier CSV le plus récent"""
@@ -357,11 +906,11 @@ class BacktestRunner:
                     filtered_lines.append(line)
                 
                 new_content = '\n'.join(filtered_lines)
-                temp_script.write_text(new_content, encoding='utf-8')
+                self.artifacts.put_bytes(new_content.encode('utf-8'), temp_script)
             else:
                 # CSV_PATH non trouvé, copier tel quel (le script utilise peut-être un autre mécanisme)
                 print(f"⚠️ CSV_PATH non trouvé dans {script_path.name}, copie du script original")
-                temp_script.write_text(content, encoding='utf-8')
+                self.artifacts.put_bytes(content.encode('utf-8'), temp_script)
             
             return temp_script
         
@@ -415,12 +964,14 @@ class BacktestRunner:
                         if file_time > recent_time:
                             # Si le fichier est déjà dans run_dir, pas besoin de copier
                             if csv_file.parent == run_dir:
+                                # Remplacé par un lien vers son blob (dédupliqué entre runs)
+                                self.artifacts.adopt(csv_file)
                                 output_files.append(csv_file.name)
                                 debug_info.append(f"    -> Déjà dans run_dir")
                             else:
-                                # Copier vers le dossier de run
+                                # Lier dans le dossier de run (pas de copie si le contenu est déjà stocké)
                                 dest_file = run_dir / csv_file.name
-                                shutil.copy2(csv_file, dest_file)
+                                self.artifacts.put_file(csv_file, dest_file)
                                 output_files.append(csv_file.name)
                                 debug_info.append(f"    -> Copié")
                 else:
@@ -444,11 +995,12 @@ class BacktestRunner:
                     
                     # Si le fichier est déjà dans run_dir, pas besoin de copier
                     if latest_file.parent == run_dir:
+                        self.artifacts.adopt(latest_file)
                         output_files.append(latest_file.name)
                         debug_info.append(f"Fichier le plus récent (déjà dans run_dir): {latest_file.name}")
                     else:
                         dest_file = run_dir / latest_file.name
-                        shutil.copy2(latest_file, dest_file)
+                        self.artifacts.put_file(latest_file, dest_file)
                         output_files.append(latest_file.name)
                         debug_info.append(f"Fichier le plus récent (copié): {latest_file.name}")
                     
@@ -478,6 +1030,11 @@ class BacktestRunner:
                 }
                 results['trades'] = []
             
+            # Résumé du walk-forward (fenêtres, paramètres retenus, équité OOS)
+            wf_results = run_dir / WALK_FORWARD_RESULTS_JSON
+            if wf_results.exists():
+                results['walk_forward'] = json.loads(wf_results.read_text(encoding='utf-8'))
+            
         except Exception as e:
             results['error'] = str(e)
             results['debug_info'].append(f"Erreur: {e}")
@@ -485,8 +1042,9 @@ class BacktestRunner:
         return results
     
     def _analyze_trades_file(self, trades_file: Path) -> Dict[str, Any]:
-        """Analyse un fichier de trades pour extraire les métriques"""
+        """Analyse un fichier de trades pour extraire les métriques (calcul vectorisé)"""
         try:
+            import numpy as np
             import pandas as pd
             
             df = pd.read_csv(trades_file)
@@ -495,22 +1053,30 @@ class BacktestRunner:
                 return {'trades_count': 0, 'metrics': {}, 'trades': []}
             
             # Filtrer les trades réels (avec PnL)
-            real_trades = df[df['result'].isin(['TP', 'SL', 'EOD'])].copy()
+            real_trades = df[df['result'].isin(['TP', 'SL', 'EOD'])].reset_index(drop=True)
             
             if real_trades.empty:
                 return {'trades_count': 0, 'metrics': {}, 'trades': []}
             
-            # Calcul des métriques
-            wins = real_trades[real_trades['result'] == 'TP']
-            losses = real_trades[real_trades['result'] != 'TP']
+            def numeric(column):
+                """Colonne numérique (0.0 si absente, NaN/inf -> 0.0)"""
+                if column not in real_trades:
+                    return np.zeros(len(real_trades))
+                values = pd.to_numeric(real_trades[column], errors='coerce').to_numpy(dtype=float)
+                return np.where(np.isfinite(values), values, 0.0)
             
-            net_pnl = float(real_trades['pnl_usd'].sum())
-            win_rate = len(wins) / len(real_trades) if len(real_trades) > 0 else 0.0
+            # Tableaux du trade set, sans copies filtrées du DataFrame
+            pnl = numeric('pnl_usd')
+            is_win = (real_trades['result'] == 'TP').to_numpy()
+            n = len(pnl)
+            n_wins = int(is_win.sum())
+            n_losses = n - n_wins
             
-            gross_profit = float(wins['pnl_usd'].sum()) if len(wins) > 0 else 0.0
-            gross_loss = float(-losses['pnl_usd'].sum()) if len(losses) > 0 else 0.0
+            net_pnl = float(pnl.sum())
+            gross_profit = float(pnl[is_win].sum())
+            gross_loss = float(-pnl[~is_win].sum())
             
-            # Gérer le profit factor pour éviter les valeurs infinies
+            # Profit factor borné (pas d'infini en JSON)
             if gross_loss > 0:
                 profit_factor = gross_profit / gross_loss
             elif gross_profit > 0:
@@ -518,110 +1084,69 @@ class BacktestRunner:
             else:
                 profit_factor = 0.0
             
-            # Drawdown
-            equity_curve = real_trades['pnl_usd'].cumsum()
-            running_max = equity_curve.cummax()
+            # Drawdown par trade
+            equity_curve = np.cumsum(pnl)
+            running_max = np.maximum.accumulate(equity_curve)
             drawdown = equity_curve - running_max
-            max_drawdown = float(drawdown.min())
-            
-            # Sécuriser toutes les valeurs pour éviter NaN/inf
-            avg_win = float(wins['pnl_usd'].mean()) if len(wins) > 0 else 0.0
-            avg_loss = float(losses['pnl_usd'].mean()) if len(losses) > 0 else 0.0
-            expectancy = net_pnl / len(real_trades) if len(real_trades) > 0 else 0.0
-            
-            # Remplacer NaN par 0
-            import math
-            if math.isnan(avg_win): avg_win = 0.0
-            if math.isnan(avg_loss): avg_loss = 0.0
-            if math.isnan(expectancy): expectancy = 0.0
-            if math.isnan(max_drawdown): max_drawdown = 0.0
-            if math.isinf(profit_factor): profit_factor = 999.99
             
             metrics = {
-                'total_trades': len(real_trades),
-                'winning_trades': len(wins),
-                'losing_trades': len(losses),
-                'win_rate': float(win_rate),
+                'total_trades': n,
+                'winning_trades': n_wins,
+                'losing_trades': n_losses,
+                'win_rate': n_wins / n,
                 'net_pnl': net_pnl,
                 'gross_profit': gross_profit,
                 'gross_loss': gross_loss,
                 'profit_factor': float(profit_factor),
-                'max_drawdown': max_drawdown,
-                'avg_win': avg_win,
-                'avg_loss': avg_loss,
-                'expectancy': expectancy
+                'max_drawdown': float(drawdown.min()),
+                'avg_win': gross_profit / n_wins if n_wins else 0.0,
+                'avg_loss': -gross_loss / n_losses if n_losses else 0.0,
+                'expectancy': net_pnl / n
             }
             
-            # Préparer la liste des trades pour le frontend
-            trades_list = []
+            # Liste des trades pour le frontend (construction colonnaire)
+            def text(column):
+                """Colonne texte et masque des valeurs renseignées"""
+                if column not in real_trades:
+                    return pd.Series([''] * n), np.zeros(n, dtype=bool)
+                values = real_trades[column].astype(str)
+                valid = real_trades[column].notna() & ~values.isin(['N/A', ''])
+                return values, valid
             
-            # Debug: voir les colonnes disponibles
-            print(f"🔍 Colonnes du DataFrame: {list(real_trades.columns)}")
-            if len(real_trades) > 0:
-                print(f"🔍 Premier trade (colonnes): {dict(real_trades.iloc[0])}")
+            date_fallback = real_trades['date'].astype(str) if 'date' in real_trades else pd.Series(['N/A'] * n)
+            entry_str, entry_ok = text('entry_time')
+            exit_str, exit_ok = text('exit_time')
+            entry_time = entry_str.where(entry_ok, date_fallback)
+            exit_time = exit_str.where(exit_ok, date_fallback)
+            date_str = entry_str.str.split(' ').str[0].where(entry_ok, date_fallback)
+            direction = (real_trades['direction'].astype(str).str.upper()
+                         if 'direction' in real_trades else pd.Series(['UNKNOWN'] * n))
+            
+            trades_list = pd.DataFrame({
+                'id': np.arange(1, n + 1),
+                'date': date_str,
+                'entry_time': entry_time,
+                'exit_time': exit_time,
+                'direction': direction,
+                'entry': numeric('entry'),
+                'exit': numeric('exit'),
+                'points': numeric('points'),
+                'pnl_usd': pnl,
+                'result': real_trades['result'].astype(str)
+            }).to_dict('records')
+            
+            # Sharpe/Sortino journaliers, Calmar, MAR, Ulcer, durées de drawdown, séries, R-multiples
+            # (un échec ne doit pas faire perdre les métriques de base ni la liste des trades)
+            try:
+                risk = trades_risk_metrics(real_trades)
+            except Exception as e:
+                print(f"⚠️ Métriques de risque non calculées: {e}")
+                risk = None
             
-            for idx, (_, trade) in enumerate(real_trades.iterrows()):
-                # Mapping des colonnes selon le CSV réel
-                entry_time = trade.get('entry_time', trade.get('date', 'N/A'))
-                exit_time = trade.get('exit_time', trade.get('date', 'N/A'))
-                
-                # Debug pour le premier trade
-                if idx == 0:
-                    print(f"🔍 Premier trade - entry_time: {entry_time}")
-                    print(f"🔍 Premier trade - exit_time: {exit_time}")
-                    print(f"🔍 Premier trade - date: {trade.get('date', 'N/A')}")
-                
-                # Formater la date pour l'affichage (garder seulement la date)
-                if pd.notna(entry_time) and str(entry_time) != 'N/A' and str(entry_time) != '':
-                    try:
-                        date_str = str(entry_time).split(' ')[0]  # Garder seulement la date
-                        entry_time_str = str(entry_time)  # Garder l'heure complète
-                    except:
-                        date_str = str(entry_time)
-                        entry_time_str = str(entry_time)
-                else:
-                    date_str = str(trade.get('date', 'N/A'))
-                    entry_time_str = str(trade.get('date', 'N/A'))
-                
-                # Formater exit_time
-                if pd.notna(exit_time) and str(exit_time) != 'N/A' and str(exit_time) != '':
-                    exit_time_str = str(exit_time)
-                else:
-                    exit_time_str = str(trade.get('date', 'N/A'))
-                
-                # Récupérer les valeurs directement
-                def safe_float(val, default=0.0):
-                    try:
-                        if pd.isna(val) or val == '' or val is None:
-                            return default
-                        result = float(val)
-                        if math.isnan(result) or math.isinf(result):
-                            return default
-                        return result
-                    except:
-                        return default
-                
-                entry_val = safe_float(trade.get('entry', 0))
-                exit_val = safe_float(trade.get('exit', 0))
-                points_val = safe_float(trade.get('points', 0))
-                pnl_val = safe_float(trade.get('pnl_usd', 0))
-                
-                trades_list.append({
-                    'id': idx + 1,
-                    'date': date_str,
-                    'entry_time': entry_time_str,
-                    'exit_time': exit_time_str,
-                    'direction': str(trade.get('direction', 'UNKNOWN')).upper(),
-                    'entry': entry_val,
-                    'exit': exit_val,
-                    'points': points_val,
-                    'pnl_usd': pnl_val,
-                    'result': trade.get('result', 'UNKNOWN')
-                })
-
             return {
-                'trades_count': len(real_trades),
+                'trades_count': n,
                 'metrics': metrics,
+                'risk_metrics': risk,
                 'trades': trades_list,
                 'equity_curve': equity_curve.tolist(),
                 'drawdown_curve': drawdown.tolist()
@@ -643,11 +1168,11 @@ class BacktestRunner:
         results_file = self.runs_dir / run_id / "results.json"
         
         try:
-            # Nettoyer les résultats pour la sérialisation JSON
-            clean_results = self._clean_for_json(results)
+            # Même sérialisation que les réponses de l'API: numpy, datetime, NaN/inf et NaT -> null
+            content = json_dumps(results, indent=True)
             
-            with open(results_file, 'w') as f:
-                json.dump(clean_results, f, indent=2)
+            with open(results_file, 'wb') as f:
+                f.write(content)
                 
             # Vérifier que le fichier a été créé
             if results_file.exists():
@@ -683,6 +1208,21 @@ class BacktestRunner:
             print(f"🔄 Aucun filtrage de dates - utilisation du CSV complet")
             return csv_path
         
+        filtered_csv_path = run_dir / "filtered_data.csv"
+        
+        # Même source (taille, date de modification) et même période: filtrage déjà stocké
+        try:
+            st = Path(csv_path).stat()
+            filter_key = f"filtered_data:{Path(csv_path).resolve()}:{st.st_size}:{st.st_mtime_ns}:{start_date}:{end_date}"
+            digest = self.artifacts.lookup(filter_key)
+            if digest:
+                self.artifacts.link(digest, filtered_csv_path)
+                print(f"♻️ CSV filtré réutilisé ({digest[:12]}) pour {start_date} à {end_date}")
+                return str(filtered_csv_path)
+        except OSError as e:
+            filter_key = None
+            print(f"⚠️ CSV filtré en cache indisponible: {e}")
+        
         try:
             print(f"🔄 Filtrage CSV par dates: {start_date} à {end_date}")
             
@@ -737,9 +1277,11 @@ class BacktestRunner:
                 print(f"❌ Aucune donnée dans la période demandée! Utilisation du CSV complet.")
                 return csv_path
             
-            # Sauvegarder le CSV filtré
-            filtered_csv_path = run_dir / "filtered_data.csv"
+            # Sauvegarder le CSV filtré (stocké comme blob, réutilisable par les runs suivants)
             filtered_df.to_csv(filtered_csv_path, index=False)
+            digest = self.artifacts.adopt(filtered_csv_path)
+            if filter_key:
+                self.artifacts.remember(filter_key, digest)
             
             return str(filtered_csv_path)
             
@@ -748,23 +1290,7 @@ class BacktestRunner:
             print(f"🔄 Utilisation du CSV original")
             return csv_path
 
-    def _clean_for_json(self, obj):
-        """Nettoie un objet pour la sérialisation JSON"""
-        if isinstance(obj, dict):
-            return {k: self._clean_for_json(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._clean_for_json(item) for item in obj]
-        elif isinstance(obj, (int, float, str, bool, type(None))):
-            return obj
-        elif hasattr(obj, 'isoformat'):  # datetime
-            return obj.isoformat()
-        elif isinstance(obj, Path):
-            return str(obj)
-        else:
-            # Convertir en string pour les objets non-sérialisables
-            return str(obj)
-
 # Interface simple pour Streamlit
-def create_runner(base_path: str) -> BacktestRunner:
+def create_runner(base_path: str, embedded_workers: int = 1, lease_seconds: float = 120) -> BacktestRunner:
     """Crée un runner pour le chemin de base donné"""
-    return BacktestRunner(base_path)
+    return BacktestRunner(base_path, embedded_workers=embedded_workers, lease_seconds=lease_seconds)
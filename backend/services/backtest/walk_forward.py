@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Walk-forward d'une stratégie sur une grille de paramètres.
+Fenêtres glissantes: la meilleure combinaison sur la période in-sample (selon un objectif)
+est appliquée à la période out-of-sample suivante, les trades OOS sont mis bout à bout.
+
+Les journées sont simulées indépendamment avec le `simulate_day` de la stratégie:
+chaque couple (journée, paramètres) est simulé une seule fois puis partagé entre
+toutes les fenêtres qui le contiennent. Les simulations sont réparties sur les cœurs.
+
+Usage (lancé par le runner dans le dossier du run):
+    python walk_forward.py <script_stratégie> <walk_forward.json>
+"""
+
+import importlib.util
+import inspect
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, is_dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Backend ajouté au path (config importé par les stratégies)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+OBJECTIVES = ("net_pnl", "sharpe", "profit_factor", "expectancy", "pnl_drawdown")
+MAX_COMBINATIONS = 500
+DAYS_PER_TASK = 20
+
+OUTPUT_TRADES_CSV = "opr_trades_walkforward.csv"
+OUTPUT_RESULTS_JSON = "walk_forward_results.json"
+
+# État d'un processus de simulation (stratégie chargée et barres par journée)
+_strategy = None
+_day_frames: Dict[Any, pd.DataFrame] = {}
+
+
+def grid_combinations(param_grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """Produit cartésien de la grille, dans l'ordre des paramètres"""
+    names = list(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+
+
+def validate_config(config: Dict[str, Any]):
+    """Vérifie une configuration de walk-forward, lève ValueError si invalide"""
+    grid = config.get("param_grid") or {}
+    if not grid:
+        raise ValueError("param_grid doit contenir au moins un paramètre")
+    for name, values in grid.items():
+        if not name.isupper() or not name.replace("_", "").isalnum():
+            raise ValueError(f"Paramètre invalide: {name} (variable de configuration en majuscules attendue)")
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"Aucune valeur pour le paramètre {name}")
+    combos = int(np.prod([len(v) for v in grid.values()]))
+    if combos > MAX_COMBINATIONS:
+        raise ValueError(f"Grille trop grande: {combos} combinaisons (max {MAX_COMBINATIONS})")
+    if config.get("objective", "net_pnl") not in OBJECTIVES:
+        raise ValueError(f"Objectif inconnu: {config.get('objective')} (attendu: {', '.join(OBJECTIVES)})")
+    for key in ("in_sample_days", "out_of_sample_days"):
+        if int(config.get(key) or 0) <= 0:
+            raise ValueError(f"{key} doit être positif")
+    if config.get("step_days") is not None and int(config["step_days"]) < int(config["out_of_sample_days"]):
+        # Périodes OOS sans chevauchement, sinon l'équité mise bout à bout compterait des journées deux fois
+        raise ValueError("step_days doit être supérieur ou égal à out_of_sample_days")
+
+
+def build_windows(n_days: int, in_sample: int, out_of_sample: int, step: int) -> List[Tuple[int, int, int]]:
+    """Fenêtres (début IS, début OOS, fin OOS exclue) en indices de journées"""
+    windows = []
+    start = 0
+    while start + in_sample < n_days:
+        oos_start = start + in_sample
+        windows.append((start, oos_start, min(oos_start + out_of_sample, n_days)))
+        start += step
+    return windows
+
+
+# ==========================
+# ===== Simulation =========
+# ==========================
+
+def load_strategy(script_path: str):
+    """Charge le script de stratégie comme module (sans exécuter son main)"""
+    spec = importlib.util.spec_from_file_location("walk_forward_strategy", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    for name in ("load_data", "active_symbol_for_day", "simulate_day"):
+        if not hasattr(module, name):
+            raise ValueError(f"La stratégie ne définit pas {name}(): walk-forward impossible")
+    return module
+
+
+def load_day_frames(module, csv_path: str) -> Dict[Any, pd.DataFrame]:
+    """Barres de la stratégie regroupées par journée UTC (prepare_bars appliqué si défini)"""
+    df = module.load_data(csv_path, getattr(module, "SYMBOL_FILTER_REGEX", None))
+    if hasattr(module, "prepare_bars"):
+        df = module.prepare_bars(df)
+    df["utc_date"] = df["timestamp"].dt.date
+    return {d: day_df for d, day_df in df.groupby("utc_date", sort=True)}
+
+
+def _init_worker(script_path: str, csv_path: str):
+    global _strategy, _day_frames
+    # Avec fork, l'état du processus parent est déjà hérité
+    if _strategy is None:
+        _strategy = load_strategy(script_path)
+        _day_frames = load_day_frames(_strategy, csv_path)
+
+
+def _simulate_day(module, day_df: pd.DataFrame, pick: str, d) -> List[Any]:
+    """Appelle simulate_day selon sa signature (assume / the_date optionnels)"""
+    params = inspect.signature(module.simulate_day).parameters
+    kwargs = {}
+    if "assume" in params:
+        kwargs["assume"] = getattr(module, "INTRABAR_SEQUENCE", "high_first")
+    if "the_date" in params:
+        kwargs["the_date"] = d
+    return module.simulate_day(day_df, pick, **kwargs)
+
+
+def _trade_dict(trade) -> Dict[str, Any]:
+    return asdict(trade) if is_dataclass(trade) else dict(trade)
+
+
+def simulate_days(params: Dict[str, Any], days: List[Any]) -> List[Tuple[Any, List[Dict[str, Any]]]]:
+    """Simule des journées avec un jeu de paramètres (dans un processus de simulation)"""
+    for name, value in params.items():
+        if not hasattr(_strategy, name):
+            raise ValueError(f"Paramètre {name} absent de la stratégie")
+        setattr(_strategy, name, value)
+
+    out = []
+    for d in days:
+        day_df = _day_frames[d]
+        pick = _strategy.active_symbol_for_day(d)
+        if not (day_df["symbol"] == pick).any():
+            out.append((d, []))
+            continue
+        out.append((d, [_trade_dict(t) for t in _simulate_day(_strategy, day_df, pick, d)]))
+    return out
+
+
+class DaySimulationCache:
+    """
+    Résultats par (combinaison, journée), calculés une seule fois
+    Les fenêtres qui se chevauchent lisent les mêmes entrées
+    """
+
+    def __init__(self, combos: List[Dict[str, Any]], days: List[Any], executor: ProcessPoolExecutor):
+        self.combos = combos
+        self.days = days
+        self.day_index = {d: i for i, d in enumerate(days)}
+        self.executor = executor
+        self.trades: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        # Agrégats journaliers (combinaisons x journées): PnL, gains, pertes, trades exécutés
+        shape = (len(combos), len(days))
+        self.pnl = np.zeros(shape)
+        self.gross_profit = np.zeros(shape)
+        self.gross_loss = np.zeros(shape)
+        self.count = np.zeros(shape, dtype=int)
+        self.computed = 0
+        self.reused = 0
+
+    def ensure(self, pairs: List[Tuple[int, int]]):
+        """Simule en parallèle les couples (combinaison, journée) absents du cache"""
+        missing: Dict[int, set] = {}
+        for combo, day in pairs:
+            if (combo, day) in self.trades or day in missing.get(combo, ()):
+                self.reused += 1
+            else:
+                missing.setdefault(combo, set()).add(day)
+        if not missing:
+            return
+
+        futures = {}
+        for combo, day_ids in missing.items():
+            day_ids = sorted(day_ids)
+            for i in range(0, len(day_ids), DAYS_PER_TASK):
+                chunk = [self.days[j] for j in day_ids[i:i + DAYS_PER_TASK]]
+                futures[self.executor.submit(simulate_days, self.combos[combo], chunk)] = combo
+
+        total = sum(len(v) for v in missing.values())
+        done = 0
+        for future in as_completed(futures):
+            combo = futures[future]
+            for d, trades in future.result():
+                self._store(combo, self.day_index[d], trades)
+                done += 1
+            print(f"   {done}/{total} simulations", flush=True)
+        self.computed += total
+
+    def _store(self, combo: int, day: int, trades: List[Dict[str, Any]]):
+        self.trades[(combo, day)] = trades
+        pnl = np.array([t.get("pnl_usd") or 0.0 for t in trades if _executed(t)], dtype=float)
+        self.pnl[combo, day] = pnl.sum()
+        self.gross_profit[combo, day] = pnl[pnl > 0].sum()
+        self.gross_loss[combo, day] = -pnl[pnl < 0].sum()
+        self.count[combo, day] = len(pnl)
+
+
+def _executed(trade: Dict[str, Any]) -> bool:
+    """Trade réellement exécuté (les lignes no_data / no_fill / skip n'ont pas d'entrée)"""
+    return trade.get("entry_time") is not None and not pd.isna(trade.get("entry_time"))
+
+
+# ==========================
+# ===== Sélection ==========
+# ==========================
+
+def score_combinations(cache: DaySimulationCache, start: int, end: int, objective: str,
+                       min_trades: int = 1) -> np.ndarray:
+    """Score de chaque combinaison sur les journées [start, end) (vectorisé sur la grille)"""
+    pnl = cache.pnl[:, start:end]
+    trades = cache.count[:, start:end].sum(axis=1)
+    net = pnl.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if objective == "net_pnl":
+            score = net
+        elif objective == "sharpe":
+            std = pnl.std(axis=1, ddof=1) if pnl.shape[1] > 1 else np.zeros(len(net))
+            score = np.where(std > 0, pnl.mean(axis=1) / std * np.sqrt(252), np.nan)
+        elif objective == "profit_factor":
+            gp = cache.gross_profit[:, start:end].sum(axis=1)
+            gl = cache.gross_loss[:, start:end].sum(axis=1)
+            score = np.where(gl > 0, gp / gl, np.where(gp > 0, np.inf, np.nan))
+        elif objective == "expectancy":
+            score = np.where(trades > 0, net / trades, np.nan)
+        else:
+            equity = np.cumsum(pnl, axis=1)
+            peak = np.maximum(np.maximum.accumulate(equity, axis=1), 0.0)
+            max_dd = (peak - equity).max(axis=1)
+            score = np.where(max_dd > 0, net / max_dd, np.where(net > 0, np.inf, np.nan))
+
+    score = np.where(trades >= min_trades, score, np.nan)
+    return np.nan_to_num(score, nan=-np.inf, posinf=np.finfo(float).max)
+
+
+def walk_forward(script_path: str, csv_path: str, config: Dict[str, Any],
+                 max_workers: Optional[int] = None) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Exécute le walk-forward et retourne (trades OOS bout à bout, résumé par fenêtre)
+    """
+    global _strategy, _day_frames
+    validate_config(config)
+    objective = config.get("objective", "net_pnl")
+    in_sample = int(config["in_sample_days"])
+    out_of_sample = int(config["out_of_sample_days"])
+    step = int(config.get("step_days") or out_of_sample)
+    min_trades = int(config.get("min_trades") or 1)
+    combos = grid_combinations(config["param_grid"])
+
+    print(f"📥 Chargement de la stratégie et des données...", flush=True)
+    _strategy = load_strategy(script_path)
+    for name in config["param_grid"]:
+        if not hasattr(_strategy, name):
+            raise ValueError(f"Paramètre {name} absent de la stratégie")
+    _day_frames = load_day_frames(_strategy, csv_path)
+    days = list(_day_frames)
+
+    windows = build_windows(len(days), in_sample, out_of_sample, step)
+    if not windows:
+        raise ValueError(
+            f"Pas assez de journées ({len(days)}) pour une fenêtre de {in_sample} + {out_of_sample} jours"
+        )
+    print(f"🔁 {len(windows)} fenêtres, {len(combos)} combinaisons, {len(days)} journées", flush=True)
+
+    # fork: les processus héritent des barres déjà chargées (sinon rechargées à l'initialisation)
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    workers = max_workers or os.cpu_count() or 1
+    summary_windows = []
+    oos_trades = []
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(script_path, csv_path)) as executor:
+        cache = DaySimulationCache(combos, days, executor)
+
+        # 1) Toutes les combinaisons sur chaque période in-sample: les journées communes
+        #    à plusieurs fenêtres ne sont simulées qu'une fois
+        print(f"🧮 In-sample: {len(windows)} fenêtres x {len(combos)} combinaisons", flush=True)
+        cache.ensure([
+            (c, d) for start, oos_start, _ in windows
+            for c in range(len(combos)) for d in range(start, oos_start)
+        ])
+
+        # 2) Meilleure combinaison par fenêtre
+        best = []
+        for start, oos_start, _ in windows:
+            scores = score_combinations(cache, start, oos_start, objective, min_trades)
+            best.append(int(np.argmax(scores)) if np.isfinite(scores).any() else None)
+
+        # 3) Out-of-sample: seules les combinaisons retenues, en réutilisant le cache
+        cache.ensure([
+            (combo, d) for combo, (_, oos_start, oos_end) in zip(best, windows)
+            if combo is not None for d in range(oos_start, oos_end)
+        ])
+
+    for index, ((start, oos_start, oos_end), combo) in enumerate(zip(windows, best)):
+        window = {
+            "index": index,
+            "in_sample_start": str(days[start]),
+            "in_sample_end": str(days[oos_start - 1]),
+            "out_of_sample_start": str(days[oos_start]),
+            "out_of_sample_end": str(days[oos_end - 1]),
+            "params": combos[combo] if combo is not None else None,
+            "in_sample_score": None,
+            "in_sample_net_pnl": None,
+            "out_of_sample_net_pnl": 0.0,
+            "out_of_sample_trades": 0,
+        }
+        if combo is not None:
+            window["in_sample_score"] = float(score_combinations(cache, start, oos_start, objective, min_trades)[combo])
+            window["in_sample_net_pnl"] = float(cache.pnl[combo, start:oos_start].sum())
+            window["out_of_sample_net_pnl"] = float(cache.pnl[combo, oos_start:oos_end].sum())
+            window["out_of_sample_trades"] = int(cache.count[combo, oos_start:oos_end].sum())
+            params_label = json.dumps(combos[combo])
+            for d in range(oos_start, oos_end):
+                for trade in cache.trades[(combo, d)]:
+                    oos_trades.append({**trade, "wf_window": index, "wf_params": params_label})
+        summary_windows.append(window)
+        print(f"   Fenêtre {index + 1}/{len(windows)}: {window['params']} -> OOS {window['out_of_sample_net_pnl']:,.2f}", flush=True)
+
+    # Équité OOS journalière mise bout à bout (fenêtres dans l'ordre)
+    oos_days, oos_pnl = [], []
+    for window, combo, (_, oos_start, oos_end) in zip(summary_windows, best, windows):
+        if combo is None:
+            continue
+        oos_days.extend(str(d) for d in days[oos_start:oos_end])
+        oos_pnl.extend(cache.pnl[combo, oos_start:oos_end].tolist())
+    equity = np.cumsum(oos_pnl) if oos_pnl else np.zeros(0)
+    drawdown = equity - np.maximum(np.maximum.accumulate(equity), 0.0) if len(equity) else equity
+
+    summary = {
+        "objective": objective,
+        "param_grid": config["param_grid"],
+        "combinations": len(combos),
+        "in_sample_days": in_sample,
+        "out_of_sample_days": out_of_sample,
+        "step_days": step,
+        "windows": summary_windows,
+        "oos_equity": {"dates": oos_days, "equity": equity.tolist(), "drawdown": drawdown.tolist()},
+        "oos_net_pnl": float(equity[-1]) if len(equity) else 0.0,
+        "oos_max_drawdown": float(drawdown.min()) if len(drawdown) else 0.0,
+        "simulations": {"computed": cache.computed, "reused": cache.reused},
+    }
+
+    trades_df = pd.DataFrame(oos_trades)
+    if not trades_df.empty:
+        trades_df = trades_df.sort_values(["date", "entry_time"], na_position="last").reset_index(drop=True)
+    return trades_df, summary
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(2)
+    script_path, config_path = sys.argv[1], sys.argv[2]
+    config = json.loads(Path(config_path).read_text(encoding="utf-8"))
+
+    t0 = time.perf_counter()
+    trades, summary = walk_forward(script_path, config["csv_path"], config, config.get("max_workers"))
+    trades.to_csv(OUTPUT_TRADES_CSV, index=False)
+    Path(OUTPUT_RESULTS_JSON).write_text(json.dumps(summary, indent=2, default=str), encoding="utf-8")
+
+    print(f"Saved trades to: {OUTPUT_TRADES_CSV}")
+    print(f"✅ Walk-forward terminé en {time.perf_counter() - t0:.1f}s "
+          f"(simulations: {summary['simulations']['computed']} calculées, {summary['simulations']['reused']} réutilisées)")
+    print(f"   PnL OOS: {summary['oos_net_pnl']:,.2f} | Max DD OOS: {summary['oos_max_drawdown']:,.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Modèle de concurrence de l'API
+- Handlers `def`: exécutés par FastAPI dans son threadpool (I/O fichiers, petits calculs)
+- Handlers `async def`: ne font jamais d'I/O ni de pandas directement; le travail lourd
+  (analytics pandas/NumPy) passe par un executor dédié et borné via `run_analytics`
+Ainsi une rafale de requêtes analytiques ne peut pas saturer la boucle d'événements
+ni le threadpool utilisé par les requêtes légères (statut, logs)
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+from services.json_response import FastJSONResponse
+
+# Nombre de calculs analytiques simultanés (les autres attendent leur tour)
+ANALYTICS_MAX_WORKERS = int(os.getenv("ANALYTICS_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_analytics_executor = ThreadPoolExecutor(
+    max_workers=ANALYTICS_MAX_WORKERS,
+    thread_name_prefix="analytics"
+)
+
+
+async def run_analytics(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Exécute un calcul CPU (pandas/NumPy) dans l'executor analytique sans bloquer la boucle"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_analytics_executor, partial(func, *args, **kwargs))
+
+
+def _render(func: Callable[..., Any], *args, **kwargs) -> Response:
+    result = func(*args, **kwargs)
+    if isinstance(result, Response):
+        return result
+    if isinstance(result, BaseModel):
+        result = result.model_dump()
+    return FastJSONResponse(content=result)
+
+
+async def run_analytics_response(func: Callable[..., Any], *args, **kwargs) -> Response:
+    """
+    Comme run_analytics, mais la sérialisation JSON est aussi faite dans l'executor
+    (une grosse réponse retournée en dict serait sinon encodée par FastAPI dans la boucle)
+    """
+    return await run_analytics(_render, func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """Arrête l'executor analytique (à l'arrêt de l'application)"""
+    _analytics_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,208 @@
+"""
+Stockage adressé par contenu des fichiers des runs (scripts, données filtrées, CSV de sortie)
+Chaque contenu est stocké une seule fois (blob nommé par son SHA-256) et les dossiers des runs
+n'en contiennent que des liens physiques: les lecteurs existants ne voient aucune différence,
+et le nombre de liens d'un blob sert de compteur de références (1 = plus référencé, à collecter)
+Les blobs sont en lecture seule: un script qui tenterait de réécrire un fichier partagé échoue
+au lieu de modifier les autres runs
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_NAME = "artifacts.json"
+GC_GRACE_SECONDS = 3600
+
+
+def _tmp_name(path: Path) -> Path:
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+
+def _link_or_copy(source: Path, dest: Path):
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+def _make_writable(func, path, _):
+    """onerror de shutil.rmtree: les blobs liés sont en lecture seule (bloquant sous Windows)"""
+    os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+    func(path)
+
+
+def remove_tree(path: Path):
+    """Supprime un dossier de run contenant des liens vers des blobs en lecture seule"""
+    shutil.rmtree(path, onerror=_make_writable)
+
+
+class ArtifactStore:
+    """Blobs SHA-256 sous root/<2 premiers caractères>/<hash>, liés dans les dossiers des runs"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Empreintes des fichiers sources déjà hachés: (chemin, taille, mtime_ns) -> hash
+        self._digests: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def blob_path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def _digest_file(self, path: Path) -> str:
+        st = path.stat()
+        key = (str(path.resolve()), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            cached = self._digests.get(key)
+        if cached:
+            return cached
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+        return digest
+
+    def _store(self, digest: str, write) -> Path:
+        """Crée le blob s'il n'existe pas (écriture dans un fichier temporaire puis renommage atomique)"""
+        blob = self.blob_path(digest)
+        if blob.exists():
+            return blob
+        blob.parent.mkdir(exist_ok=True)
+        tmp = _tmp_name(blob)
+        try:
+            write(tmp)
+            os.chmod(tmp, stat.S_IREAD)
+            os.replace(tmp, blob)
+        finally:
+            if tmp.exists():
+                os.chmod(tmp, stat.S_IWRITE | stat.S_IREAD)
+                tmp.unlink()
+        return blob
+
+    def _link(self, digest: str, write, dest: Path) -> str:
+        """Lie le blob à dest (remplacé atomiquement), copie si le système de fichiers refuse les liens"""
+        dest = Path(dest)
+        tmp = _tmp_name(dest)
+        # Le blob peut être collecté entre sa création et le lien (suppression d'un autre run)
+        for _ in range(3):
+            blob = self._store(digest, write)
+            if dest.exists() and os.path.samefile(blob, dest):
+                # Déjà lié (os.replace entre deux liens du même fichier ne fait rien)
+                self._record(dest.parent, dest.name, digest)
+                return digest
+            try:
+                _link_or_copy(blob, tmp)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            raise OSError(f"Impossible de lier le blob {digest} vers {dest}")
+        os.replace(tmp, dest)
+        self._record(dest.parent, dest.name, digest)
+        return digest
+
+    def put_file(self, source: Path, dest: Path) -> str:
+        """Place une copie de source dans dest (lien vers le blob), retourne le hash du contenu"""
+        source = Path(source)
+        return self._link(self._digest_file(source), lambda tmp: shutil.copyfile(source, tmp), dest)
+
+    def put_bytes(self, content: bytes, dest: Path) -> str:
+        digest = hashlib.sha256(content).hexdigest()
+        return self._link(digest, lambda tmp: Path(tmp).write_bytes(content), dest)
+
+    def adopt(self, path: Path) -> str:
+        """Remplace un fichier écrit dans un dossier de run par un lien vers son blob"""
+        path = Path(path)
+        digest = self._digest_file(path)
+        blob = self.blob_path(digest)
+        if blob.exists() and os.path.samefile(blob, path):
+            self._record(path.parent, path.name, digest)
+            return digest
+        return self._link(digest, lambda tmp: _link_or_copy(path, tmp), path)
+
+    # Alias: clé de calcul (ex: source + période du filtrage) -> hash du résultat déjà stocké
+    def lookup(self, key: str) -> Optional[str]:
+        alias = self.root / "keys" / hashlib.sha256(key.encode('utf-8')).hexdigest()
+        try:
+            digest = alias.read_text(encoding='utf-8').strip()
+        except OSError:
+            return None
+        return digest if self.blob_path(digest).exists() else None
+
+    def remember(self, key: str, digest: str):
+        alias = self.root / "keys" / hashlib.sha256(key.encode('utf-8')).hexdigest()
+        alias.parent.mkdir(exist_ok=True)
+        tmp = _tmp_name(alias)
+        tmp.write_text(digest, encoding='utf-8')
+        os.replace(tmp, alias)
+
+    def link(self, digest: str, dest: Path) -> str:
+        """Lie un blob existant (cf. lookup) dans un dossier de run"""
+        blob = self.blob_path(digest)
+        return self._link(digest, lambda tmp: shutil.copyfile(blob, tmp), dest)
+
+    @staticmethod
+    def _record(run_dir: Path, filename: str, digest: str):
+        """Manifeste du run (fichier -> hash): blobs à examiner à la suppression du run"""
+        manifest_file = run_dir / MANIFEST_NAME
+        try:
+            manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            manifest = {}
+        manifest[filename] = digest
+        tmp = _tmp_name(manifest_file)
+        tmp.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+        os.replace(tmp, manifest_file)
+
+    @staticmethod
+    def run_manifest(run_dir: Path) -> Dict[str, str]:
+        """Fichiers liés dans un dossier de run: nom -> hash du contenu"""
+        try:
+            return json.loads((Path(run_dir) / MANIFEST_NAME).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    @classmethod
+    def run_digests(cls, run_dir: Path) -> Iterable[str]:
+        return set(cls.run_manifest(run_dir).values())
+
+    def release(self, digests: Iterable[str]) -> int:
+        """Supprime les blobs qui ne sont plus liés par aucun run, retourne les octets libérés"""
+        freed = 0
+        for digest in digests:
+            blob = self.blob_path(digest)
+            try:
+                st = blob.stat()
+                if st.st_nlink > 1:
+                    continue
+                os.chmod(blob, stat.S_IWRITE | stat.S_IREAD)
+                blob.unlink()
+                freed += st.st_size
+            except FileNotFoundError:
+                continue
+        return freed
+
+    def gc(self, grace_seconds: float = GC_GRACE_SECONDS) -> int:
+        """
+        Collecte complète: blobs orphelins (runs supprimés hors delete_run, copies sans lien)
+        Les blobs récents sont épargnés (créés par un run en cours, pas encore liés)
+        """
+        now = time.time()
+        digests = [
+            blob.name for blob in self.root.glob("??/*")
+            if not blob.name.endswith(".tmp") and now - blob.stat().st_ctime > grace_seconds
+        ]
+        return self.release(digests)
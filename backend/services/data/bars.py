@@ -0,0 +1,190 @@
+"""
+Pyramide de barres OHLC pour les graphiques
+Les données 1s sont agrégées une seule fois en barres 1 minute (par symbole), persistées en Parquet
+à côté du CSV, puis servies par tranche de dates (recherche binaire) et ré-échantillonnées au timeframe demandé
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+from services.data.manifest import get_manifest
+
+BARS_VERSION = 1
+CHUNK_SIZE = 2_000_000
+# Signature du CSV source stockée dans les métadonnées du schéma Parquet
+_METADATA_KEY = b"bars_1m"
+
+# Timeframes supportés -> règle de resampling pandas
+TIMEFRAMES = {
+    "1m": "1min",
+    "5m": "5min",
+    "15m": "15min",
+    "30m": "30min",
+    "1h": "1h",
+    "4h": "4h",
+    "1d": "1D",
+}
+
+OHLC_AGG = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+# Cache mémoire: chemin du CSV -> (signature, DataFrame 1m trié par timestamp)
+_bars_cache: Dict[str, tuple] = {}
+_bars_lock = threading.Lock()
+
+
+def bars_path_for(csv_path: Path) -> Path:
+    """Chemin du fichier de barres 1m associé à un CSV"""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + f".bars_1m.v{BARS_VERSION}.parquet")
+
+
+def _signature(csv_path: Path) -> Dict[str, Any]:
+    st = Path(csv_path).stat()
+    return {"version": BARS_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_bars(path: Path, signature: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """Barres persistées si elles ont été construites depuis ce CSV (même taille et mtime)"""
+    if pq is None or not path.exists():
+        return None
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+        if json.loads(metadata.get(_METADATA_KEY, b"{}")) != signature:
+            return None
+        return pq.read_table(path).to_pandas()
+    except Exception as e:
+        print(f"⚠️ Barres 1m illisibles {path.name}: {e}")
+        return None
+
+
+def _write_bars(path: Path, bars: pd.DataFrame, signature: Dict[str, Any]):
+    if pa is None:
+        # pyarrow absent: cache mémoire uniquement
+        return
+    try:
+        table = pa.Table.from_pandas(bars, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            _METADATA_KEY: json.dumps(signature).encode()
+        })
+        # Écriture atomique (plusieurs workers peuvent construire les mêmes barres)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+    except Exception as e:
+        # Dossier en lecture seule: cache mémoire uniquement
+        print(f"⚠️ Barres 1m non persistées: {e}")
+
+
+def build_bars_1m(csv_path: Path) -> pd.DataFrame:
+    """Agrège le CSV brut (1s) en barres 1 minute par symbole (contrats outright uniquement)"""
+    csv_path = Path(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    cols = {c.lower(): c for c in header}
+    rename = {cols[c]: c for c in ("open", "high", "low", "close", "volume", "symbol")}
+    rename[cols["ts_event"]] = "timestamp"
+
+    partials = []
+    for chunk in pd.read_csv(csv_path, usecols=list(rename), chunksize=CHUNK_SIZE):
+        chunk = chunk.rename(columns=rename)
+        # Ignorer les spreads calendaires (ex: NQU4-NQZ4)
+        chunk = chunk[~chunk["symbol"].astype(str).str.contains("-", regex=False)]
+        chunk["timestamp"] = pd.to_datetime(chunk["timestamp"], utc=True).dt.floor("1min")
+        partials.append(chunk.groupby(["symbol", "timestamp"], sort=False).agg(OHLC_AGG))
+
+    if not partials:
+        return pd.DataFrame(columns=["timestamp", "symbol", *OHLC_AGG])
+
+    # Recombiner les minutes à cheval sur deux chunks (chunks dans l'ordre du fichier)
+    bars = pd.concat(partials).groupby(level=["symbol", "timestamp"], sort=False).agg(OHLC_AGG)
+    bars = bars.reset_index().sort_values(["timestamp", "symbol"], kind="stable").reset_index(drop=True)
+    bars["symbol"] = bars["symbol"].astype("category")
+    return bars
+
+
+def load_bars_1m(csv_path: Path) -> pd.DataFrame:
+    """
+    Retourne les barres 1m d'un CSV
+    Ordre: cache mémoire -> Parquet à jour -> reconstruction (si le CSV a changé)
+    """
+    csv_path = Path(csv_path)
+    signature = _signature(csv_path)
+    key = str(csv_path)
+
+    cached = _bars_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with _bars_lock:
+        cached = _bars_cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        path = bars_path_for(csv_path)
+        bars = _read_bars(path, signature)
+        if bars is None:
+            print(f"🔄 Construction des barres 1m pour {csv_path.name}...")
+            bars = build_bars_1m(csv_path)
+            _write_bars(path, bars, signature)
+
+        _bars_cache[key] = (signature, bars)
+        return bars
+
+
+def get_ohlc(
+    csv_path: Path,
+    days: int,
+    timeframe: str = "30m",
+    symbol: Optional[str] = None,
+    continuous: bool = True
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Barres OHLC des N derniers jours au timeframe demandé
+    - symbol: contrat précis (ex: NQZ4)
+    - continuous: série front-month continue (front-month par jour issu du manifest, non ajustée)
+    Sans symbol, continuous=False est refusé: les prix de plusieurs contrats seraient mélangés
+    Retourne (DataFrame indexé par timestamp, métadonnées)
+    """
+    if timeframe not in TIMEFRAMES:
+        raise ValueError(f"Timeframe invalide: {timeframe} (valeurs possibles: {', '.join(TIMEFRAMES)})")
+    if not symbol and not continuous:
+        raise ValueError("symbol requis quand continuous=false (série d'un contrat précis)")
+
+    bars = load_bars_1m(csv_path)
+    if bars.empty:
+        return bars.set_index("timestamp")[list(OHLC_AGG)], {"symbol": symbol or "NQ", "symbols": []}
+
+    # Tranche des N derniers jours par recherche binaire sur les timestamps triés
+    # dtype explicite: to_numpy() sur une colonne tz-aware donne un tableau d'objets Timestamp
+    ts = bars["timestamp"].to_numpy(dtype="datetime64[ns]")
+    start = ts[-1] - np.timedelta64(days, "D")
+    window = bars.iloc[np.searchsorted(ts, start, side="left"):]
+
+    if symbol:
+        window = window[window["symbol"] == symbol]
+    elif continuous:
+        manifest = get_manifest(csv_path) or {}
+        front_month = manifest.get("front_month", {})
+        day_keys = window["timestamp"].dt.strftime("%Y-%m-%d")
+        window = window[window["symbol"].astype(str).to_numpy() == day_keys.map(front_month).to_numpy()]
+
+    symbols = [str(s) for s in pd.unique(window["symbol"].astype(str))]
+    ohlc = window.set_index("timestamp")[list(OHLC_AGG)]
+    if timeframe != "1m":
+        ohlc = ohlc.resample(TIMEFRAMES[timeframe]).agg(OHLC_AGG).dropna()
+
+    label = symbol or (symbols[-1] if symbols else "NQ")
+    return ohlc, {"symbol": label, "symbols": symbols}
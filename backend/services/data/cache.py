@@ -0,0 +1,142 @@
+"""
+Caches LRU avec expiration par clé
+- TTLCache: mémoire du processus (rapide, dupliqué par worker uvicorn)
+- SQLiteCache: fichier SQLite partagé entre les workers d'une même machine
+"""
+
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Cache LRU borné dont chaque entrée expire après ttl secondes"""
+
+    def __init__(self, maxsize: int = 32, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            stored_at, value = item
+            if time.time() - stored_at > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteCache:
+    """
+    Même interface que TTLCache, stockée dans une table SQLite (valeurs picklées)
+    Les clés sont hachées depuis leur repr: elles doivent être composées de types simples
+    """
+
+    def __init__(self, db_path: Path, namespace: str, maxsize: int = 32, ttl: float = 300):
+        self.db_path = Path(db_path)
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    stored_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    @staticmethod
+    def _hash(key: Hashable) -> str:
+        return hashlib.sha1(repr(key).encode()).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND stored_at > ?",
+                (self.namespace, self._hash(key), now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, self._hash(key))
+            )
+        return pickle.loads(row[0])
+
+    def set(self, key: Hashable, value: Any):
+        now = time.time()
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, self._hash(key), blob, now, now)
+            )
+            # Éviction: entrées expirées puis les moins récemment utilisées au-delà de maxsize
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND (stored_at <= ? OR key NOT IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at DESC LIMIT ?))",
+                (self.namespace, now - self.ttl, self.namespace, self.maxsize)
+            )
+
+    def delete(self, key: Hashable):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, self._hash(key)))
+
+    def clear(self):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+
+def create_cache(namespace: str, maxsize: int = 32, ttl: float = 300):
+    """
+    Cache selon CACHE_BACKEND: 'memory' (défaut, un cache par processus)
+    ou 'sqlite' (partagé entre les workers via CACHE_DB_PATH)
+    """
+    from config import CACHE_BACKEND, CACHE_DB_PATH
+
+    if CACHE_BACKEND == "sqlite":
+        return SQLiteCache(CACHE_DB_PATH, namespace, maxsize=maxsize, ttl=ttl)
+    return TTLCache(maxsize=maxsize, ttl=ttl)
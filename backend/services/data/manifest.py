@@ -0,0 +1,219 @@
+"""
+Manifest des données de marché (couverture par symbole, jours de trading, trous, rolls)
+Calculé une seule fois par version du fichier CSV et stocké à côté de celui-ci
+"""
+
+import bisect
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+import pandas as pd
+
+MANIFEST_VERSION = 2
+CHUNK_SIZE = 2_000_000
+
+# Cache mémoire: chemin du CSV -> (signature, manifest)
+_manifest_cache: Dict[str, tuple] = {}
+_manifest_lock = threading.Lock()
+# CSV dont le manifest est en cours de construction en arrière-plan
+_rebuilding: Set[str] = set()
+_rebuilding_lock = threading.Lock()
+
+
+def manifest_path_for(csv_path: Path) -> Path:
+    """Chemin du manifest associé à un CSV (ex: data.csv -> data.csv.manifest.json)"""
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".manifest.json")
+
+
+def _file_signature(csv_path: Path) -> Dict[str, Any]:
+    st = Path(csv_path).stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build_manifest(csv_path: Path) -> Dict[str, Any]:
+    """
+    Parcourt le CSV par chunks (colonnes utiles uniquement) et calcule:
+    - la couverture et le nombre de lignes par symbole
+    - les jours de trading présents et les jours ouvrés manquants (trous)
+    - le front-month par jour (symbole au plus gros volume) et les dates de roll
+    """
+    csv_path = Path(csv_path)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    cols = {c.lower(): c for c in header}
+
+    ts_col = next((cols[c] for c in ("ts_event", "timestamp", "datetime", "date") if c in cols), None)
+    if ts_col is None:
+        raise ValueError(f"Colonne timestamp non trouvée dans {list(header)}")
+    symbol_col = cols.get("symbol")
+    volume_col = cols.get("volume")
+    usecols = [c for c in (ts_col, symbol_col, volume_col) if c]
+
+    partials = []
+    for chunk in pd.read_csv(csv_path, usecols=usecols, chunksize=CHUNK_SIZE):
+        ts = pd.to_datetime(chunk[ts_col], utc=True, errors="coerce")
+        part = pd.DataFrame({
+            "symbol": chunk[symbol_col].astype(str) if symbol_col else "ALL",
+            "date": ts.dt.strftime("%Y-%m-%d"),
+            "ts": ts,
+            "volume": chunk[volume_col] if volume_col else 0
+        }).dropna(subset=["ts"])
+        partials.append(part.groupby(["symbol", "date"], sort=False).agg(
+            rows=("ts", "size"), first=("ts", "min"), last=("ts", "max"), volume=("volume", "sum")
+        ))
+
+    if not partials:
+        by_day = pd.DataFrame(columns=["rows", "first", "last", "volume"])
+    else:
+        by_day = pd.concat(partials).groupby(level=["symbol", "date"]).agg(
+            {"rows": "sum", "first": "min", "last": "max", "volume": "sum"}
+        )
+    by_day = by_day.reset_index()
+
+    symbols = {}
+    for symbol, g in by_day.groupby("symbol"):
+        symbols[symbol] = {
+            "start": g["first"].min().isoformat(),
+            "end": g["last"].max().isoformat(),
+            "rows": int(g["rows"].sum()),
+            "trading_days": int(len(g))
+        }
+
+    trading_days = sorted(by_day["date"].unique().tolist())
+
+    # Jours ouvrés absents entre la première et la dernière date
+    gaps = []
+    if trading_days:
+        expected = pd.bdate_range(trading_days[0], trading_days[-1]).strftime("%Y-%m-%d")
+        gaps = sorted(set(expected) - set(trading_days))
+
+    # Front-month par jour = contrat outright au plus gros volume, roll = changement de front-month
+    front_month = {}
+    roll_dates = []
+    outrights = by_day[~by_day["symbol"].str.contains("-", regex=False)]
+    if len(outrights):
+        front = outrights.sort_values(["date", "volume"], ascending=[True, False]).drop_duplicates("date")
+        front_month = dict(zip(front["date"], front["symbol"]))
+        previous = front["symbol"].shift()
+        rolls = front[previous.notna() & (front["symbol"] != previous)]
+        roll_dates = [
+            {"date": d, "from": p, "to": s}
+            for d, p, s in zip(rolls["date"], previous[rolls.index], rolls["symbol"])
+        ]
+
+    start = by_day["first"].min() if len(by_day) else None
+    end = by_day["last"].max() if len(by_day) else None
+
+    return {
+        "version": MANIFEST_VERSION,
+        "source": {"path": str(csv_path), **_file_signature(csv_path)},
+        "start": start.isoformat() if start is not None else None,
+        "end": end.isoformat() if end is not None else None,
+        "rows": int(by_day["rows"].sum()) if len(by_day) else 0,
+        "symbols": symbols,
+        "trading_days": trading_days,
+        "gaps": gaps,
+        "front_month": front_month,
+        "roll_dates": roll_dates
+    }
+
+
+def _is_fresh(manifest: Dict[str, Any], signature: Dict[str, Any]) -> bool:
+    source = manifest.get("source", {})
+    return (manifest.get("version") == MANIFEST_VERSION
+            and source.get("size") == signature["size"]
+            and source.get("mtime_ns") == signature["mtime_ns"])
+
+
+def write_manifest(csv_path: Path) -> Dict[str, Any]:
+    """Construit et écrit le manifest d'un CSV (à appeler lors de l'ingestion des données)"""
+    csv_path = Path(csv_path)
+    manifest = build_manifest(csv_path)
+    path = manifest_path_for(csv_path)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    tmp.replace(path)
+    _manifest_cache[str(csv_path)] = ((manifest["source"]["size"], manifest["source"]["mtime_ns"]), manifest)
+    return manifest
+
+
+def _read_manifest(csv_path: Path, signature: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Manifest écrit à côté du CSV, s'il correspond à la version actuelle du fichier"""
+    path = manifest_path_for(csv_path)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Manifest illisible {path.name}: {e}")
+        return None
+    return manifest if _is_fresh(manifest, signature) else None
+
+
+def _rebuild_in_background(csv_path: Path, force_rebuild: bool):
+    """Lance la construction du manifest dans un thread (une seule à la fois par CSV)"""
+    key = str(csv_path)
+    with _rebuilding_lock:
+        if key in _rebuilding:
+            return
+        _rebuilding.add(key)
+
+    def rebuild():
+        try:
+            get_manifest(csv_path, force_rebuild=force_rebuild)
+        except Exception as e:
+            print(f"⚠️ Construction du manifest impossible pour {csv_path.name}: {e}")
+        finally:
+            with _rebuilding_lock:
+                _rebuilding.discard(key)
+
+    threading.Thread(target=rebuild, name=f"manifest-{csv_path.name}", daemon=True).start()
+
+
+def get_manifest(csv_path: Path, force_rebuild: bool = False,
+                 background: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Retourne le manifest d'un CSV
+    Ordre: cache mémoire -> fichier manifest -> reconstruction (si le CSV a changé ou si forcé)
+    background: la reconstruction (lecture complète du CSV) est lancée dans un thread et None
+    est retourné en attendant, pour ne pas bloquer une requête HTTP
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        return None
+
+    signature = _file_signature(csv_path)
+    key = str(csv_path)
+
+    cached = _manifest_cache.get(key)
+    if not force_rebuild and cached and cached[0] == (signature["size"], signature["mtime_ns"]):
+        return cached[1]
+
+    if not force_rebuild:
+        manifest = _read_manifest(csv_path, signature)
+        if manifest is not None:
+            _manifest_cache[key] = ((signature["size"], signature["mtime_ns"]), manifest)
+            return manifest
+
+    if background:
+        _rebuild_in_background(csv_path, force_rebuild)
+        return None
+
+    with _manifest_lock:
+        # Construit entre-temps par un autre thread
+        cached = _manifest_cache.get(key)
+        if not force_rebuild and cached and cached[0] == (signature["size"], signature["mtime_ns"]):
+            return cached[1]
+
+        print(f"🔄 Construction du manifest pour {csv_path.name}...")
+        return write_manifest(csv_path)
+
+
+def trading_days_between(manifest: Dict[str, Any], start_date: str, end_date: str) -> int:
+    """Nombre de jours de trading présents dans le manifest entre deux dates (incluses)"""
+    days = manifest.get("trading_days", [])
+    return bisect.bisect_right(days, end_date) - bisect.bisect_left(days, start_date)
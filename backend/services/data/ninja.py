@@ -0,0 +1,394 @@
+"""
+Exports de trades NinjaTrader (ninja_runs/<MARCHÉ>/*.csv, locale française)
+Chaque export est parsé une seule fois (séparateur ';' fixe, moteur C, nettoyage vectorisé
+des décimales à virgule et des symboles monétaires) puis stocké dans un fichier Parquet
+typé à côté du CSV (export.csv -> export.csv.parquet), invalidé par la signature du CSV
+Le Parquet est trié par heure de sortie (index = ligne de l'export) et un manifest par dossier
+(dates min/max de chaque export) permet d'écarter les fichiers hors d'une plage de dates
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+EXPORT_VERSION = 2
+SEPARATOR = ";"
+DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+# Noms possibles de la colonne PnL (ordre des colonnes du fichier prioritaire)
+PNL_NAMES = ("profit", "pnl", "bénéfice", "p&l", "pl", "net", "gain", "loss", "result")
+DATE_NAMES = ("date", "heure", "time")
+QUANTITY_NAMES = ("qté", "qty", "quantity", "quantité")
+
+# Symboles monétaires et espaces retirés avant conversion numérique
+_NUMERIC_JUNK = r"[\s$€]"  # \s couvre aussi les espaces insécables
+_METADATA_KEY = b"ninja_export"
+# Groupes de lignes du Parquet: les lectures filtrées par date ne lisent que les groupes utiles
+ROW_GROUP_SIZE = 50_000
+MANIFEST_NAME = "_manifest.json"
+
+# Cache mémoire: chemin du CSV -> (signature, DataFrame typé)
+_export_cache: Dict[str, tuple] = {}
+_export_lock = threading.Lock()
+# Cache mémoire: dossier -> manifest
+_manifest_cache: Dict[str, Dict[str, Any]] = {}
+_manifest_lock = threading.Lock()
+
+
+def sidecar_path_for(csv_path: Path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".parquet")
+
+
+def _file_signature(csv_path: Path) -> Dict[str, Any]:
+    st = Path(csv_path).stat()
+    return {"version": EXPORT_VERSION, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _strip_numeric(values: pd.Series) -> pd.Series:
+    return (
+        values.astype("string")
+        .str.replace(_NUMERIC_JUNK, "", regex=True)
+        .str.replace(",", ".", regex=False)
+    )
+
+
+def clean_numeric(values: pd.Series) -> pd.Series:
+    """"-35,74 $" -> -35.74 sur toute la colonne (float64, NaN si non convertible)"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+    return pd.to_numeric(_strip_numeric(values), errors="coerce").astype("float64")
+
+
+def _is_date_column(name: str) -> bool:
+    lower = name.lower()
+    return any(x in lower for x in DATE_NAMES)
+
+
+def parse_export(csv_path: Path) -> pd.DataFrame:
+    """
+    Lit un export CSV et type ses colonnes
+    - colonnes de date/heure: datetime (format DD/MM/YYYY HH:MM:SS)
+    - colonnes dont toutes les valeurs sont numériques une fois nettoyées: float/int
+    - autres colonnes: texte
+    """
+    df = pd.read_csv(csv_path, sep=SEPARATOR, engine="c", dtype=str, encoding="utf-8-sig")
+    if df.shape[1] == 1:
+        # Export dans une autre locale (séparateur virgule)
+        df = pd.read_csv(csv_path, sep=",", engine="c", dtype=str, encoding="utf-8-sig")
+
+    # Le ';' final de chaque ligne produit une colonne vide sans nom
+    empty_unnamed = [c for c in df.columns if c.startswith("Unnamed:") and df[c].isna().all()]
+    df = df.drop(columns=empty_unnamed)
+
+    for col in df.columns:
+        values = df[col]
+        present = values.notna()
+        if not present.any():
+            continue
+        if _is_date_column(col):
+            parsed = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+            if parsed.isna().all():
+                parsed = pd.to_datetime(values, errors="coerce", dayfirst=True, format="mixed")
+            if parsed[present].notna().all():
+                df[col] = parsed
+            continue
+        cleaned = _strip_numeric(values)
+        numeric = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+        if numeric[present].notna().all():
+            # Entiers (numéro d'ordre, quantité, barres) si aucune décimale dans le fichier
+            integral = present.all() and not cleaned.str.contains(".", regex=False).any()
+            df[col] = numeric.astype("int64") if integral else numeric
+
+    # Tri par heure de sortie (NaT en fin), l'index conserve la ligne d'origine
+    col = date_column(df)
+    if col is not None and pd.api.types.is_datetime64_any_dtype(df[col]):
+        df = df.sort_values(col, kind="stable", na_position="last")
+    return df
+
+
+def _read_sidecar(sidecar: Path, signature: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    if pq is None or not sidecar.exists():
+        return None
+    try:
+        metadata = pq.read_schema(sidecar).metadata or {}
+        if json.loads(metadata.get(_METADATA_KEY, b"{}")) != signature:
+            return None
+        return pq.read_table(sidecar).to_pandas()
+    except Exception as e:
+        print(f"⚠️ Sidecar illisible {sidecar.name}: {e}")
+        return None
+
+
+def _write_sidecar(sidecar: Path, df: pd.DataFrame, signature: Dict[str, Any]):
+    if pa is None:
+        return
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            _METADATA_KEY: json.dumps(signature).encode()
+        })
+        # Écriture atomique (plusieurs workers peuvent parser le même export)
+        tmp = sidecar.with_name(f"{sidecar.name}.{os.getpid()}.tmp")
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+        os.replace(tmp, sidecar)
+    except Exception as e:
+        print(f"⚠️ Impossible d'écrire {sidecar.name}: {e}")
+
+
+def load_export(csv_path: Path) -> pd.DataFrame:
+    """
+    Export typé (mémoire -> sidecar Parquet -> parsing du CSV)
+    Trié par heure de sortie, index = numéro de ligne (0-based) dans l'export
+    Le DataFrame retourné est partagé: le copier avant de le modifier
+    """
+    csv_path = Path(csv_path)
+    key = str(csv_path.resolve())
+    signature = _file_signature(csv_path)
+
+    with _export_lock:
+        cached = _export_cache.get(key)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    sidecar = sidecar_path_for(csv_path)
+    df = _read_sidecar(sidecar, signature)
+    if df is None:
+        print(f"📥 Parsing de l'export {csv_path.name}...")
+        df = parse_export(csv_path)
+        _write_sidecar(sidecar, df, signature)
+
+    with _export_lock:
+        _export_cache[key] = (signature, df)
+    return df
+
+
+def pnl_column(df: pd.DataFrame) -> Optional[str]:
+    """Colonne PnL: premier nom reconnu, sinon dernière colonne numérique"""
+    for col in df.columns:
+        lower = col.lower().strip()
+        if any(name in lower for name in PNL_NAMES):
+            return col
+    numeric = df.select_dtypes(include="number").columns
+    return numeric[-1] if len(numeric) else None
+
+
+def date_column(df: pd.DataFrame) -> Optional[str]:
+    """Colonne utilisée pour les filtres de dates: heure de sortie en priorité"""
+    columns = [c for c in df.columns if "heure" in c.lower() and "sortie" in c.lower()]
+    if not columns:
+        columns = [c for c in df.columns if _is_date_column(c)]
+    return columns[0] if columns else None
+
+
+def entry_column(df: pd.DataFrame) -> Optional[str]:
+    """Colonne de l'heure d'entrée (None si l'export n'en a pas)"""
+    for col in df.columns:
+        lower = col.lower()
+        if _is_date_column(col) and ("entrée" in lower or "entry" in lower):
+            return col
+    return None
+
+
+def _datetime_ns(df: pd.DataFrame, col: Optional[str]) -> np.ndarray:
+    if col is None or not pd.api.types.is_datetime64_any_dtype(df[col]):
+        return np.full(len(df), np.iinfo(np.int64).min, dtype=np.int64)  # NaT
+    return df[col].to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def trade_columns(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Colonnes utiles d'un export typé en tableaux NumPy, triées par heure de sortie
+    - exit_ns / entry_ns: horodatages int64 (ns, NaT = int64 min)
+    - pnl: PnL net par trade (float64), contracts: quantité (1 si absente)
+    - instrument: racine du contrat ("MGC 12-25" -> "MGC")
+    Les trades sans heure de sortie ou sans PnL exploitable sont exclus
+    """
+    pnl_col = pnl_column(df)
+    pnl = clean_numeric(df[pnl_col]).to_numpy() if pnl_col else np.full(len(df), np.nan)
+    exit_ns = _datetime_ns(df, date_column(df))
+    entry_ns = _datetime_ns(df, entry_column(df))
+
+    qty_col = next((c for c in df.columns if c.lower().strip() in QUANTITY_NAMES), None)
+    contracts = clean_numeric(df[qty_col]).fillna(1.0).to_numpy() if qty_col else np.ones(len(df))
+    if "Instrument" in df.columns:
+        instrument = df["Instrument"].astype(str).str.split().str[0].to_numpy(dtype=object)
+    else:
+        instrument = np.full(len(df), "", dtype=object)
+
+    keep = np.isfinite(pnl) & (exit_ns != np.iinfo(np.int64).min)
+    order = np.argsort(exit_ns[keep], kind="stable")
+    return {
+        "exit_ns": exit_ns[keep][order],
+        "entry_ns": entry_ns[keep][order],
+        "pnl": pnl[keep][order],
+        "contracts": np.abs(contracts[keep][order]),
+        "instrument": instrument[keep][order],
+    }
+
+
+def _date_bounds(start_date: Optional[str], end_date: Optional[str]):
+    """Bornes [début, fin) d'un filtre par journées (fin incluse)"""
+    start = pd.to_datetime(start_date) if start_date else None
+    end = pd.to_datetime(end_date) + pd.Timedelta(days=1) if end_date else None
+    return start, end
+
+
+def _export_order(df: pd.DataFrame) -> pd.DataFrame:
+    """Remet les trades dans l'ordre de l'export"""
+    return df if df.index.is_monotonic_increasing else df.sort_index()
+
+
+def load_range(csv_path: Path, start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """
+    Trades d'un export dont l'heure de sortie est dans [start_date, end_date] (journées incluses),
+    dans l'ordre de l'export
+    - export en mémoire: recherche dichotomique dans la colonne de dates triée
+    - sinon sidecar valide: lecture Parquet filtrée (seuls les groupes de lignes utiles sont lus)
+    - sinon: parsing complet (qui écrit le sidecar) puis recherche dichotomique
+    """
+    csv_path = Path(csv_path)
+    if not (start_date or end_date):
+        return _export_order(load_export(csv_path))
+
+    start, end = _date_bounds(start_date, end_date)
+    signature = _file_signature(csv_path)
+    with _export_lock:
+        cached = _export_cache.get(str(csv_path.resolve()))
+
+    if not (cached and cached[0] == signature) and pq is not None:
+        sidecar = sidecar_path_for(csv_path)
+        try:
+            schema = pq.read_schema(sidecar) if sidecar.exists() else None
+        except Exception:
+            schema = None
+        if schema is not None and json.loads((schema.metadata or {}).get(_METADATA_KEY, b"{}")) == signature:
+            col = date_column(pd.DataFrame(columns=schema.names))
+            if col is not None and pa.types.is_timestamp(schema.field(col).type):
+                filters = []
+                if start is not None:
+                    filters.append((col, ">=", start.to_pydatetime()))
+                if end is not None:
+                    filters.append((col, "<", end.to_pydatetime()))
+                table = pq.read_table(sidecar, filters=filters)
+                return _export_order(table.to_pandas())
+
+    df = load_export(csv_path)
+    col = date_column(df)
+    if col is None or not pd.api.types.is_datetime64_any_dtype(df[col]):
+        print(f"   ⚠️ Aucune colonne de date exploitable, pas de filtrage")
+        return _export_order(df)
+
+    # Dates triées (NaT en fin): bornes par recherche dichotomique sur la partie datée
+    dates = df[col].iloc[:int(df[col].notna().sum())]
+    lo = int(dates.searchsorted(start, side="left")) if start is not None else 0
+    hi = int(dates.searchsorted(end, side="left")) if end is not None else len(dates)
+    return _export_order(df.iloc[lo:max(lo, hi)])
+
+
+def _manifest_entry(csv_path: Path) -> Dict[str, Any]:
+    df = load_export(csv_path)
+    col = date_column(df)
+    dates = df[col] if col is not None and pd.api.types.is_datetime64_any_dtype(df[col]) else None
+    return {
+        "signature": _file_signature(csv_path),
+        "rows": int(len(df)),
+        "columns": list(df.columns),
+        "date_column": col if dates is not None else None,
+        "start": dates.min().isoformat() if dates is not None and dates.notna().any() else None,
+        "end": dates.max().isoformat() if dates is not None and dates.notna().any() else None,
+    }
+
+
+def export_manifest(root: Path, csv_paths) -> Dict[str, Dict[str, Any]]:
+    """
+    Manifest des exports d'un dossier (chemin relatif -> lignes, colonnes, dates min/max)
+    Stocké dans <root>/_manifest.json, une entrée n'est recalculée que si son CSV a changé
+    """
+    root = Path(root)
+    key = str(root.resolve())
+    manifest_file = root / MANIFEST_NAME
+
+    with _manifest_lock:
+        manifest = _manifest_cache.get(key)
+        if manifest is None:
+            try:
+                manifest = json.loads(manifest_file.read_text(encoding="utf-8"))
+                if manifest.get("version") != EXPORT_VERSION:
+                    manifest = None
+            except (OSError, ValueError):
+                manifest = None
+        manifest = dict(manifest or {"version": EXPORT_VERSION, "exports": {}})
+        exports = dict(manifest["exports"])
+
+        changed = False
+        result = {}
+        for csv_path in csv_paths:
+            rel = Path(csv_path).relative_to(root).as_posix()
+            entry = exports.get(rel)
+            if entry is None or entry["signature"] != _file_signature(csv_path):
+                try:
+                    entry = _manifest_entry(csv_path)
+                except Exception as e:
+                    # Export illisible: pas d'entrée, l'appelant le lit (et remonte l'erreur) lui-même
+                    print(f"⚠️ Manifest: {rel} ignoré ({e})")
+                    continue
+                exports[rel] = entry
+                changed = True
+            result[rel] = entry
+
+        if changed:
+            manifest["exports"] = exports
+            try:
+                tmp = manifest_file.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+                tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=1), encoding="utf-8")
+                os.replace(tmp, manifest_file)
+            except OSError as e:
+                print(f"⚠️ Impossible d'écrire {manifest_file}: {e}")
+        _manifest_cache[key] = manifest
+    return result
+
+
+def overlaps(entry: Dict[str, Any], start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
+    """Vrai si un export (entrée du manifest) peut contenir des trades dans la plage"""
+    if not (start_date or end_date):
+        return True
+    if entry.get("date_column") is None or entry.get("start") is None:
+        return entry.get("date_column") is None  # Non filtrable: traité comme l'original
+    start, end = _date_bounds(start_date, end_date)
+    if start is not None and pd.Timestamp(entry["end"]) < start:
+        return False
+    if end is not None and pd.Timestamp(entry["start"]) >= end:
+        return False
+    return True
+
+
+def filter_by_date(df: pd.DataFrame, start_date: Optional[str] = None, end_date: Optional[str] = None) -> pd.DataFrame:
+    """Trades dont la date (heure de sortie) est dans [start_date, end_date] (journées incluses)"""
+    if not (start_date or end_date):
+        return df
+    col = date_column(df)
+    if col is None or not pd.api.types.is_datetime64_any_dtype(df[col]):
+        print(f"   ⚠️ Aucune colonne de date exploitable, pas de filtrage")
+        return df
+
+    start, end = _date_bounds(start_date, end_date)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[col] >= start
+    if end is not None:
+        mask &= df[col] < end
+    return df[mask]
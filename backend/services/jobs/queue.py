@@ -0,0 +1,217 @@
+"""
+File d'attente des backtests partagée entre processus
+Les runs sont mis en file par l'API et réclamés de manière atomique par les workers
+(threads intégrés à l'API ou processus `worker.py` séparés), ce qui permet de lancer
+uvicorn avec --workers N sans exécuter deux fois le même run
+"""
+
+import json
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Statuts d'un job dans la file
+QUEUED = "queued"
+RUNNING = "running"
+
+
+class JobQueue(ABC):
+    """Interface de la file de jobs (implémentations: SQLite locale, autre backend partagé)"""
+
+    @abstractmethod
+    def enqueue(self, run_id: str, payload: Dict[str, Any]):
+        """Ajoute un run à la file"""
+
+    @abstractmethod
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Réclame le plus ancien job en attente (atomique entre processus), None si file vide"""
+
+    @abstractmethod
+    def heartbeat(self, run_id: str):
+        """Signale que le worker propriétaire du job est toujours vivant"""
+
+    @abstractmethod
+    def finish(self, run_id: str, status: str):
+        """Marque un job comme terminé (completed, failed ou cancelled)"""
+
+    @abstractmethod
+    def request_cancel(self, run_id: str) -> Optional[str]:
+        """
+        Demande l'annulation d'un job
+        Un job en attente est annulé immédiatement, un job en cours est signalé à son worker
+        Retourne le statut du job avant la demande (None si absent ou déjà terminé)
+        """
+
+    @abstractmethod
+    def is_cancel_requested(self, run_id: str) -> bool:
+        """Indique si l'annulation du job a été demandée"""
+
+    @abstractmethod
+    def request_delete(self, run_id: str) -> bool:
+        """
+        Demande la suppression d'un job en cours (annulation comprise)
+        Retourne True si un worker le possède: c'est lui qui supprimera le run une fois son
+        processus arrêté. False si le job n'est pas en cours (suppression immédiate possible)
+        """
+
+    @abstractmethod
+    def is_delete_requested(self, run_id: str) -> bool:
+        """Indique si la suppression du job a été demandée"""
+
+    @abstractmethod
+    def reap_stale(self, lease_seconds: float) -> List[str]:
+        """Marque en échec les jobs dont le worker ne donne plus signe de vie, retourne leurs run_id"""
+
+    @abstractmethod
+    def remove(self, run_id: str):
+        """Retire un job de la file (suppression du run)"""
+
+
+class SQLiteJobQueue(JobQueue):
+    """File de jobs stockée dans une base SQLite (WAL) à côté des runs"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    run_id TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    worker_id TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    delete_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    claimed_at REAL,
+                    heartbeat_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            # Bases créées avant la suppression différée des runs en cours
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "delete_requested" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN delete_requested INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit: les transactions sont ouvertes explicitement (BEGIN IMMEDIATE)
+        return sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+
+    def enqueue(self, run_id: str, payload: Dict[str, Any]):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (run_id, payload, status, created_at) VALUES (?, ?, ?, ?)",
+                (run_id, json.dumps(payload), QUEUED, time.time())
+            )
+
+    def claim(self, worker_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        conn = self._connect()
+        try:
+            # Verrou d'écriture pris avant la lecture: deux workers ne peuvent pas réclamer le même job
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT run_id, payload FROM jobs WHERE status = ? AND cancel_requested = 0 "
+                "ORDER BY created_at LIMIT 1",
+                (QUEUED,)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, claimed_at = ?, heartbeat_at = ? WHERE run_id = ?",
+                (RUNNING, worker_id, now, now, row[0])
+            )
+            conn.execute("COMMIT")
+            return row[0], json.loads(row[1])
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def heartbeat(self, run_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def finish(self, run_id: str, status: str):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id)
+            )
+
+    def request_cancel(self, run_id: str) -> Optional[str]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT status FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+            if row is None or row[0] not in (QUEUED, RUNNING):
+                conn.execute("COMMIT")
+                return None
+            if row[0] == QUEUED:
+                conn.execute(
+                    "UPDATE jobs SET status = 'cancelled', cancel_requested = 1, finished_at = ? WHERE run_id = ?",
+                    (time.time(), run_id)
+                )
+            else:
+                conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE run_id = ?", (run_id,))
+            conn.execute("COMMIT")
+            return row[0]
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def is_cancel_requested(self, run_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        return bool(row and row[0])
+
+    def request_delete(self, run_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            # Une seule instruction: atomique face au finish() du worker propriétaire
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, delete_requested = 1 WHERE run_id = ? AND status = ?",
+                (run_id, RUNNING)
+            )
+        return cursor.rowcount > 0
+
+    def is_delete_requested(self, run_id: str) -> bool:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT delete_requested FROM jobs WHERE run_id = ?", (run_id,)).fetchone()
+        return bool(row and row[0])
+
+    def reap_stale(self, lease_seconds: float) -> List[str]:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            limit = time.time() - lease_seconds
+            stale = [r[0] for r in conn.execute(
+                "SELECT run_id FROM jobs WHERE status = ? AND heartbeat_at < ?", (RUNNING, limit)
+            )]
+            if stale:
+                conn.executemany(
+                    "UPDATE jobs SET status = 'failed', finished_at = ? WHERE run_id = ?",
+                    [(time.time(), run_id) for run_id in stale]
+                )
+            conn.execute("COMMIT")
+            return stale
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def remove(self, run_id: str):
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM jobs WHERE run_id = ?", (run_id,))
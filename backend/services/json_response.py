@@ -0,0 +1,41 @@
+"""
+Sérialisation JSON rapide pour les réponses de l'API
+Basée sur orjson : NaN/inf -> null et types numpy gérés nativement
+"""
+
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+# Options communes : types numpy natifs + clés non-string (ex: heures en int)
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    """Fallback pour les objets non supportés par orjson (Path, Timedelta, ...)"""
+    # pd.NaT / pd.NA -> null
+    if type(obj).__name__ in ("NaTType", "NAType"):
+        return None
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    if hasattr(obj, "item"):  # scalaires numpy exotiques
+        return obj.item()
+    return str(obj)
+
+
+def dumps(content: Any, indent: bool = False) -> bytes:
+    """Sérialise un objet Python en JSON (bytes)"""
+    option = ORJSON_OPTIONS | orjson.OPT_INDENT_2 if indent else ORJSON_OPTIONS
+    return orjson.dumps(content, option=option, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Réponse JSON basée sur orjson
+    Remplace les passes récursives de nettoyage (clean_for_json) :
+    NaN/inf sont sérialisés en null et les types numpy/pandas sont acceptés tels quels
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -4,12 +4,15 @@ Usage: python start.py
 """
 
 import uvicorn
+from config import API_WORKERS, RUN_EMBEDDED_WORKERS
 
 if __name__ == "__main__":
     print("🚀 Démarrage du backend NQ Backtest API...")
     print("📡 API disponible sur: http://localhost:8000")
     print("📚 Documentation: http://localhost:8000/docs")
     print("❌ Arrêt: Ctrl+C")
+    if RUN_EMBEDDED_WORKERS == 0:
+        print("👷 Aucun worker intégré: lancer `python worker.py` pour exécuter les backtests")
     print("-" * 50)
     
     uvicorn.run(
@@ -17,5 +20,6 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=False,  # Désactivé pour éviter d'interrompre les backtests
+        workers=API_WORKERS,  # État des runs et file d'attente partagés (SQLite), cf. worker.py
         log_level="info"
     )
@@ -326,9 +326,13 @@ def simulate_day(day_df_30: pd.DataFrame, symbol_label: str) -> List[Trade]:
 # ========= RUN ============
 # ==========================
 
+def prepare_bars(df_raw: pd.DataFrame) -> pd.DataFrame:
+    """Barres consommées par simulate_day (aussi utilisé par le walk-forward)"""
+    return resample_30m(df_raw)
+
 def run_backtest(df_raw: pd.DataFrame):
     # Agrégation 30mn
-    df30 = resample_30m(df_raw)
+    df30 = prepare_bars(df_raw)
     df30["utc_date"] = df30["timestamp"].dt.date
 
     all_trades: List[Trade] = []
@@ -267,6 +267,13 @@ def simulate_day(day_df: pd.DataFrame, symbol: str, the_date: date) -> List[Trad
 # ========= RUN ============
 # ==========================
 
+def prepare_bars(df_raw: pd.DataFrame, timeframe: str = "1h") -> pd.DataFrame:
+    """
+    Barres consommees par simulate_day
+    Le walk-forward (services/backtest/walk_forward.py) l'appelle avant de decouper par jour
+    """
+    return resample_ohlc(df_raw, timeframe)
+
 def run_backtest(df_raw: pd.DataFrame, timeframe: str = "1h", max_days: int = None):
     """
     Execute le backtest
@@ -275,7 +282,7 @@ def run_backtest(df_raw: pd.DataFrame, timeframe: str = "1h", max_days: int = No
     """
     # Agregation OHLC
     print(f"Agregation en {timeframe}...")
-    df_ohlc = resample_ohlc(df_raw, timeframe)
+    df_ohlc = prepare_bars(df_raw, timeframe)
     df_ohlc["utc_date"] = df_ohlc["timestamp"].dt.date
     
     all_trades = []
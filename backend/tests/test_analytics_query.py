@@ -0,0 +1,93 @@
+"""
+Tests du DSL de questions (compile_question -> QueryPlan) et de l'exécution des plans
+sur un petit jeu de trades (execute_plan)
+Usage: cd backend && python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services.analytics.dsl import DEFAULT_METRICS, Filter, QueryPlan, compile_question
+from services.analytics.query import execute_plan, trade_columns
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("win rate by hour for shorts in Q1", QueryPlan(
+        filters=(Filter("direction", "in", ("SHORT",)), Filter("quarter", "in", (1,))),
+        group_by="hour", metrics=("trades", "win_rate"))),
+    ("long vs short", QueryPlan(group_by="direction", metrics=DEFAULT_METRICS)),
+    ("profit factor par largeur d OPR en 3 tranches", QueryPlan(
+        group_by="opr_width", metrics=("trades", "profit_factor"), buckets=3)),
+    ("drawdown par mois", QueryPlan(group_by="month", metrics=("trades", "max_drawdown"))),
+    ("PnL moyen par jour de la semaine en 2024", QueryPlan(
+        filters=(Filter("year", "in", (2024,)),), group_by="weekday", metrics=("trades", "avg_pnl"))),
+    ("trades gagnants en mars", QueryPlan(
+        filters=(Filter("month", "in", (3,)), Filter("outcome", "in", ("win",))))),
+    ("pnl des longs le lundi", QueryPlan(
+        filters=(Filter("direction", "in", ("LONG",)), Filter("weekday", "in", (0,))),
+        metrics=("trades", "total_pnl"))),
+    ("performance", QueryPlan(intent="performance")),
+    ("génère un code sharpe", QueryPlan(intent="code")),
+    ("bonsoir", QueryPlan(intent="help")),
+])
+def test_compile_question(question, expected):
+    assert compile_question(question) == expected
+
+
+@pytest.fixture
+def frame():
+    # Colonnes du CSV de la stratégie (sans colonne date: jour déduit de entry_time)
+    trades = pd.DataFrame([
+        ("2024-01-08 09:45:00", "SHORT", "TP", 100.0, 10.0),
+        ("2024-01-08 09:50:00", "LONG", "SL", -50.0, 20.0),
+        ("2024-02-13 10:15:00", "SHORT", "SL", -40.0, 30.0),
+        ("2024-04-02 09:40:00", "SHORT", "TP", 80.0, 40.0),
+        ("2024-04-03 10:05:00", "LONG", "TP", 60.0, 50.0),
+        ("2025-01-06 09:35:00", "SHORT", "EOD", -10.0, 60.0),
+    ], columns=["entry_time", "direction", "result", "pnl_usd", "or_high"])
+    trades["or_low"] = 0.0
+    return trade_columns(trades)
+
+
+def _rows(result):
+    return {row.pop("key"): row for row in result["rows"]}
+
+
+@pytest.mark.parametrize("plan, expected", [
+    (QueryPlan(filters=(Filter("direction", "in", ("SHORT",)), Filter("quarter", "in", (1,))),
+               group_by="hour", metrics=("trades", "win_rate")),
+     {"9h": {"trades": 2, "win_rate": 0.5}, "10h": {"trades": 1, "win_rate": 0.0}}),
+    (QueryPlan(group_by="direction"),
+     {"LONG": {"trades": 2, "total_pnl": 10.0, "win_rate": 0.5, "expectancy": 5.0},
+      "SHORT": {"trades": 4, "total_pnl": 130.0, "win_rate": 0.5, "expectancy": 32.5}}),
+    (QueryPlan(group_by="month", metrics=("trades", "max_drawdown")),
+     {"2024-01": {"trades": 2, "max_drawdown": -50.0}, "2024-02": {"trades": 1, "max_drawdown": -40.0},
+      "2024-04": {"trades": 2, "max_drawdown": 0.0}, "2025-01": {"trades": 1, "max_drawdown": -10.0}}),
+    # Tranches par quantiles: la borne basse de la première dépend de la version de pandas
+    (QueryPlan(group_by="opr_width", metrics=("trades", "profit_factor"), buckets=3),
+     {"-26.67 pts": {"trades": 2, "profit_factor": 2.0},
+      "26.67-43.33 pts": {"trades": 2, "profit_factor": 2.0},
+      "43.33-60.00 pts": {"trades": 2, "profit_factor": 6.0}}),
+    (QueryPlan(filters=(Filter("outcome", "in", ("win",)),), metrics=("trades", "total_pnl", "profit_factor")),
+     {"Tous": {"trades": 3, "total_pnl": 240.0, "profit_factor": None}}),
+    (QueryPlan(filters=(Filter("year", "in", (2023,)),)), {}),
+])
+def test_execute_plan(frame, plan, expected):
+    result = execute_plan(frame, plan)
+    assert result["total"] == len(frame)
+    assert result["matched"] == sum(row["trades"] for row in expected.values())
+    rows = _rows(result)
+    assert len(rows) == len(expected)
+    for (key, row), (expected_key, metrics) in zip(rows.items(), expected.items()):
+        assert key.endswith(expected_key)
+        assert row == pytest.approx(metrics)
+
+
+def test_execute_plan_requires_opr_columns(frame):
+    plan = QueryPlan(group_by="opr_width", metrics=("trades", "profit_factor"))
+    with pytest.raises(ValueError):
+        execute_plan(frame.assign(opr_width=float("nan")), plan)
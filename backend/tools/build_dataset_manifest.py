@@ -0,0 +1,43 @@
+"""
+Construction hors ligne du manifest des CSV de données (couverture, jours, trous, rolls)
+À lancer après l'ingestion d'un nouveau fichier: l'API ne reconstruit le manifest qu'en
+arrière-plan et ignore la validation des dates tant qu'il n'est pas prêt
+Usage: python tools/build_dataset_manifest.py [csv ...] [--bars]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services.data.bars import bars_path_for, load_bars_1m
+from services.data.manifest import manifest_path_for, write_manifest
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Construit le manifest (couverture, jours, trous, rolls) des CSV de données.")
+    ap.add_argument("csv", type=Path, nargs="*", help="CSV à indexer (défaut: data/raw/*.csv)")
+    ap.add_argument("--base", type=Path, default=Path(__file__).resolve().parent.parent)
+    ap.add_argument("--bars", action="store_true", help="Construit aussi la pyramide de barres 1m (graphiques OHLC)")
+    args = ap.parse_args()
+
+    csvs = args.csv or sorted((args.base / "data" / "raw").glob("*.csv"))
+    if not csvs:
+        print("Aucun CSV trouvé.")
+        return 1
+
+    for csv in csvs:
+        m = write_manifest(csv)
+        print(f"✅ {csv.name}: {m['start']} -> {m['end']} | {m['rows']:,} lignes | "
+              f"{len(m['trading_days'])} jours | {len(m['gaps'])} trous | {len(m['roll_dates'])} rolls")
+        print(f"   -> {manifest_path_for(csv)}")
+        if args.bars:
+            bars = load_bars_1m(csv)
+            print(f"✅ Barres 1m: {len(bars):,} barres -> {bars_path_for(csv)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Test de charge du polling de statut
+Mesure la latence de /api/runs/{run_id}/status seul, puis pendant que des requêtes analytiques
+lourdes (heatmap, résultats, chat, OHLC) sont envoyées en parallèle: le p95 sous charge doit
+rester sous un seuil (les calculs lourds ne doivent pas bloquer la boucle d'événements)
+Usage: python tools/load_test_polling.py <run_id> [--url http://localhost:8000] [--concurrency 16]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+
+# Requêtes analytiques lourdes envoyées en parallèle pendant le polling
+HEAVY_REQUESTS = [
+    ("GET", "/api/runs/{run_id}/heatmap", None),
+    ("GET", "/api/runs/{run_id}/results", None),
+    ("POST", "/api/ai/chat", {"message": "performance du backtest"}),
+    ("GET", "/api/runs/ohlc-data?days=30&timeframe=1m", None),
+]
+
+
+async def poll_status(client: httpx.AsyncClient, run_id: str, duration: float, interval: float) -> list[float]:
+    """Interroge /status en boucle et retourne les latences (ms)"""
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        t0 = time.perf_counter()
+        r = await client.get(f"/api/runs/{run_id}/status")
+        latencies.append((time.perf_counter() - t0) * 1000)
+        r.raise_for_status()
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def hammer(client: httpx.AsyncClient, run_id: str, stop: asyncio.Event, counts: dict):
+    """Enchaîne les requêtes lourdes jusqu'à l'arrêt"""
+    i = 0
+    while not stop.is_set():
+        method, path, body = HEAVY_REQUESTS[i % len(HEAVY_REQUESTS)]
+        i += 1
+        try:
+            r = await client.request(method, path.format(run_id=run_id), json=body)
+            counts[r.status_code] = counts.get(r.status_code, 0) + 1
+        except httpx.HTTPError as e:
+            counts[type(e).__name__] = counts.get(type(e).__name__, 0) + 1
+
+
+def summary(label: str, latencies: list[float]) -> float:
+    q = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    print(f"{label:<12} n={len(latencies):<5} p50={q[49]:7.1f} ms  p95={q[94]:7.1f} ms  max={max(latencies):7.1f} ms")
+    return q[94]
+
+
+async def run(args) -> int:
+    async with httpx.AsyncClient(base_url=args.url, timeout=120) as client:
+        # Référence: polling seul
+        baseline = await poll_status(client, args.run_id, args.duration, args.interval)
+
+        # Polling pendant que des requêtes lourdes sont en cours
+        stop, counts = asyncio.Event(), {}
+        workers = [asyncio.create_task(hammer(client, args.run_id, stop, counts)) for _ in range(args.concurrency)]
+        loaded = await poll_status(client, args.run_id, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*workers)
+
+    print(f"📊 Polling /api/runs/{args.run_id}/status ({args.concurrency} clients lourds en parallèle)")
+    p95_base = summary("sans charge", baseline)
+    p95_load = summary("avec charge", loaded)
+    print(f"   Requêtes lourdes: {counts}")
+
+    ratio = p95_load / max(p95_base, 1.0)
+    if p95_load > args.max_p95_ms:
+        print(f"❌ p95 sous charge {p95_load:.1f} ms (x{ratio:.1f}) > {args.max_p95_ms:.0f} ms")
+        return 1
+    print(f"✅ p95 sous charge {p95_load:.1f} ms (x{ratio:.1f}) <= {args.max_p95_ms:.0f} ms")
+    return 0
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Vérifie que la latence du polling de statut reste stable pendant des calculs analytiques lourds.")
+    ap.add_argument("run_id", help="Run terminé utilisé pour les requêtes (heatmap, résultats)")
+    ap.add_argument("--url", default="http://localhost:8000")
+    ap.add_argument("--duration", type=float, default=15.0, help="Durée de chaque phase (s)")
+    ap.add_argument("--interval", type=float, default=0.1, help="Intervalle entre deux polls (s)")
+    ap.add_argument("--concurrency", type=int, default=16, help="Clients lourds simultanés")
+    ap.add_argument("--max-p95-ms", type=float, default=100.0, help="p95 maximal toléré pour le polling sous charge (ms)")
+    return asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
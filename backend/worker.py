@@ -0,0 +1,40 @@
+"""
+Worker de backtests séparé de l'API
+Réclame les runs mis en file par l'API (même dossier runs) et les exécute
+Usage: python worker.py [--concurrency N]
+Avec RUN_EMBEDDED_WORKERS=0 côté API, seuls ces processus exécutent les runs
+"""
+
+import argparse
+import signal
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "services" / "backtest"))
+from run_backtest import create_runner
+from config import RUN_WORKER_LEASE_SECONDS
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker d'exécution des backtests")
+    parser.add_argument("--concurrency", type=int, default=1, help="Runs exécutés en parallèle")
+    args = parser.parse_args()
+
+    runner = create_runner(
+        str(Path(__file__).parent),
+        embedded_workers=0,
+        lease_seconds=RUN_WORKER_LEASE_SECONDS
+    )
+
+    # Arrêt propre: le run en cours se termine, aucun nouveau n'est réclamé
+    signal.signal(signal.SIGTERM, lambda *_: runner.stop_workers())
+
+    print(f"👷 Worker {runner.worker_id} démarré ({args.concurrency} run(s) en parallèle)")
+    print(f"📁 File d'attente: {runner.queue.db_path}")
+    print("❌ Arrêt: Ctrl+C")
+
+    runner.start_workers(args.concurrency - 1)
+    try:
+        runner.run_worker()
+    except KeyboardInterrupt:
+        runner.stop_workers()
+    runner.join_workers()
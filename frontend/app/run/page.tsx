@@ -36,7 +36,7 @@ export default function RunPage() {
         setRunStatus(status)
         
         // Si le run est terminé, arrêter le polling
-        if (status.status === 'completed' || status.status === 'failed') {
+        if (status.status === 'completed' || status.status === 'failed' || status.status === 'cancelled') {
           if (pollingInterval) {
             clearInterval(pollingInterval)
             setPollingInterval(null)
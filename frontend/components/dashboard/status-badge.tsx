@@ -4,7 +4,7 @@ import { motion } from 'framer-motion'
 import { Badge } from '@/components/ui/badge'
 
 interface StatusBadgeProps {
-  status: 'running' | 'completed' | 'failed'
+  status: 'running' | 'completed' | 'failed' | 'cancelled'
   message?: string
 }
 
@@ -28,6 +28,12 @@ export function StatusBadge({ status, message }: StatusBadgeProps) {
       label: 'ÉCHEC',
       pulse: false,
     },
+    cancelled: {
+      variant: 'secondary' as const,
+      icon: '⏹️',
+      label: 'ANNULÉ',
+      pulse: false,
+    },
   }
 
   const { variant, icon, label, pulse } = config[status]
@@ -13,16 +13,18 @@ interface OHLCBar {
 interface OHLCData {
   data: OHLCBar[]
   symbol: string
+  symbols?: string[]
+  continuous?: boolean
   timeframe: string
   period: string
   total_bars: number
 }
 
-export function useOHLCData(days: number = 7) {
+export function useOHLCData(days: number = 7, timeframe: string = '30m') {
   return useQuery<OHLCData>({
-    queryKey: ['ohlc-data', days],
+    queryKey: ['ohlc-data', days, timeframe],
     queryFn: async () => {
-      const response = await fetch(`${API_URL}/api/runs/ohlc-data?days=${days}`)
+      const response = await fetch(`${API_URL}/api/runs/ohlc-data?days=${days}&timeframe=${timeframe}`)
       if (!response.ok) {
         throw new Error('Failed to fetch OHLC data')
       }
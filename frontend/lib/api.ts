@@ -10,7 +10,11 @@ import type {
   RunResponse,
   RunListResponse,
   RunStatus,
-  RunResults
+  RunResults,
+  RunCompareRequest,
+  RunCompareResponse,
+  RunMonteCarloRequest,
+  RunMonteCarloResponse
 } from '@/types/api'
 import { API_URL } from './config'
 
@@ -88,9 +92,36 @@ export const runsApi = {
 
   /**
    * Récupère les résultats d'un run terminé
+   * maxPoints : sous-échantillonnage serveur des courbes (LTTB)
    */
-  getResults: async (runId: string): Promise<RunResults> => {
-    const response = await api.get<RunResults>(`/runs/${runId}/results`)
+  getResults: async (runId: string, maxPoints?: number): Promise<RunResults> => {
+    const response = await api.get<RunResults>(`/runs/${runId}/results`, {
+      params: maxPoints ? { max_points: maxPoints } : undefined,
+    })
+    return response.data
+  },
+
+  /**
+   * Compare plusieurs runs en une seule requête (calcul côté serveur)
+   */
+  compare: async (request: RunCompareRequest): Promise<RunCompareResponse> => {
+    const response = await api.post<RunCompareResponse>('/runs/compare', request)
+    return response.data
+  },
+
+  /**
+   * Simulation Monte Carlo (bootstrap des trades) d'un run terminé
+   */
+  monteCarlo: async (runId: string, request: RunMonteCarloRequest = {}): Promise<RunMonteCarloResponse> => {
+    const response = await api.post<RunMonteCarloResponse>(`/runs/${runId}/montecarlo`, request)
+    return response.data
+  },
+
+  /**
+   * Annule un run en attente ou en cours
+   */
+  cancel: async (runId: string): Promise<{ success: boolean; message: string }> => {
+    const response = await api.post<{ success: boolean; message: string }>(`/runs/${runId}/cancel`)
     return response.data
   },
 
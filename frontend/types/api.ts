@@ -18,10 +18,24 @@ export interface StrategyListResponse {
   strategies: Strategy[]
 }
 
+export type WalkForwardObjective = 'net_pnl' | 'sharpe' | 'profit_factor' | 'expectancy' | 'pnl_drawdown'
+
+export interface WalkForwardConfig {
+  param_grid: Record<string, any[]>  // Variable de configuration du script -> valeurs testées
+  in_sample_days?: number
+  out_of_sample_days?: number
+  step_days?: number | null
+  objective?: WalkForwardObjective
+  min_trades?: number
+  max_workers?: number | null
+}
+
 export interface RunRequest {
   strategy_id: string
   parameters?: Record<string, any>
   name?: string
+  walk_forward?: WalkForwardConfig
+  force?: boolean  // Ré-exécuter même si un run identique est déjà terminé
 }
 
 export interface RunResponse {
@@ -30,22 +44,24 @@ export interface RunResponse {
   message: string
   name?: string
   started_at?: string
+  reused_from?: string | null  // Run identique dont le résultat a été réutilisé (status 'completed')
 }
 
 export interface RunStatus {
   run_id: string
-  status: 'running' | 'completed' | 'failed'
+  status: 'running' | 'completed' | 'failed' | 'cancelled'
   progress: number
   message: string
   name?: string
   logs: string[]
   started_at?: string
   completed_at?: string
+  reused_from?: string | null
 }
 
 export interface RunInfo {
   run_id: string
-  status: 'running' | 'completed' | 'failed'
+  status: 'running' | 'completed' | 'failed' | 'cancelled'
   message: string
   name?: string
   started_at?: string
@@ -86,12 +102,256 @@ export interface Trade {
   result: string
 }
 
+export interface RiskMetrics {
+  trading_days: number
+  sharpe_ratio: number | null
+  sortino_ratio: number | null
+  annual_pnl: number | null
+  calmar_ratio: number | null  // 36 derniers mois
+  mar_ratio: number | null  // Toute la période
+  ulcer_index: number | null
+  max_drawdown_daily: number | null
+  longest_drawdown_days: number
+  longest_drawdown_calendar_days: number
+  time_under_water: number | null
+  max_consecutive_wins: number
+  max_consecutive_losses: number
+  best_day: number | null
+  worst_day: number | null
+  r_multiples: {
+    count: number
+    mean: number
+    std: number
+    percentiles: Record<string, number>
+    histogram: { edges: number[]; counts: number[] }
+  } | null
+}
+
 export interface RunResults {
   run_id: string
   strategy: string
   metrics: RunMetrics
+  risk_metrics?: RiskMetrics | null
   equity_curve: number[]
   drawdown_curve: number[]
+  equity_curve_index?: number[] | null  // Indices d'origine si sous-échantillonnée
+  drawdown_curve_index?: number[] | null
   trades: Trade[]
   files: string[]
+  walk_forward?: WalkForwardResults | null
+}
+
+export interface WalkForwardWindow {
+  index: number
+  in_sample_start: string
+  in_sample_end: string
+  out_of_sample_start: string
+  out_of_sample_end: string
+  params: Record<string, any> | null  // null si aucune combinaison éligible
+  in_sample_score: number | null
+  in_sample_net_pnl: number | null
+  out_of_sample_net_pnl: number
+  out_of_sample_trades: number
+}
+
+export interface WalkForwardResults {
+  objective: WalkForwardObjective
+  param_grid: Record<string, any[]>
+  combinations: number
+  in_sample_days: number
+  out_of_sample_days: number
+  step_days: number
+  windows: WalkForwardWindow[]
+  oos_equity: { dates: string[]; equity: number[]; drawdown: number[] }
+  oos_net_pnl: number
+  oos_max_drawdown: number
+  simulations: { computed: number; reused: number }
+}
+
+export interface RunCompareRequest {
+  run_ids: string[]
+  weights?: Record<string, number>
+}
+
+export interface TimeOfDayStats {
+  trades: number
+  total_pnl: number
+  avg_pnl: number
+  win_rate: number
+  avg_win: number
+  avg_loss: number
+  expectancy: number
+}
+
+export interface HourStats extends TimeOfDayStats {
+  hour: number
+}
+
+export interface RunCompareResponse {
+  run_ids: string[]
+  dates: string[]
+  daily_pnl: Record<string, number[]>
+  cumulative_pnl: Record<string, number[]>
+  correlation: Record<string, (number | null)[]>  // Ligne par run, colonnes dans l'ordre de run_ids
+  portfolio: {
+    weights: Record<string, number>
+    daily_pnl: number[]
+    equity: number[]
+    drawdown: number[]
+    net_pnl: number
+    max_drawdown: number
+  }
+  metrics: Record<string, Partial<RunMetrics>>
+  by_hour: Record<string, HourStats[]>  // Profil horaire (heure d'entrée UTC) par run
+}
+
+export type LeaderboardMetric = 'net_pnl' | 'profit_factor' | 'win_rate' | 'expectancy' | 'max_drawdown' | 'trades'
+
+export interface RunLeaderboardRequest {
+  order_by?: LeaderboardMetric
+  descending?: boolean
+  limit?: number
+  strategy?: string | null
+  parameters?: Record<string, unknown>  // Filtres exacts sur les paramètres du run
+  start_date?: string | null  // Métriques recalculées sur les trades de la période
+  end_date?: string | null
+  min_trades?: number
+}
+
+export interface RunLeaderboardEntry {
+  rank: number
+  run_id: string
+  strategy: string | null
+  name: string | null
+  started_at: string | null
+  completed_at: string | null
+  parameters: Record<string, unknown>
+  trades: number
+  net_pnl: number
+  win_rate: number
+  gross_profit: number
+  gross_loss: number
+  profit_factor: number
+  expectancy: number
+  max_drawdown: number
+  first_date: string | null
+  last_date: string | null
+  sharpe_ratio: number | null  // Run complet (hors filtre de période)
+}
+
+export interface RunLeaderboardResponse {
+  runs: RunLeaderboardEntry[]
+  total: number
+  order_by: LeaderboardMetric
+}
+
+export type MonteCarloMethod = 'iid' | 'block' | 'shuffle'
+
+export interface RunMonteCarloRequest {
+  methods?: MonteCarloMethod[]
+  simulations?: number
+  ruin_loss?: number | null  // Perte cumulée (USD) considérée comme la ruine
+  seed?: number | null
+}
+
+export interface MonteCarloDistribution {
+  mean: number
+  std: number
+  min: number
+  max: number
+  percentiles: Record<string, number>  // p1, p5, p25, p50, p75, p95, p99
+  histogram: { edges: number[]; counts: number[] }
+}
+
+export interface MonteCarloMethodResult {
+  final_pnl: MonteCarloDistribution
+  max_drawdown: MonteCarloDistribution
+  risk_of_ruin: number | null
+  prob_loss: number
+  prob_worse_drawdown: number  // Part des simulations au drawdown pire que le backtest
+}
+
+export interface RunMonteCarloResponse {
+  run_id: string
+  simulations: number
+  seed: number | null
+  ruin_loss: number | null
+  trades: number
+  actual: { final_pnl: number; max_drawdown: number; ruined: boolean } | null
+  methods: Partial<Record<MonteCarloMethod, MonteCarloMethodResult>>
+}
+
+export interface NinjaPortfolioRequest {
+  strategies: { id: string; weight?: number }[]  // id: chemin de l'export (ex: MNQ/Opr-trade)
+  start_date?: string | null
+  end_date?: string | null
+  margins?: Record<string, number>  // Marge par contrat (USD) par racine d'instrument
+}
+
+export interface NinjaPortfolioResponse {
+  strategies: {
+    id: string
+    instruments: string[]
+    weight: number
+    trades: number
+    net_pnl: number
+    max_drawdown: number
+  }[]
+  trades: number
+  net_pnl: number
+  max_drawdown: number
+  equity: { times: string[]; strategy: string[]; equity: number[]; drawdown: number[] }
+  daily: { dates: string[]; pnl: Record<string, number[]>; portfolio: number[] }
+  correlation: Record<string, (number | null)[]>
+  exposure: {
+    times: string[]
+    contracts: number[]
+    margin: number[]
+    max_contracts: number
+    max_margin: number
+    max_margin_time: string | null
+    max_margin_by_strategy: Record<string, number>
+    missing_margins: string[]  // Instruments sans marge fournie (exclus de la marge)
+  }
+  return_on_margin: number | null
+  start_date: string | null
+  end_date: string | null
+}
+
+export interface ExcursionCurve {
+  levels: number[]  // USD par contrat
+  net_pnl: number[]
+  win_rate: number[]
+  triggered: number[]  // Trades sortis au niveau
+  best_level: number | null
+  best_net_pnl: number | null
+}
+
+export interface NinjaExcursionsResponse {
+  id: string
+  start_date: string | null
+  end_date: string | null
+  trades: number
+  net_pnl: number
+  scatter: {
+    trade: number[]
+    mae: number[]
+    mfe: number[]
+    pnl: number[]
+    etd: (number | null)[]
+    bars: (number | null)[]
+  }
+  stop_curve: ExcursionCurve
+  target_curve: ExcursionCurve
+  edge_ratio: number | null
+  edge_ratio_by_bars: {
+    min_bars: number
+    max_bars: number | null
+    trades: number
+    edge_ratio: number | null
+    avg_pnl: number
+  }[]
+  winners_mae: Record<string, number> | null  // p50, p75, p90, p95
+  losers_mfe: Record<string, number> | null
+  avg_etd: number | null
 }